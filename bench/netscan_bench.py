@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FA: بنچمارک تکرارپذیر موتورهای اسکن
+EN: Reproducible benchmark for the scan engines.
+
+Two backends:
+
+  netns  Builds a throwaway network namespace joined by a veth pair,
+         with N responding addresses inside it; every other address of
+         the subnet stays silent. Needs root. Works with the icmp, arp
+         and ping engines.
+
+  fake   Puts fake `ping` and `ip` executables first on PATH and forces
+         the subprocess fallbacks, so the ping engine and the `ip neigh`
+         parser can be measured without privileges.
+
+Every case runs in a fresh child process and reports hosts/sec,
+time-to-first-result, wall time, CPU time (self + children) and peak
+RSS. Results are written as JSON lines so they can be tracked over time:
+
+  sudo python3 bench/netscan_bench.py --backend netns --engines icmp,arp --sizes 24,20
+  python3 bench/netscan_bench.py --backend fake --sizes 26 --output bench.jsonl
+"""
+
+import argparse
+import ipaddress
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NS_NAME = "netscan-bench"
+VETH_HOST = "nsb-host"
+VETH_LAB = "nsb-lab"
+LAB_NET = "10.213.0.0/16"
+
+# =========================================================
+# ===================== netns backend =====================
+# =========================================================
+def _ip(*args, stdin=None):
+    subprocess.run(["ip", *args], input=stdin, text=True, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+class NamespaceLab:
+    """
+    FA: آزمایشگاه موقت با namespace و جفت veth
+    EN: Throwaway namespace + veth pair. The host side gets the last
+        address of `cidr`, the namespace side answers (ICMP and ARP) for
+        the first `alive` host addresses; the rest of the subnet is silent.
+    """
+
+    def __init__(self, cidr, alive):
+        self.net = ipaddress.ip_network(cidr, strict=False)
+        self.alive = alive
+        self.iface = VETH_HOST
+
+    def __enter__(self):
+        self.teardown()
+        hosts = self.net.hosts()
+        responders = [str(next(hosts)) for _ in range(self.alive)]
+        host_ip = str(self.net.broadcast_address - 1)
+        prefix = self.net.prefixlen
+
+        _ip("netns", "add", NS_NAME)
+        _ip("link", "add", VETH_HOST, "type", "veth", "peer", "name", VETH_LAB)
+        _ip("link", "set", VETH_LAB, "netns", NS_NAME)
+        _ip("addr", "add", f"{host_ip}/{prefix}", "dev", VETH_HOST)
+        _ip("link", "set", VETH_HOST, "up")
+        batch = [f"link set {VETH_LAB} up", "link set lo up"]
+        batch += [f"addr add {ip}/{prefix} dev {VETH_LAB}" for ip in responders]
+        _ip("-n", NS_NAME, "-batch", "-", stdin="\n".join(batch) + "\n")
+        self.host_ip = host_ip
+        return self
+
+    def reset(self):
+        # FA: پاک کردن کش همسایه بین اجراها
+        # EN: start every run with a cold neighbor cache
+        subprocess.run(["ip", "neigh", "flush", "dev", VETH_HOST],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def teardown(self):
+        subprocess.run(["ip", "link", "del", VETH_HOST],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        subprocess.run(["ip", "netns", "del", NS_NAME],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def __exit__(self, *exc):
+        self.teardown()
+
+# =========================================================
+# ===================== fake backend ======================
+# =========================================================
+FAKE_PING = """#!/bin/sh
+# fake ping: answers for addresses listed in $NETSCAN_FAKE_ALIVE
+for last; do :; done
+if grep -qx "$last" "$NETSCAN_FAKE_ALIVE"; then
+  echo "64 bytes from $last: icmp_seq=1 ttl=64 time=0.210 ms"
+  exit 0
+fi
+sleep "${NETSCAN_FAKE_TIMEOUT:-1}"
+exit 1
+"""
+
+FAKE_IP = """#!/bin/sh
+# fake ip: only `ip [-4] neigh` is supported, everything else fails
+[ "$1" = "-4" ] && shift
+if [ "$1" = "neigh" ]; then
+  while read -r ip; do
+    echo "$ip dev fake0 lladdr 02:00:00:00:00:01 REACHABLE"
+  done < "$NETSCAN_FAKE_ALIVE"
+  exit 0
+fi
+exit 1
+"""
+
+class FakeBackend:
+    """
+    FA: باینری‌های جعلی ping و ip برای اجرای بدون دسترسی root
+    EN: Fake `ping` / `ip` executables on PATH for unprivileged runs
+    """
+
+    def __init__(self, cidr, alive, timeout=1):
+        self.net = ipaddress.ip_network(cidr, strict=False)
+        self.alive = alive
+        self.timeout = timeout
+        self.iface = "fake0"
+
+    def __enter__(self):
+        self.dir = tempfile.mkdtemp(prefix="netscan-bench-")
+        for name, body in (("ping", FAKE_PING), ("ip", FAKE_IP)):
+            path = os.path.join(self.dir, name)
+            with open(path, "w") as f:
+                f.write(body)
+            os.chmod(path, 0o755)
+        self.alive_file = os.path.join(self.dir, "alive")
+        hosts = self.net.hosts()
+        with open(self.alive_file, "w") as f:
+            for _ in range(self.alive):
+                f.write(f"{next(hosts)}\n")
+        self.env = {
+            "PATH": self.dir + os.pathsep + os.environ.get("PATH", ""),
+            "NETSCAN_FAKE_ALIVE": self.alive_file,
+            "NETSCAN_FAKE_TIMEOUT": str(self.timeout),
+            "NETSCAN_BENCH_FAKE": "1",
+        }
+        return self
+
+    def reset(self):
+        pass
+
+    def __exit__(self, *exc):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+# =========================================================
+# ===================== measurement =======================
+# =========================================================
+def run_case(engine, cidr, iface, concurrency=None):
+    """
+    FA: اجرای یک اسکن در همین پردازه و اندازه‌گیری آن
+    EN: Run one scan in this (child) process and measure it
+    """
+    sys.path.insert(0, REPO_DIR)
+    import network_scan as ns
+
+    if os.environ.get("NETSCAN_BENCH_FAKE"):
+        # FA: اجبار مسیرهای subprocess
+        # EN: force the subprocess fallbacks (ip neigh) instead of netlink
+        def no_netlink(*_a, **_k):
+            raise OSError("netlink disabled by benchmark")
+        ns.nl_dump = no_netlink
+    if concurrency:
+        ns.NETSCAN_CONCURRENCY = concurrency
+
+    plan = ns.TargetPlan(cidr)
+    pacer = ns.RateController()
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    before_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    first = None
+    found = 0
+    for rec in ns.scan_hosts(plan, iface, engine, pacer=pacer, only_iface=True):
+        if first is None:
+            first = time.perf_counter() - started
+        if rec["state"] == "active":
+            found += 1
+    wall = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    after_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    cpu = (after.ru_utime - before.ru_utime + after.ru_stime - before.ru_stime
+           + after_children.ru_utime - before_children.ru_utime
+           + after_children.ru_stime - before_children.ru_stime)
+    return {
+        "engine": engine,
+        "targets": len(plan),
+        "found": found,
+        "wall_s": round(wall, 4),
+        "hosts_per_s": round(len(plan) / wall, 1) if wall else None,
+        "ttfr_s": round(first, 4) if first is not None else None,
+        "cpu_s": round(cpu, 4),
+        "peak_rss_kb": after.ru_maxrss,
+        "pacing": pacer.summary(),
+    }
+
+def spawn_case(engine, cidr, iface, env=None, concurrency=None):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child",
+           "--engine", engine, "--cidr", cidr, "--iface", iface]
+    if concurrency:
+        cmd += ["--concurrency", str(concurrency)]
+    out = subprocess.run(cmd, env={**os.environ, **(env or {})},
+                         capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip() or f"case failed ({out.returncode})")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "-C", REPO_DIR, "rev-parse", "--short", "HEAD"],
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# =========================================================
+# ===================== CLI ===============================
+# =========================================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="netscan engine benchmark")
+    parser.add_argument("--backend", choices=("netns", "fake"), default="netns")
+    parser.add_argument("--engines", default=None,
+                        help="comma separated (netns default: icmp,arp,ping; fake: ping)")
+    parser.add_argument("--sizes", default="24",
+                        help="comma separated prefix lengths, e.g. 24,22,20")
+    parser.add_argument("--alive", type=int, default=16, help="responding hosts per subnet")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("-j", "--concurrency", type=int, help="ping pool size")
+    parser.add_argument("--output", help="append JSON lines here instead of stdout")
+    # child mode
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--engine", help=argparse.SUPPRESS)
+    parser.add_argument("--cidr", help=argparse.SUPPRESS)
+    parser.add_argument("--iface", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(run_case(args.engine, args.cidr, args.iface, args.concurrency)))
+        return 0
+
+    default_engines = "icmp,arp,ping" if args.backend == "netns" else "ping"
+    engines = (args.engines or default_engines).split(",")
+    if "ping" in engines and args.backend == "netns" and not shutil.which("ping"):
+        print("[*] /bin/ping not found, skipping the ping engine", file=sys.stderr)
+        engines.remove("ping")
+    if args.backend == "netns" and os.geteuid() != 0:
+        print("[!] the netns backend needs root (try --backend fake)", file=sys.stderr)
+        return 1
+
+    out = open(args.output, "a") if args.output else sys.stdout
+    meta = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "kernel": platform.release(),
+        "backend": args.backend,
+    }
+    try:
+        for prefix in (int(p) for p in args.sizes.split(",")):
+            base = ipaddress.ip_network(LAB_NET)
+            cidr = str(next(base.subnets(new_prefix=prefix)) if prefix > base.prefixlen else base)
+            lab_cls = NamespaceLab if args.backend == "netns" else FakeBackend
+            with lab_cls(cidr, args.alive) as lab:
+                env = getattr(lab, "env", None)
+                for engine in engines:
+                    for run in range(args.repeat):
+                        lab.reset()
+                        try:
+                            result = spawn_case(engine, cidr, lab.iface, env, args.concurrency)
+                        except RuntimeError as e:
+                            result = {"engine": engine, "error": str(e)}
+                        record = {**meta, "cidr": cidr, "alive": args.alive, "run": run, **result}
+                        out.write(json.dumps(record) + "\n")
+                        out.flush()
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,6 @@ INSTALL_DIR="/opt/network-scanner"
 BIN_PATH="/usr/local/bin/netscan"
 CONF_FILE="$INSTALL_DIR/.netscan.conf"
 OUI_DB_FILE="$INSTALL_DIR/oui.db"
-TMP_DIR="/tmp/netscan-oui"
 
 # =========================================================
 # Welcome / Language Selection
@@ -55,7 +54,7 @@ msg() {
 msg checking
 sudo apt update
 
-DEPENDENCIES=(python3 curl iproute2 iputils-ping gawk coreutils)
+DEPENDENCIES=(python3 curl iproute2 iputils-ping coreutils)
 for pkg in "${DEPENDENCIES[@]}"; do
   printf "[*] Checking %-15s ... " "$pkg"
   if ! command -v "$pkg" >/dev/null 2>&1 && ! dpkg -s "$pkg" >/dev/null 2>&1; then
@@ -93,33 +92,12 @@ sudo ln -sf "$INSTALL_DIR/network_scan.py" "$BIN_PATH"
 # Build OUI Database
 # =========================================================
 msg building
-mkdir -p "$TMP_DIR"
-RAW_FILE="$TMP_DIR/oui_raw.txt"
-
 curl -# -fsSL \
-https://standards-oui.ieee.org/oui/oui.txt \
--o "$RAW_FILE"
-
-if [[ ! -s "$RAW_FILE" ]]; then
-  echo "[!] Failed to download OUI database"
-  exit 1
-fi
-
-# Process OUI with gawk, handle all common formats
-gawk '
-{
-  gsub(/[:-]/,"",$1)
-  if ($1 ~ /^[0-9A-Fa-f]{6}$/) {
-    vendor=""
-    for (i=2;i<=NF;i++) vendor=vendor $i " "
-    sub(/[ \t]+$/,"",vendor)
-    print toupper($1) "|" vendor
-  }
-}
-' "$RAW_FILE" | sort -u > "$OUI_DB_FILE"
+https://raw.githubusercontent.com/rezajavadi995/Network-Scanner-ARP-Inspector/main/update-oui.sh \
+-o update-oui.sh
+chmod +x update-oui.sh
 
-chmod 644 "$OUI_DB_FILE"
-rm -rf "$TMP_DIR"
+./update-oui.sh
 
 # =========================================================
 # Finish
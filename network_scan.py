@@ -7,10 +7,22 @@ import time
 import re
 import socket
 import struct
-import shutil
+import select
+import selectors
+import resource
+import errno
+import fcntl
+from collections import deque
 import os
-from datetime import datetime
+import argparse
+import itertools
+from datetime import datetime, timezone
 import ipaddress
+import queue
+import threading
+import json
+import bisect
+import math
 
 # ===================== Colors ===========================
 RESET   = "\033[0m"
@@ -37,17 +49,27 @@ BIN_PATH = "/usr/local/bin/netscan"
 # =========================================================
 NETSCAN_LANG = "en"
 NETSCAN_TONE = "human"
-
-if os.path.exists(CONF_FILE):
-    try:
-        with open(CONF_FILE) as f:
-            for line in f:
-                if line.startswith("NETSCAN_LANG="):
-                    NETSCAN_LANG = line.strip().split("=", 1)[1]
-                elif line.startswith("NETSCAN_TONE="):
-                    NETSCAN_TONE = line.strip().split("=", 1)[1]
-    except:
-        pass
+NETSCAN_CONCURRENCY = 64
+NETSCAN_PROBE = "auto"
+NETSCAN_ORDER = "linear"
+NETSCAN_EXCLUDE = ""
+NETSCAN_RANGE = None
+NETSCAN_IFACE = None
+NETSCAN_ALL_IFACES = False
+NETSCAN_MONITOR_TTL = 300
+NETSCAN_HISTORY = False
+NETSCAN_RATE = 5000
+NETSCAN_RETRIES = 1
+NETSCAN_CHECKPOINT = 5.0
+NETSCAN_RESUME = False
+NETSCAN_METRICS_FILE = None
+NETSCAN_PROFILE = False
+NETSCAN_TCP_PORTS = (22, 80, 443, 445, 139, 3389, 8080, 62078)
+NETSCAN_PASSIVE = None
+NETSCAN_IPV6 = False
+NETSCAN_TRUST_GATEWAY = False
+NETSCAN_AGENTS = ""
+NETSCAN_AGENT_TOKEN = None
 
 # =========================================================
 # ===================== TEXT (FULL MERGED) ================
@@ -67,6 +89,11 @@ TEXT = {
         "info_mode": "Mode",
         "info_network": "Network Range",
         "info_delay": "Ping Delay",
+        "info_concurrency": "Concurrency",
+        "info_probe": "Probe Engine",
+        "info_rate": "Probe Rate",
+        "info_timeout": "Timeout",
+        "info_loss": "Loss",
         "info_arp": "ARP Source",
         "info_started": "Started At",
 
@@ -109,6 +136,35 @@ TEXT = {
         "iface_gateway": "Gateway Detected",
         "iface_arp_limited": "ARP visibility : Limited",
 
+        # ---- History ----
+        "diff_title": "Changes",
+        "diff_none": "Need at least two recorded scans (enable NETSCAN_HISTORY=1)",
+        "diff_new": "New devices",
+        "diff_gone": "Disappeared",
+        "diff_ip_changed": "Changed IP",
+        "diff_mac_changed": "Changed MAC",
+
+        # ---- Monitor ----
+        "mon_start": "Monitoring neighbors on",
+        "mon_arrive": "ARRIVE",
+        "mon_depart": "DEPART",
+        "mon_change": "CHANGE",
+        "mon_alert": "ALERT",
+        "passive_start": "Listening passively on",
+        "passive_hosts": "Hosts seen",
+        "pcap_source": "Capture file",
+        "live_scanning": "Scanning",
+        "resume_from": "Resuming interrupted scan, targets done",
+
+        # ---- ARP inspection ----
+        "inspect_title": "ARP Inspection",
+        "inspect_clean": "No ARP conflicts or gateway spoofing seen",
+        "alert_duplicate_ip": "Duplicate IP",
+        "alert_mac_flip": "MAC changed",
+        "alert_gateway_spoof": "Gateway spoofing",
+        "alert_mac_many_ips": "MAC claims many IPs",
+        "info_agents": "Agents",
+
         "menu_width": 54
     },
 
@@ -124,6 +180,11 @@ TEXT = {
         "info_mode": "حالت",
         "info_network": "رنج شبکه",
         "info_delay": "تاخیر پینگ",
+        "info_concurrency": "پینگ هم‌زمان",
+        "info_probe": "موتور پروب",
+        "info_rate": "نرخ پروب",
+        "info_timeout": "زمان انتظار",
+        "info_loss": "از‌دست‌رفته",
         "info_arp": "منبع ARP",
         "info_started": "زمان شروع",
 
@@ -162,6 +223,32 @@ TEXT = {
         "iface_gateway": "گیت‌وی شناسایی شد",
         "iface_arp_limited": "دسترسی ARP محدود است",
 
+        "diff_title": "تغییرات",
+        "diff_none": "حداقل دو اسکن ذخیره‌شده لازم است (NETSCAN_HISTORY=1)",
+        "diff_new": "دستگاه‌های جدید",
+        "diff_gone": "ناپدید شده",
+        "diff_ip_changed": "تغییر IP",
+        "diff_mac_changed": "تغییر MAC",
+
+        "mon_start": "پایش همسایه‌ها روی",
+        "mon_arrive": "ورود",
+        "mon_depart": "خروج",
+        "mon_change": "تغییر",
+        "mon_alert": "هشدار",
+        "passive_start": "شنود غیرفعال روی",
+        "passive_hosts": "میزبان‌های دیده‌شده",
+        "pcap_source": "فایل ضبط‌شده",
+        "live_scanning": "در حال اسکن",
+        "resume_from": "ادامه اسکن قطع‌شده، اهداف انجام‌شده",
+
+        "inspect_title": "بازرسی ARP",
+        "inspect_clean": "تداخل ARP یا جعل گیت‌وی دیده نشد",
+        "alert_duplicate_ip": "IP تکراری",
+        "alert_mac_flip": "تغییر MAC",
+        "alert_gateway_spoof": "جعل گیت‌وی",
+        "alert_mac_many_ips": "MAC با IPهای متعدد",
+        "info_agents": "ایجنت‌ها",
+
         "menu_width": 60
     }
 }
@@ -180,16 +267,94 @@ def Tget(key):
         return T.get(key, TEXT["en"].get(key, key))
     except Exception:
         return key
+def load_config(path=None):
+    """
+    FA: خواندن فایل تنظیمات (فقط هنگام اجرا، نه هنگام import)
+    EN: Read .netscan.conf into the NETSCAN_* globals and pick the
+        language table. Called by main(), so importing the module stays
+        cheap and side-effect free.
+    """
+    global NETSCAN_LANG, NETSCAN_TONE, NETSCAN_CONCURRENCY, NETSCAN_PROBE, NETSCAN_ORDER
+    global NETSCAN_MONITOR_TTL, NETSCAN_HISTORY, NETSCAN_RATE, NETSCAN_RETRIES
+    global NETSCAN_EXCLUDE, NETSCAN_METRICS_FILE, NETSCAN_TCP_PORTS, T, MENU_WIDTH
+    global NETSCAN_AGENTS, NETSCAN_AGENT_TOKEN, NETSCAN_IPV6, NETSCAN_CHECKPOINT
+
+    path = path or CONF_FILE
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith("NETSCAN_LANG="):
+                        NETSCAN_LANG = line.strip().split("=", 1)[1]
+                    elif line.startswith("NETSCAN_TONE="):
+                        NETSCAN_TONE = line.strip().split("=", 1)[1]
+                    elif line.startswith("NETSCAN_CONCURRENCY="):
+                        try:
+                            NETSCAN_CONCURRENCY = max(1, int(line.strip().split("=", 1)[1]))
+                        except ValueError:
+                            pass
+                    elif line.startswith("NETSCAN_PROBE="):
+                        NETSCAN_PROBE = line.strip().split("=", 1)[1]
+                    elif line.startswith("NETSCAN_ORDER="):
+                        NETSCAN_ORDER = line.strip().split("=", 1)[1]
+                    elif line.startswith("NETSCAN_MONITOR_TTL="):
+                        try:
+                            NETSCAN_MONITOR_TTL = max(1, int(line.strip().split("=", 1)[1]))
+                        except ValueError:
+                            pass
+                    elif line.startswith("NETSCAN_HISTORY="):
+                        NETSCAN_HISTORY = line.strip().split("=", 1)[1].lower() in ("1", "yes", "true", "on")
+                    elif line.startswith("NETSCAN_IPV6="):
+                        NETSCAN_IPV6 = line.strip().split("=", 1)[1].lower() in ("1", "yes", "true", "on")
+                    elif line.startswith("NETSCAN_RATE="):
+                        try:
+                            NETSCAN_RATE = max(1, int(line.strip().split("=", 1)[1]))
+                        except ValueError:
+                            pass
+                    elif line.startswith("NETSCAN_RETRIES="):
+                        try:
+                            NETSCAN_RETRIES = max(0, int(line.strip().split("=", 1)[1]))
+                        except ValueError:
+                            pass
+                    elif line.startswith("NETSCAN_CHECKPOINT="):
+                        try:
+                            NETSCAN_CHECKPOINT = max(0.0, float(line.strip().split("=", 1)[1]))
+                        except ValueError:
+                            pass
+                    elif line.startswith("NETSCAN_EXCLUDE="):
+                        NETSCAN_EXCLUDE = line.strip().split("=", 1)[1]
+                    elif line.startswith("NETSCAN_METRICS_FILE="):
+                        NETSCAN_METRICS_FILE = line.strip().split("=", 1)[1] or None
+                    elif line.startswith("NETSCAN_TCP_PORTS="):
+                        try:
+                            NETSCAN_TCP_PORTS = parse_ports(line.strip().split("=", 1)[1])
+                        except ValueError as e:
+                            print(FG_RED + f"[✗] NETSCAN_TCP_PORTS: {e}" + RESET, file=sys.stderr)
+                    elif line.startswith("NETSCAN_AGENTS="):
+                        NETSCAN_AGENTS = line.strip().split("=", 1)[1]
+                    elif line.startswith("NETSCAN_AGENT_TOKEN="):
+                        NETSCAN_AGENT_TOKEN = line.strip().split("=", 1)[1] or None
+        except:
+            pass
+
+    T = TEXT.get(NETSCAN_LANG, TEXT["en"])
+    MENU_WIDTH = T.get("menu_width", 54)
+
 # =========================================================
 # ===================== Network ===========================
 # =========================================================
-NETWORK_BASE = "192.168.1."
-START = 1
-END = 254
-PING_TIMEOUT = "1"
-BASE_DELAY = 0.03
 ARP_DELAY = 0.4
 
+# FA: مقادیر اولیه؛ کنترل‌کننده نرخ در طول اسکن آن‌ها را تنظیم می‌کند
+# EN: starting points only - RateController adapts them during the sweep
+PROBE_TIMEOUT = 1.0
+RTO_MIN = 0.5  # FA: کف زمان انتظار برای کلاینت‌های Wi-Fi کم‌مصرف / EN: floor for power-saving Wi-Fi clients
+RTO_MAX = 3.0
+RATE_INITIAL = 1000
+RATE_MIN = 20
+RATE_STEP = 50
+RATE_INTERVAL = 0.1
+
 # =========================================================
 # ===================== Helpers ===========================
 # =========================================================
@@ -199,6 +364,9 @@ def ip_to_int(ip):
     except:
         return 0
 
+def int_to_ip(n):
+    return socket.inet_ntoa(struct.pack("!I", n & 0xFFFFFFFF))
+
 def normalize_mac(mac):
     if not mac or mac == "<incomplete>":
         return None
@@ -212,6 +380,7 @@ def is_locally_administered(mac_hex):
 
 
 def box_width(min_width=40, max_width=100):
+    import shutil
     try:
         cols = shutil.get_terminal_size().columns
         return max(min_width, min(cols - 4, max_width))
@@ -299,63 +468,254 @@ def detect_interface_mode(iface):
     FA: تشخیص واقعی نوع اتصال (Wi-Fi / NAT / Bridge)
     EN: Real interface mode detection
     """
-    warnings = []
+    return get_env(iface).warnings()
 
-    # ---- Wi-Fi detection ----
-    try:
-        if os.path.exists(f"/sys/class/net/{iface}/wireless"):
-            warnings.append(Tget("iface_wifi"))
-    except:
-        pass
+# =========================================================
+# ===================== Dynamic Network ===================
+# =========================================================
+def detect_network_range(iface=None):
+    return get_env(iface).network or ipaddress.ip_network("192.168.1.0/24")
+
+# =========================================================
+# ===================== OUI DB =============================
+# =========================================================
+# FA: فرمت ایندکس دودویی oui.idx (little-endian):
+#     سرآیند: magic(8) + تعداد جدول(u32) + [bits, width, count, keys_off, vals_off]*n
+#             + blob_off(u32) + blob_len(u32)
+#     هر جدول: کلیدهای مرتب با عرض ثابت + جدول offset (u32) در blob نام‌ها
+# EN: Binary oui.idx layout (little-endian):
+#     header: magic(8) + table count (u32) + n * (bits u8, key width u8,
+#             pad u16, count u32, keys_off u32, vals_off u32)
+#             + blob_off (u32) + blob_len (u32)
+#     each table: sorted fixed-width prefix keys, then a u32 offset per
+#     key into a blob of NUL-terminated, de-duplicated vendor names.
+#     Tables are stored longest prefix first (MA-S 36, MA-M 28, MA-L 24).
+OUI_INDEX_FILE = f"{BASE_DIR}/oui.idx"
+OUI_INDEX_MAGIC = b"NSOUI\x01\0\0"
+OUI_PREFIX_BITS = (36, 28, 24)
+_OUI_TABLE = struct.Struct("<BBHIII")
 
-    # ---- NAT / Bridge detection ----
+_OUI_CACHE = None
+_OUI_INDEX = None
+
+def build_oui_index(entries):
+    """
+    FA: ساخت محتوای ایندکس دودویی از رکوردهای (bits, prefix, vendor)
+    EN: Serialize (bits, prefix, vendor) records into the oui.idx format.
+        `prefix` is the integer value of the first `bits` bits of the MAC.
+        Later duplicates of the same prefix win.
+    """
+    tables = {bits: {} for bits in OUI_PREFIX_BITS}
+    for bits, prefix, vendor in entries:
+        if bits in tables and vendor:
+            tables[bits][prefix] = vendor
+
+    blob = bytearray()
+    interned = {}
+    sections = []
+    for bits in OUI_PREFIX_BITS:
+        width = 4 if bits <= 32 else 8
+        keys = sorted(tables[bits])
+        offsets = []
+        for k in keys:
+            name = tables[bits][k]
+            if name not in interned:
+                interned[name] = len(blob)
+                blob += name.encode("utf-8") + b"\0"
+            offsets.append(interned[name])
+        sections.append((bits, width, keys, offsets))
+
+    header_len = len(OUI_INDEX_MAGIC) + 4 + _OUI_TABLE.size * len(sections) + 8
+    out = bytearray(header_len)
+    descriptors = []
+    for bits, width, keys, offsets in sections:
+        keys_off = len(out)
+        out += struct.pack(f"<{len(keys)}{'I' if width == 4 else 'Q'}", *keys)
+        vals_off = len(out)
+        out += struct.pack(f"<{len(offsets)}I", *offsets)
+        descriptors.append(_OUI_TABLE.pack(bits, width, 0, len(keys), keys_off, vals_off))
+    blob_off = len(out)
+    out += blob
+
+    header = OUI_INDEX_MAGIC + struct.pack("<I", len(sections)) + b"".join(descriptors)
+    header += struct.pack("<II", blob_off, len(blob))
+    out[:header_len] = header
+    return bytes(out)
+
+class OuiIndex:
+    """
+    FA: ایندکس دودویی OUI با mmap و جستجوی دودویی؛ بدون پردازش اولیه
+    EN: Memory-mapped oui.idx reader. Nothing is parsed up front: each
+        lookup binary-searches the fixed-width key tables in place,
+        longest prefix (MA-S) first.
+    """
+
+    def __init__(self, path):
+        import mmap
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        m = self._map
+        if m[:len(OUI_INDEX_MAGIC)] != OUI_INDEX_MAGIC:
+            m.close()
+            raise ValueError(f"{path}: not an OUI index")
+        pos = len(OUI_INDEX_MAGIC)
+        (count,) = struct.unpack_from("<I", m, pos)
+        pos += 4
+        self.tables = []
+        for _ in range(count):
+            bits, width, _, n, keys_off, vals_off = _OUI_TABLE.unpack_from(m, pos)
+            self.tables.append((bits, "<I" if width == 4 else "<Q", width, n, keys_off, vals_off))
+            pos += _OUI_TABLE.size
+        self.blob_off, self.blob_len = struct.unpack_from("<II", m, pos)
+
+    def __len__(self):
+        return sum(t[3] for t in self.tables)
+
+    def _vendor_at(self, offset):
+        start = self.blob_off + offset
+        end = self._map.find(b"\0", start, self.blob_off + self.blob_len)
+        return self._map[start:end].decode("utf-8", errors="ignore")
+
+    def lookup(self, mac_int):
+        """
+        FA: جستجوی طولانی‌ترین پیشوند برای MAC عددی ۴۸ بیتی
+        EN: Longest-prefix vendor match for a 48-bit MAC integer, or None
+        """
+        m = self._map
+        for bits, fmt, width, n, keys_off, vals_off in self.tables:
+            key = mac_int >> (48 - bits)
+            lo, hi = 0, n
+            while lo < hi:
+                mid = (lo + hi) // 2
+                k = struct.unpack_from(fmt, m, keys_off + mid * width)[0]
+                if k < key:
+                    lo = mid + 1
+                elif k > key:
+                    hi = mid
+                else:
+                    return self._vendor_at(struct.unpack_from("<I", m, vals_off + mid * 4)[0])
+        return None
+
+    def close(self):
+        self._map.close()
+
+# ===================== OUI Compiler =====================
+_OUI_TXT_RE = re.compile(r"^\s*([0-9A-Fa-f]{2}[-:]?[0-9A-Fa-f]{2}[-:]?[0-9A-Fa-f]{2})\s+\(hex\)\s+(.+?)\s*$")
+
+def iter_oui_records(path):
+    """
+    FA: خواندن جریانی فایل‌های ثبت IEEE و تولید رکوردهای (bits, prefix, vendor)
+    EN: Stream an IEEE registry file and yield (bits, prefix, vendor).
+        Understands oui.txt ("XX-XX-XX (hex) Vendor"), the MA-L / MA-M /
+        MA-S CSV exports (Registry,Assignment,Organization Name,...) and
+        the plain "PREFIX|Vendor" oui.db text format.
+    """
+    with open(path, "r", encoding="utf-8", errors="ignore", newline="") as f:
+        first = f.readline()
+        f.seek(0)
+        if first.lower().startswith("registry,assignment"):
+            import csv
+            for row in csv.reader(f):
+                if len(row) < 3 or row[0] == "Registry":
+                    continue
+                hexdigits = row[1].strip().upper()
+                vendor = row[2].strip()
+                if hexdigits and len(hexdigits) * 4 in OUI_PREFIX_BITS and vendor:
+                    try:
+                        yield len(hexdigits) * 4, int(hexdigits, 16), vendor
+                    except ValueError:
+                        continue
+            return
+
+        for line in f:
+            if "|" in line:
+                hexdigits, vendor = line.strip().split("|", 1)
+                hexdigits = re.sub(r"[^0-9A-Fa-f]", "", hexdigits)
+            else:
+                m = _OUI_TXT_RE.match(line)
+                if not m:
+                    continue
+                hexdigits = re.sub(r"[-:]", "", m.group(1))
+                vendor = m.group(2)
+            vendor = vendor.strip()
+            if vendor and len(hexdigits) * 4 in OUI_PREFIX_BITS:
+                try:
+                    yield len(hexdigits) * 4, int(hexdigits, 16), vendor
+                except ValueError:
+                    continue
+
+def write_atomic(path, data, mode=0o644):
+    """
+    FA: نوشتن اتمیک فایل (فایل موقت + rename)
+    EN: Write a file atomically: temp file in the same directory, fsync, rename
+    """
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=directory)
     try:
-        out = subprocess.check_output(["ip", "route"], text=True)
-        if "default via" in out:
-            for line in out.splitlines():
-                if "default via" in line and iface in line:
-                    gw = line.split()[2]
-                    if gw.startswith("10.") or gw.startswith("192.168."):
-                        warnings.append(Tget("iface_gateway"))
-    except:
-        pass
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
 
-    # ---- Virtualization detection ----
+def _file_digest(path):
+    import hashlib
     try:
-        ethtool = subprocess.check_output(
-            ["ethtool", "-i", iface],
-            stderr=subprocess.DEVNULL,
-            text=True
-        )
-        if "virtual" in ethtool.lower():
-            warnings.append(Tget("iface_nat"))
-            warnings.append(Tget("iface_nat_warn"))
-    except:
-        pass
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
 
-    return warnings
+def compile_oui(sources, index_path=None, text_path=None):
+    """
+    FA: ساخت ایندکس OUI از فایل‌های محلی؛ فقط در صورت تغییر محتوا بازنویسی می‌شود
+    EN: Compile local registry files into oui.idx (and the oui.db text
+        fallback). Each file is rewritten atomically, and only when its
+        content hash differs from what is on disk.
+        Returns (prefix count, list of rewritten paths).
+    """
+    import hashlib
+    index_path = index_path or OUI_INDEX_FILE
+    text_path = text_path or OUI_DB_FILE
 
+    records = {}
+    for src in sources:
+        for bits, prefix, vendor in iter_oui_records(src):
+            records[(bits, prefix)] = vendor
 
+    index = build_oui_index((b, p, v) for (b, p), v in records.items())
+    text = "".join(
+        f"{p:0{b // 4}X}|{v}\n" for (b, p), v in sorted(records.items(), key=lambda r: (r[0][1] << (48 - r[0][0]), r[0][0]))
+    ).encode("utf-8")
 
-# =========================================================
-# ===================== Dynamic Network ===================
-# =========================================================
-def detect_network_range():
-    try:
-        iface = get_interface()
-        out = subprocess.check_output(["ip", "-4", "addr", "show", iface], text=True)
-        for line in out.splitlines():
-            if "inet " in line:
-                cidr = line.split()[1]
-                return ipaddress.ip_network(cidr, strict=False)
-    except:
-        pass
-    return ipaddress.ip_network("192.168.1.0/24")
+    written = []
+    for path, data in ((index_path, index), (text_path, text)):
+        if _file_digest(path) != hashlib.sha256(data).hexdigest():
+            write_atomic(path, data)
+            written.append(path)
+    return len(records), written
 
-# =========================================================
-# ===================== OUI DB =============================
-# =========================================================
-_OUI_CACHE = None
+def load_oui_index():
+    """
+    FA: باز کردن ایندکس دودویی در صورت وجود (یک‌بار)
+    EN: Open oui.idx once; None when missing or unreadable
+    """
+    global _OUI_INDEX
+    if _OUI_INDEX is None:
+        with METRICS.phase("oui_load"):
+            try:
+                _OUI_INDEX = OuiIndex(OUI_INDEX_FILE)
+            except (OSError, ValueError):
+                _OUI_INDEX = False
+    return _OUI_INDEX or None
 
 def load_oui_db():
     global _OUI_CACHE
@@ -366,7 +726,7 @@ def load_oui_db():
     if not os.path.exists(OUI_DB_FILE):
         return _OUI_CACHE
 
-    with open(OUI_DB_FILE, "r", encoding="utf-8", errors="ignore") as f:
+    with METRICS.phase("oui_load"), open(OUI_DB_FILE, "r", encoding="utf-8", errors="ignore") as f:
         for line in f:
             if "|" in line:
                 oui, vendor = line.strip().split("|", 1)
@@ -375,24 +735,234 @@ def load_oui_db():
 
 def get_vendor(mac):
     mac_hex = normalize_mac(mac)
-    if not mac_hex:
+    if not mac_hex or len(mac_hex) != 12:
         return "Unknown"
     if is_locally_administered(mac_hex):
         return "Randomized / Locally Administered"
-    return load_oui_db().get(mac_hex[:6], "Unknown")
+
+    index = load_oui_index()
+    if index is not None:
+        return index.lookup(int(mac_hex, 16)) or "Unknown"
+
+    # FA: فایل متنی: کلیدهای ۹، ۷ یا ۶ رقمی (MA-S / MA-M / MA-L)
+    # EN: text fallback: 9, 7 or 6 hex digit keys (MA-S / MA-M / MA-L)
+    db = load_oui_db()
+    for digits in (9, 7, 6):
+        vendor = db.get(mac_hex[:digits])
+        if vendor:
+            return vendor
+    return "Unknown"
 
 # =========================================================
-# ===================== System ===========================
+# ===================== Netlink ===========================
 # =========================================================
-def get_interface():
+NETLINK_ROUTE = 0
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x01
+NLM_F_DUMP = 0x300
+
+RTM_NEWADDR = 20
+RTM_GETADDR = 22
+RTM_NEWROUTE = 24
+RTM_GETROUTE = 26
+RTM_NEWNEIGH = 28
+RTM_DELNEIGH = 29
+RTM_GETNEIGH = 30
+
+NDA_DST, NDA_LLADDR = 1, 2
+RTA_DST, RTA_OIF, RTA_GATEWAY, RTA_PRIORITY, RTA_PREFSRC, RTA_TABLE = 1, 4, 5, 6, 7, 15
+IFA_ADDRESS, IFA_LOCAL, IFA_LABEL = 1, 2, 3
+RT_TABLE_MAIN = 254
+
+NUD_STATES = {
+    0x01: "INCOMPLETE",
+    0x02: "REACHABLE",
+    0x04: "STALE",
+    0x08: "DELAY",
+    0x10: "PROBE",
+    0x20: "FAILED",
+    0x40: "NOARP",
+    0x80: "PERMANENT",
+}
+NUD_NOARP = 0x40
+
+def nl_attrs(data, offset):
+    """
+    FA: خواندن ویژگی‌های rtattr پیام نت‌لینک
+    EN: Parse netlink route attributes into {type: payload}
+    """
+    attrs = {}
+    end = len(data)
+    while offset + 4 <= end:
+        rta_len, rta_type = struct.unpack_from("HH", data, offset)
+        if rta_len < 4:
+            break
+        attrs[rta_type & 0x3FFF] = data[offset + 4:offset + rta_len]
+        offset += (rta_len + 3) & ~3
+    return attrs
+
+def nl_messages(buf):
+    """
+    FA: جدا کردن پیام‌های نت‌لینک در یک بافر
+    EN: Split a netlink datagram into (type, message) pairs
+    """
+    offset = 0
+    while offset + 16 <= len(buf):
+        msg_len, msg_type = struct.unpack_from("IH", buf, offset)
+        if msg_len < 16:
+            break
+        yield msg_type, buf[offset:offset + msg_len]
+        offset += (msg_len + 3) & ~3
+
+def nl_dump(msg_type, header):
+    """
+    FA: ارسال درخواست dump به rtnetlink و برگرداندن همه پاسخ‌ها
+    EN: Send an rtnetlink dump request and yield (type, message) for
+        every reply until NLMSG_DONE. Raises OSError on failure.
+    """
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    try:
+        sock.bind((0, 0))
+        seq = int(time.time()) & 0xFFFFFFFF
+        sock.send(struct.pack("IHHII", 16 + len(header), msg_type,
+                              NLM_F_REQUEST | NLM_F_DUMP, seq, 0) + header)
+        while True:
+            buf = sock.recv(65536)
+            if not buf:
+                return
+            for m_type, msg in nl_messages(buf):
+                if m_type == NLMSG_DONE:
+                    return
+                if m_type == NLMSG_ERROR:
+                    err = struct.unpack_from("i", msg, 16)[0]
+                    if err:
+                        raise OSError(-err, os.strerror(-err))
+                    return
+                yield m_type, msg
+    finally:
+        sock.close()
+
+def _ifname(index):
+    try:
+        return socket.if_indextoname(index)
+    except OSError:
+        return str(index)
+
+def _ip_from_bytes(raw):
+    if len(raw) == 4:
+        return socket.inet_ntop(socket.AF_INET, raw)
+    if len(raw) == 16:
+        return socket.inet_ntop(socket.AF_INET6, raw)
+    return None
+
+def parse_neigh_msg(msg):
+    """
+    FA: تبدیل پیام RTM_NEWNEIGH به رکورد
+    EN: Decode an RTM_NEWNEIGH/RTM_DELNEIGH message into a neighbor record
+    """
+    family, ifindex, state, flags, ntype = struct.unpack_from("BxxxiHBB", msg, 16)
+    attrs = nl_attrs(msg, 28)
+    ip = _ip_from_bytes(attrs.get(NDA_DST, b""))
+    lladdr = attrs.get(NDA_LLADDR)
+    return {
+        "ip": ip,
+        "mac": format_mac(lladdr) if lladdr and len(lladdr) == 6 else None,
+        "state": NUD_STATES.get(state, "NONE"),
+        "nud": state,
+        "family": family,
+        "iface": _ifname(ifindex),
+    }
+
+def nl_neighbors(family=socket.AF_UNSPEC):
+    """
+    FA: جدول همسایه‌ها (ARP/NDP) با وضعیت دقیق
+    EN: Kernel neighbor table with exact NUD states (REACHABLE/STALE/...)
+    """
+    header = struct.pack("BxxxiHBB", family, 0, 0, 0, 0)
+    return [parse_neigh_msg(msg) for t, msg in nl_dump(RTM_GETNEIGH, header)
+            if t == RTM_NEWNEIGH]
+
+def nl_routes(family=socket.AF_INET):
+    """
+    FA: جدول مسیریابی اصلی
+    EN: Routes of the main table as dicts (dst, dst_len, gateway, iface, metric)
+    """
+    routes = []
+    header = struct.pack("BBBBBBBBI", family, 0, 0, 0, 0, 0, 0, 0, 0)
+    for t, msg in nl_dump(RTM_GETROUTE, header):
+        if t != RTM_NEWROUTE:
+            continue
+        _, dst_len, _, _, table, _, _, rtype, _ = struct.unpack_from("BBBBBBBBI", msg, 16)
+        attrs = nl_attrs(msg, 28)
+        if RTA_TABLE in attrs:
+            table = struct.unpack("I", attrs[RTA_TABLE])[0]
+        if table != RT_TABLE_MAIN:
+            continue
+        oif = attrs.get(RTA_OIF)
+        routes.append({
+            "dst": _ip_from_bytes(attrs.get(RTA_DST, b"")),
+            "dst_len": dst_len,
+            "gateway": _ip_from_bytes(attrs.get(RTA_GATEWAY, b"")),
+            "prefsrc": _ip_from_bytes(attrs.get(RTA_PREFSRC, b"")),
+            "iface": _ifname(struct.unpack("I", oif)[0]) if oif else None,
+            "metric": struct.unpack("I", attrs[RTA_PRIORITY])[0] if RTA_PRIORITY in attrs else 0,
+        })
+    return routes
+
+def nl_addresses(family=socket.AF_INET):
+    """
+    FA: آدرس‌های اینترفیس‌ها
+    EN: Interface addresses as dicts (iface, address, prefixlen, label)
+    """
+    addrs = []
+    header = struct.pack("BBBBI", family, 0, 0, 0, 0)
+    for t, msg in nl_dump(RTM_GETADDR, header):
+        if t != RTM_NEWADDR:
+            continue
+        a_family, prefixlen, _, scope, index = struct.unpack_from("BBBBI", msg, 16)
+        attrs = nl_attrs(msg, 24)
+        raw = attrs.get(IFA_LOCAL) or attrs.get(IFA_ADDRESS, b"")
+        addrs.append({
+            "iface": _ifname(index),
+            "address": _ip_from_bytes(raw),
+            "prefixlen": prefixlen,
+            "scope": scope,
+            "family": a_family,
+            "label": attrs.get(IFA_LABEL, b"").rstrip(b"\0").decode(errors="ignore"),
+        })
+    return addrs
+
+def default_route():
+    """
+    FA: مسیر پیش‌فرض (اینترفیس، گیت‌وی)؛ ابتدا netlink و سپس ip route
+    EN: (iface, gateway) of the default route, netlink first, `ip route` fallback
+    """
+    try:
+        defaults = [r for r in nl_routes() if r["dst_len"] == 0 and r["iface"]]
+        if defaults:
+            best = min(defaults, key=lambda r: r["metric"])
+            return best["iface"], best["gateway"]
+        return None, None
+    except OSError:
+        pass
+
     try:
         out = subprocess.check_output(["ip", "route"], text=True)
         for l in out.splitlines():
-            if l.startswith("default"):
-                return l.split()[l.split().index("dev") + 1]
+            parts = l.split()
+            if parts and parts[0] == "default" and "dev" in parts:
+                gw = parts[parts.index("via") + 1] if "via" in parts else None
+                return parts[parts.index("dev") + 1], gw
     except:
         pass
-    return "unknown"
+    return None, None
+
+# =========================================================
+# ===================== System ===========================
+# =========================================================
+def get_interface():
+    return get_env().default_iface or "unknown"
 
 def get_my_ip():
     try:
@@ -411,28 +981,213 @@ def get_my_mac(iface):
     except:
         return None
 
+# =========================================================
+# ===================== Environment =======================
+# =========================================================
+RTNLGRP_LINK = 1
+RTNLGRP_IPV4_IFADDR = 5
+RTNLGRP_IPV4_ROUTE = 7
+ENV_TTL = 30.0  # FA: فقط وقتی نت‌لینک در دسترس نیست / EN: only without netlink
+
+class EnvSnapshot:
+    """
+    FA: تصویر یک‌باره از محیط شبکه یک اینترفیس
+    EN: What a scan needs to know about one interface - default route,
+        gateway, address/network, MAC, wireless and virtual flags, local
+        IP - collected once over netlink and sysfs. get_env() hands out
+        cached snapshots until a link, address or route change arrives.
+    """
+
+    def __init__(self, iface=None):
+        self.built_at = time.monotonic()
+        self.default_iface, gateway = default_route()
+        self.iface = iface or self.default_iface or "unknown"
+        self.gateway = gateway if self.default_iface == self.iface else None
+        self.address, self.prefixlen = self._read_address()
+        self.network = None
+        if self.address:
+            self.network = ipaddress.ip_network(f"{self.address}/{self.prefixlen}", strict=False)
+        self.mac = get_my_mac(self.iface)
+        self.wireless = os.path.exists(f"/sys/class/net/{self.iface}/wireless")
+        self._virtual = None
+
+    def _read_address(self):
+        try:
+            for a in nl_addresses():
+                if a["iface"] == self.iface and a["address"]:
+                    return a["address"], a["prefixlen"]
+            return None, None
+        except OSError:
+            pass
+
+        try:
+            out = subprocess.check_output(["ip", "-4", "addr", "show", self.iface],
+                                          text=True, stderr=subprocess.DEVNULL)
+            for line in out.splitlines():
+                if "inet " in line:
+                    addr, prefix = line.split()[1].split("/")
+                    return addr, int(prefix)
+        except:
+            pass
+        return None, None
+
+    @property
+    def virtual(self):
+        """
+        FA: خروجی ethtool فقط یک‌بار در هر تصویر خوانده می‌شود
+        EN: ethtool is only run the first time this is asked for
+        """
+        if self._virtual is None:
+            self._virtual = False
+            try:
+                ethtool = subprocess.check_output(
+                    ["ethtool", "-i", self.iface],
+                    stderr=subprocess.DEVNULL,
+                    text=True
+                )
+                self._virtual = "virtual" in ethtool.lower()
+            except:
+                pass
+        return self._virtual
+
+    @property
+    def local_ip(self):
+        return self.address or get_my_ip()
+
+    def warnings(self):
+        """
+        FA: هشدارهای حالت اینترفیس (Wi-Fi / گیت‌وی / مجازی)
+        EN: Interface mode warnings (Wi-Fi / gateway / virtual NIC)
+        """
+        warnings = []
+        if self.wireless:
+            warnings.append(Tget("iface_wifi"))
+        gw = self.gateway
+        if gw and (gw.startswith("10.") or gw.startswith("192.168.")):
+            warnings.append(Tget("iface_gateway"))
+        if self.virtual:
+            warnings.append(Tget("iface_nat"))
+            warnings.append(Tget("iface_nat_warn"))
+        return warnings
+
+_ENV_CACHE = {}
+_ENV_WATCH = None
+_ENV_LOCK = threading.Lock()
+
+def _env_changed():
+    """
+    FA: آیا از آخرین بررسی، لینک/آدرس/مسیری تغییر کرده است؟
+    EN: True when a link, address or route notification arrived since
+        the last call (drains the subscription socket)
+    """
+    global _ENV_WATCH
+    if _ENV_WATCH is None:
+        try:
+            _ENV_WATCH = nl_subscribe(RTNLGRP_LINK, RTNLGRP_IPV4_IFADDR, RTNLGRP_IPV4_ROUTE)
+            _ENV_WATCH.setblocking(False)
+        except OSError:
+            _ENV_WATCH = False
+        return True
+    if _ENV_WATCH is False:
+        return False
+
+    changed = False
+    while True:
+        try:
+            if not _ENV_WATCH.recv(65536):
+                break
+            changed = True
+        except (BlockingIOError, InterruptedError):
+            break
+        except OSError:
+            # FA: سرریز بافر (ENOBUFS): پیام‌هایی از دست رفته‌اند
+            # EN: ENOBUFS - notifications were lost, assume a change
+            changed = True
+            break
+    return changed
+
+def get_env(iface=None):
+    """
+    FA: تصویر محیط برای iface (پیش‌فرض: اینترفیس مسیر پیش‌فرض)
+    EN: Cached EnvSnapshot for `iface` (default: the default-route
+        interface), rebuilt after network changes
+    """
+    with _ENV_LOCK:
+        if _env_changed():
+            _ENV_CACHE.clear()
+        env = _ENV_CACHE.get(iface)
+        if env is None or (_ENV_WATCH is False and time.monotonic() - env.built_at > ENV_TTL):
+            env = EnvSnapshot(iface)
+            _ENV_CACHE[iface] = env
+            if iface is None:
+                _ENV_CACHE[env.iface] = env
+        return env
+
 # =========================================================
 # ===================== ARP ===============================
 # =========================================================
-def read_arp():
+def read_neighbors(family=socket.AF_INET):
+    """
+    FA: جدول همسایه‌های کرنل؛ ابتدا netlink و در صورت خطا خروجی ip neigh
+    EN: Kernel neighbor table over rtnetlink, falling back to parsing
+        `ip neigh`. Entries carry ip, mac (None when unresolved) and the
+        NUD state as "neigh", plus the interface. IPv4 (ARP) by default;
+        pass AF_INET6 for the NDP table.
+    """
     entries = []
     try:
-        out = subprocess.check_output(["ip", "neigh"], text=True)
+        for n in nl_neighbors(family):
+            if not n["ip"] or n["nud"] & NUD_NOARP:
+                continue
+            entries.append({"ip": n["ip"], "mac": n["mac"], "neigh": n["state"],
+                            "iface": n["iface"]})
+        return entries
+    except OSError:
+        pass
+
+    try:
+        out = subprocess.check_output(
+            ["ip", "-6" if family == socket.AF_INET6 else "-4", "neigh"], text=True)
         for line in out.splitlines():
             parts = line.split()
-            ip = parts[0]
-            mac = "<incomplete>"
+            mac = None
             if "lladdr" in parts:
                 mac = parts[parts.index("lladdr") + 1]
-            entries.append({
-                "ip": ip,
-                "mac": mac,
-                "vendor": get_vendor(mac)
-            })
+            state = parts[-1] if parts[-1] in NUD_STATES.values() else "NONE"
+            iface = parts[parts.index("dev") + 1] if "dev" in parts else None
+            entries.append({"ip": parts[0], "mac": mac, "neigh": state, "iface": iface})
     except:
         pass
     return entries
 
+def timed_read_neighbors():
+    """
+    FA: خواندن جدول همسایه همراه با ثبت زمان آن
+    EN: read_neighbors() charged to the "arp_read" phase, with its latency
+        recorded in the neighbor_read histogram
+    """
+    with METRICS.phase("arp_read"):
+        started = time.perf_counter()
+        entries = read_neighbors()
+        METRICS.observe("neighbor_read", time.perf_counter() - started, buckets=READ_BUCKETS)
+    return entries
+
+def read_arp():
+    """
+    FA: جدول ARP همراه با سازنده؛ MAC نامعلوم به‌صورت <incomplete>
+    EN: Neighbor table with vendors; unresolved MACs read "<incomplete>"
+    """
+    entries = []
+    for n in read_neighbors():
+        mac = n["mac"] or "<incomplete>"
+        entries.append({
+            "ip": n["ip"],
+            "mac": mac,
+            "vendor": get_vendor(mac),
+            "neigh": n["neigh"]
+        })
+    return entries
+
 
 
 
@@ -474,13 +1229,20 @@ def network_range_flow():
     FA: تشخیص، نمایش، تغییر و ذخیره رنج شبکه
     EN: Detect, show, change and persist network range
     """
-    # FA: اگر قبلاً ذخیره شده، اولویت دارد
-    saved = load_network_range()
-    net = saved if saved else detect_network_range()
+    # FA: رنج خط فرمان، سپس رنج ذخیره‌شده اولویت دارد
+    # EN: a --range given on the command line wins, then the saved range
+    if NETSCAN_RANGE:
+        print(f"\n[INFO] {Tget('range_detected')} : {NETSCAN_RANGE}")
+        return NETSCAN_RANGE
+
+    with METRICS.phase("range"):
+        saved = load_network_range()
+        net = saved if saved else detect_network_range(NETSCAN_IFACE)
 
     print(f"\n[INFO] {Tget('range_detected')} : {net}")
 
-    ans = input(f"[?] {Tget('range_change')} ").strip().lower()
+    with METRICS.phase("prompt"):
+        ans = input(f"[?] {Tget('range_change')} ").strip().lower()
 
     if ans == "y":
         print(FG_YELLOW + Tget("range_back") + RESET)
@@ -497,124 +1259,4593 @@ def network_range_flow():
 
 
 # =========================================================
-# ===================== Scan ==============================
+# ===================== Targets ===========================
 # =========================================================
-def perform_scan():
-    global NETWORK_BASE, START, END
+TARGET_ORDERS = ("linear", "shuffle", "interleave")
+INTERLEAVE_STRIDE = 256
 
-    iface = get_interface()
-    net = network_range_flow()
-    if net is None:
-        return
-    
-    
+def parse_target(token, hosts_only=True):
+    """
+    FA: تبدیل یک عبارت هدف (CIDR، بازه یا IP) به بازه عددی
+    EN: Turn one target token into an inclusive (start, end) integer range.
+        Accepts CIDR (10.0.0.0/16), ranges (10.0.0.1-10.0.0.50 or
+        10.0.0.1-50) and single addresses. With `hosts_only`, network and
+        broadcast addresses of CIDR blocks larger than /31 are skipped.
+    """
+    token = token.strip()
+    if "/" in token:
+        net = ipaddress.IPv4Network(token, strict=False)
+        first, last = int(net.network_address), int(net.broadcast_address)
+        if hosts_only and net.prefixlen < 31:
+            first, last = first + 1, last - 1
+        return first, last
+    if "-" in token:
+        lo, hi = token.split("-", 1)
+        first = int(ipaddress.IPv4Address(lo))
+        if "." in hi:
+            last = int(ipaddress.IPv4Address(hi))
+        else:
+            # FA: شکل کوتاه فقط آخرین اکتت را تعیین می‌کند
+            # EN: the short form only sets the last octet
+            octet = int(hi)
+            if not 0 <= octet <= 255:
+                raise ValueError(f"bad range end: {token}")
+            last = (first & 0xFFFFFF00) | octet
+        if last < first:
+            raise ValueError(f"empty range: {token}")
+        return first, last
+    ip = int(ipaddress.IPv4Address(token))
+    return ip, ip
 
+def _merge_ranges(ranges):
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return merged
 
+def _subtract_ranges(ranges, holes):
+    out = []
+    holes = _merge_ranges(holes)
+    for first, last in ranges:
+        for h_first, h_last in holes:
+            if h_last < first or h_first > last:
+                continue
+            if h_first > first:
+                out.append([first, h_first - 1])
+            first = h_last + 1
+            if first > last:
+                break
+        if first <= last:
+            out.append([first, last])
+    return out
 
-    if net is None:
-        return
-    print(f"\n[INFO] {T['range_detected']} : {net}")
-    ans = input(f"[?] {T['range_change']} ").strip().lower()
-    if ans == "y":
-        print(FG_YELLOW + T["range_back"] + RESET)
-        time.sleep(1)
-        return
+class TargetPlan:
+    """
+    FA: برنامه اهداف اسکن؛ ترکیبی از CIDR، بازه و استثنا که آدرس‌ها را
+        به‌صورت تنبل و با حافظه ثابت تولید می‌کند
+    EN: Scan target planner. Holds the targets as a handful of merged
+        integer ranges and produces addresses lazily, so memory stays
+        constant however large the range is.
 
-    NETWORK_BASE = str(net.network_address).rsplit(".", 1)[0] + "."
-    START = 1
-    END = net.num_addresses - 2
+        Specs are comma/space separated tokens (see parse_target);
+        tokens prefixed with "!" are exclusions.
 
-    for w in detect_interface_mode(iface):
-        print(FG_YELLOW + "[WARN] " + w + RESET)
+        order:
+          linear     - ascending addresses
+          shuffle    - a seeded affine permutation of the whole plan
+          interleave - one address per /24 in turn (.1 of every block,
+                       then .2, ...), spreading load across the range
+    """
 
-    my_ip = get_my_ip()
-    my_mac_raw = get_my_mac(iface)
-    my_vendor = get_vendor(my_mac_raw)
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    def __init__(self, spec, exclude=(), order="linear", seed=None):
+        if isinstance(spec, str):
+            spec = spec.replace(",", " ").split()
+        include, holes = [], []
+        for token in spec:
+            token = str(token)
+            if token.startswith("!"):
+                holes.append(parse_target(token[1:], hosts_only=False))
+            else:
+                include.append(parse_target(token))
+        if isinstance(exclude, str):
+            exclude = exclude.replace(",", " ").split()
+        holes.extend(parse_target(str(t), hosts_only=False) for t in exclude)
 
-    print(f"\n[INFO] {T['info_interface']} : {iface}")
-    print(f"[INFO] {T['info_network']} : {net}")
-    print(f"[INFO] {T['info_started']} : {now}\n")
+        if order not in TARGET_ORDERS:
+            raise ValueError(f"unknown target order: {order}")
+        self.order = order
+        self.seed = seed
+        self.ranges = [tuple(r) for r in _subtract_ranges(_merge_ranges(include), holes)]
+        self._offsets = []
+        total = 0
+        for first, last in self.ranges:
+            self._offsets.append(total)
+            total += last - first + 1
+        self.size = total
 
-    print(FG_CYAN + BOLD + "[Local Device]" + RESET)
-    print(f"IP     : {my_ip}")
-    print(f"MAC    : {my_mac_raw}")
-    print(f"Vendor : {my_vendor}\n")
+    def __len__(self):
+        return self.size
 
-    print(f"[+] {T['scan_start']}")
+    def __contains__(self, ip):
+        if isinstance(ip, str):
+            ip = ip_to_int(ip)
+        i = bisect.bisect_right(self.ranges, (ip, 0xFFFFFFFF)) - 1
+        return i >= 0 and self.ranges[i][0] <= ip <= self.ranges[i][1]
 
-    ping_ok = {}
-    for i in range(START, END + 1):
-        ip = f"{NETWORK_BASE}{i}"
-        r = subprocess.run(
-            ["ping", "-c", "1", "-W", PING_TIMEOUT, ip],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
+    def __iter__(self):
+        return (int_to_ip(n) for n in self.iter_ints())
+
+    def __str__(self):
+        return ", ".join(
+            int_to_ip(a) if a == b else f"{int_to_ip(a)}-{int_to_ip(b)}"
+            for a, b in self.ranges
         )
-        ping_ok[ip] = (r.returncode == 0)
-        percent = int(((i-START+1)/(END-START+1))*100)
-        sys.stdout.write(f"\rScanning {ip}... {percent}%")
-        sys.stdout.flush()
-        time.sleep(BASE_DELAY)
 
-    print(f"\n[+] {T['ping_done']}")
-    time.sleep(ARP_DELAY)
+    def within(self, network):
+        """
+        FA: زیرمجموعه‌ای از برنامه که داخل یک شبکه است
+        EN: New plan (same order) holding only the targets inside `network`
+        """
+        net = ipaddress.IPv4Network(str(network), strict=False)
+        lo, hi = int(net.network_address), int(net.broadcast_address)
+        tokens = [f"{int_to_ip(max(a, lo))}-{int_to_ip(min(b, hi))}"
+                  for a, b in self.ranges if a <= hi and b >= lo]
+        return TargetPlan(tokens, order=self.order, seed=self.seed)
 
-    print(f"\n[+] {T['arp_read']}\n")
-    arp = read_arp()
+    def index(self, ip):
+        """
+        FA: موقعیت یک آدرس در برنامه خطی (یا None)
+        EN: Position of `ip` in the linear order, or None if not planned
+        """
+        if isinstance(ip, str):
+            ip = ip_to_int(ip)
+        r = bisect.bisect_right(self.ranges, (ip, 0xFFFFFFFF)) - 1
+        if r < 0 or ip > self.ranges[r][1]:
+            return None
+        return self._offsets[r] + ip - self.ranges[r][0]
 
-    active, arp_only, incomplete = [], [], []
+    def ip_at(self, index):
+        """
+        FA: آدرس عددی در موقعیت index از برنامه خطی
+        EN: Integer address at position `index` of the linear order
+        """
+        r = bisect.bisect_right(self._offsets, index) - 1
+        return self.ranges[r][0] + index - self._offsets[r]
 
-    for d in arp:
-        if d["ip"] == my_ip:
-            continue
-        if d["mac"] == "<incomplete>":
-            incomplete.append(d)
-        elif ping_ok.get(d["ip"]):
-            active.append(d)
+    def iter_indices(self):
+        """
+        FA: ترتیب پیمایش موقعیت‌ها بر اساس order
+        EN: Positions 0..size-1 in plan order, generated on the fly
+        """
+        n = self.size
+        if self.order == "shuffle" and n > 2:
+            import random
+            rng = random.Random(self.seed)
+            step = rng.randrange(1, n)
+            while math.gcd(step, n) != 1:
+                step = rng.randrange(1, n)
+            start = rng.randrange(n)
+            return ((start + i * step) % n for i in range(n))
+        if self.order == "interleave" and n > INTERLEAVE_STRIDE:
+            stride = INTERLEAVE_STRIDE
+            return (j + k * stride
+                    for j in range(stride)
+                    for k in range((n - j + stride - 1) // stride))
+        return iter(range(n))
+
+    def iter_ints(self):
+        if self.order == "linear":
+            return (n for first, last in self.ranges for n in range(first, last + 1))
+        return (self.ip_at(i) for i in self.iter_indices())
+
+# =========================================================
+# ===================== Pacing ============================
+# =========================================================
+class RateController:
+    """
+    FA: کنترل نرخ ارسال و زمان انتظار بر اساس RTT و از‌دست‌رفتن پاسخ‌ها
+    EN: Adaptive send rate and probe timeout.
+
+        Timeout follows RFC 6298: SRTT/RTTVAR are smoothed from every
+        reply and the timeout is SRTT + 4*RTTVAR, clamped to
+        [RTO_MIN, RTO_MAX]; before the first sample it is `timeout`.
+
+        Rate is AIMD: +RATE_STEP pps for every RATE_INTERVAL without a
+        loss, halved on loss, within [RATE_MIN, max_rate]. A loss is a
+        reply that only arrived for a retransmission, i.e. the earlier
+        probe to a live host was dropped.
+    """
+
+    def __init__(self, max_rate=None, timeout=None):
+        self.max_rate = max(RATE_MIN, int(max_rate or NETSCAN_RATE))
+        self.rate = float(min(RATE_INITIAL, self.max_rate))
+        self.initial_timeout = float(timeout or PROBE_TIMEOUT)
+        self.srtt = None
+        self.rttvar = None
+        self.sent = 0
+        self.replies = 0
+        self.losses = 0
+        self.late = 0
+        self._next_send = 0.0
+        self._grown_at = time.monotonic()
+
+    @property
+    def timeout(self):
+        if self.srtt is None:
+            return self.initial_timeout
+        return min(RTO_MAX, max(RTO_MIN, self.srtt + 4 * self.rttvar))
+
+    def delay(self):
+        """
+        FA: زمان باقی‌مانده تا مجاز شدن ارسال بعدی
+        EN: Seconds until the next probe may be sent
+        """
+        return max(0.0, self._next_send - time.monotonic())
+
+    def on_send(self):
+        now = time.monotonic()
+        if now - self._grown_at >= RATE_INTERVAL:
+            steps = int((now - self._grown_at) / RATE_INTERVAL)
+            self.rate = min(self.max_rate, self.rate + steps * RATE_STEP)
+            self._grown_at += steps * RATE_INTERVAL
+        self._next_send = max(self._next_send, now - 1.0 / self.rate) + 1.0 / self.rate
+        self.sent += 1
+
+    def on_reply(self, rtt, retransmitted=False):
+        self.replies += 1
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
         else:
-            arp_only.append(d)
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        if retransmitted:
+            self.on_loss()
 
-    for title, data, icon in [
-        (T["active"], active, "✅"),
-        (T["arp_only"], arp_only, "⚠️"),
-        (T["incomplete"], incomplete, "❌")
-    ]:
-        print(f"\n========== {title} ==========")
-        for d in data:
-            print(f"{icon} {d['ip']}  {d['mac']}  [{d['vendor']}]")
+    def on_late(self, rtt):
+        """
+        FA: پاسخ دیررس؛ زمان انتظار کوتاه بوده است
+        EN: A reply to a probe that had already timed out: feed the
+            sample so the timeout grows, but it is not a loss
+        """
+        self.late += 1
+        self.on_reply(rtt)
 
-    total = len(active) + len(arp_only) + len(incomplete)
-    print(f"\n{T['total']}: {total}")
-    print(f"{T['total_self']}: {total + 1}")
-    print(f"[✓] {T['done']}")
-    input(T["press_enter"])
+    def on_loss(self):
+        self.losses += 1
+        self.rate = max(RATE_MIN, self.rate / 2)
+        self._grown_at = time.monotonic()
+
+    def summary(self):
+        return {
+            "rate": round(self.rate),
+            "timeout_ms": round(self.timeout * 1000, 1),
+            "srtt_ms": round(self.srtt * 1000, 3) if self.srtt is not None else None,
+            "sent": self.sent,
+            "replies": self.replies,
+            "losses": self.losses,
+            "late": self.late,
+        }
 
 # =========================================================
-# ===================== Menu ==============================
+# ===================== Metrics ===========================
 # =========================================================
-def main_menu():
-    while True:
-        os.system("clear")
+RTT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+READ_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+PHASES = ("range", "prompt", "interface", "sweep", "arp_wait", "arp_read", "classify",
+          "ipv6", "pcap", "checkpoint", "vendor", "oui_load", "render")
 
-        W = box_width()  # FA: پیدا کردن عرض مناسب ترمینال / EN: detect proper terminal width
-        title = T["menu_title"]
+class Histogram:
+    """
+    FA: هیستوگرام با مرزهای ثابت (مطابق Prometheus)
+    EN: Fixed-bucket histogram, rendered the Prometheus way (cumulative)
+    """
 
-        print(FG_CYAN + BOLD + "╔" + "═"*W + "╗" + RESET)
-        print(FG_CYAN + BOLD + "║" + RESET + f"{title:^{W}}" + FG_CYAN + BOLD + "║" + RESET)
-        print(FG_CYAN + BOLD + "╠" + "═"*W + "╣" + RESET)
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
 
-        # FA: منوی اصلی با padding درست / EN: main menu with correct padding
-        print(FG_GREEN  + "║  [1] ▶  " + RESET + pad(T["menu_option_scan"][3:], W-8) + FG_GREEN  + "║" + RESET)
-        print(FG_BLUE   + "║  [2] ⟳  " + RESET + pad(T["menu_option_update"][3:], W-8) + FG_BLUE   + "║" + RESET)
-        print(FG_YELLOW + "║  [3] ✖  " + RESET + pad(T["menu_option_uninstall"][3:], W-8) + FG_YELLOW + "║" + RESET)
-        print(FG_RED    + "║  [4] ⏻  " + RESET + pad(T["menu_option_exit"][3:], W-8) + FG_RED    + "║" + RESET)
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
 
-        print(FG_CYAN + BOLD + "╚" + "═"*W + "╝" + RESET)
+class _Phase:
+    __slots__ = ("metrics", "name", "started")
 
-        try:
-            choice = input("\n" + T["prompt_choice"] + " > ").strip()
-        except KeyboardInterrupt:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = self.metrics._enter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics._leave(self.name, self.started, 1)
+        return False
+
+class Metrics:
+    """
+    FA: شمارنده‌ها، هیستوگرام‌ها و زمان هر مرحله اسکن
+    EN: Counters, histograms and per-phase timing for one scan.
+
+        Phase time is self time: a phase nested inside another (vendor
+        lookups inside classification, OUI loading inside vendor lookups)
+        is subtracted from its parent, so the phases add up to the scan's
+        wall time. Worker threads of --all-interfaces each add their own
+        time, so with several interfaces the sum can exceed wall time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}    # (name, labels) -> value
+            self.histograms = {}  # (name, labels) -> Histogram
+            self.phases = {}      # name -> [seconds, calls]
+            self.started = time.time()
+            self._wall = time.perf_counter()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, n=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, name, value, buckets=RTT_BUCKETS, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def counter(self, name, **labels):
+        """
+        FA: مجموع یک شمارنده (روی همه برچسب‌ها اگر برچسبی داده نشود)
+        EN: Counter value, summed over every label set unless labels are given
+        """
+        if labels:
+            return self.counters.get(self._key(name, labels), 0)
+        return sum(v for (n, _), v in self.counters.items() if n == name)
+
+    # ---- phases ----
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self):
+        self._stack().append(0.0)
+        return time.perf_counter()
+
+    def _leave(self, name, started, calls):
+        elapsed = time.perf_counter() - started
+        stack = self._stack()
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        with self._lock:
+            entry = self.phases.setdefault(name, [0.0, 0])
+            entry[0] += elapsed - nested
+            entry[1] += calls
+
+    def phase(self, name):
+        """
+        FA: زمان‌سنجی یک بلوک: with METRICS.phase("range"): ...
+        EN: Time a block: `with METRICS.phase("range"): ...`
+        """
+        return _Phase(self, name)
+
+    def timed(self, iterable, name):
+        """
+        FA: زمان‌سنجی یک تولیدکننده بدون احتساب زمان مصرف‌کننده
+        EN: Wrap a generator so only the time spent producing items is
+            charged to `name`, not the time the consumer holds them
+        """
+        it = iter(iterable)
+        calls = 1
+        while True:
+            started = self._enter()
+            try:
+                item = next(it)
+            except StopIteration:
+                self._leave(name, started, calls)
+                return
+            except BaseException:
+                self._leave(name, started, calls)
+                raise
+            self._leave(name, started, calls)
+            calls = 0
+            yield item
+
+    @property
+    def wall(self):
+        return time.perf_counter() - self._wall
+
+    # ---- output ----
+    def render(self):
+        """
+        FA: خروجی با قالب textfile پرومتئوس (node_exporter)
+        EN: Prometheus text exposition format, for node_exporter's
+            textfile collector
+        """
+        def fmt_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                            for k, v in pairs)
+            return "{" + body + "}"
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+            phases = sorted(self.phases.items())
+
+        lines = [
+            "# HELP netscan_last_run_timestamp_seconds Start time of the last scan.",
+            "# TYPE netscan_last_run_timestamp_seconds gauge",
+            f"netscan_last_run_timestamp_seconds {self.started:.3f}",
+            "# HELP netscan_duration_seconds Wall time of the last scan.",
+            "# TYPE netscan_duration_seconds gauge",
+            f"netscan_duration_seconds {self.wall:.6f}",
+            "# HELP netscan_phase_seconds Self time spent in each scan phase.",
+            "# TYPE netscan_phase_seconds gauge",
+        ]
+        lines += [f'netscan_phase_seconds{{phase="{name}"}} {sec:.6f}' for name, (sec, _) in phases]
+
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"netscan_{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{fmt_labels(labels)} {value}")
+
+        for (name, labels), hist in histograms:
+            metric = f"netscan_{name}_seconds"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            running = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                running += count
+                lines.append(f"{metric}_bucket{fmt_labels(labels, [('le', bound)])} {running}")
+            lines.append(f"{metric}_bucket{fmt_labels(labels, [('le', '+Inf')])} {hist.count}")
+            lines.append(f"{metric}_sum{fmt_labels(labels)} {hist.sum:.6f}")
+            lines.append(f"{metric}_count{fmt_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        write_atomic(path, self.render().encode("utf-8"))
+
+    def profile(self):
+        """
+        FA: جدول زمان هر مرحله و شمارنده‌های پروب
+        EN: Per-phase breakdown and probe counters as printable lines
+        """
+        wall = self.wall
+        with self._lock:
+            phases = dict(self.phases)
+        order = [p for p in PHASES if p in phases] + sorted(set(phases) - set(PHASES))
+        lines = [f"{'phase':<12}{'seconds':>10}{'share':>8}{'calls':>8}"]
+        for name in order:
+            sec, calls = phases[name]
+            share = sec / wall * 100 if wall else 0.0
+            lines.append(f"{name:<12}{sec:>10.3f}{share:>7.1f}%{calls:>8}")
+        lines.append(f"{'wall':<12}{wall:>10.3f}")
+        lines.append(
+            f"probes sent {self.counter('probes_sent')} · replies {self.counter('replies')} · "
+            f"retries {self.counter('retries')} · timeouts {self.counter('timeouts')}"
+        )
+        for (name, labels), hist in sorted(self.histograms.items()):
+            if hist.count:
+                tag = ",".join(f"{k}={v}" for k, v in labels)
+                lines.append(f"{name}{f'[{tag}]' if tag else ''}: n={hist.count} "
+                             f"mean={hist.sum / hist.count * 1000:.3f} ms")
+        return lines
+
+METRICS = Metrics()
+
+def report_metrics(stream=None):
+    """
+    FA: نوشتن فایل متریک و/یا چاپ پروفایل در پایان اسکن
+    EN: End of a scan: write --metrics-file and print the --profile table
+    """
+    if NETSCAN_METRICS_FILE:
+        try:
+            METRICS.write(NETSCAN_METRICS_FILE)
+        except OSError as e:
+            print(FG_YELLOW + f"[WARN] metrics: {e}" + RESET, file=sys.stderr)
+    if NETSCAN_PROFILE:
+        for line in METRICS.profile():
+            print(f"[PROFILE] {line}", file=stream or sys.stdout)
+
+# =========================================================
+# ===================== Ping Sweep ========================
+# =========================================================
+_PING_TIME_RE = re.compile(r"time[=<]([\d.]+)\s*ms")
+
+def ping_host(ip, timeout=PROBE_TIMEOUT):
+    """
+    FA: پینگ یک میزبان با /bin/ping؛ زمان رفت‌وبرگشت (ثانیه) یا None
+    EN: Ping a single host with /bin/ping, return RTT in seconds or None.
+        ping's -W only takes whole seconds on older iputils, so the
+        timeout is rounded up.
+    """
+    started = time.monotonic()
+    r = subprocess.run(
+        ["ping", "-c", "1", "-W", str(max(1, math.ceil(timeout))), ip],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True
+    )
+    if r.returncode != 0:
+        return None
+    m = _PING_TIME_RE.search(r.stdout or "")
+    if m:
+        return float(m.group(1)) / 1000.0
+    return time.monotonic() - started
+
+def ping_sweep(targets, concurrency=None, pacer=None):
+    """
+    FA: پینگ هم‌زمان با سقف مشخص؛ هر نتیجه به محض آماده شدن برگردانده می‌شود
+    EN: Ping targets with at most `concurrency` probes in flight,
+        yielding (ip, rtt, mac) as soon as each one finishes
+        (rtt is None on no reply; mac is always None for L3 engines).
+        Launches are paced by `pacer`, which also sets the timeout.
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    concurrency = max(1, int(concurrency or NETSCAN_CONCURRENCY))
+    pacer = pacer or RateController()
+    targets = iter(targets)
+
+    def launch(pool, ip):
+        time.sleep(pacer.delay())
+        pacer.on_send()
+        METRICS.inc("probes_sent", engine="ping")
+        return pool.submit(ping_host, ip, pacer.timeout)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = {launch(pool, ip): ip
+                   for ip in itertools.islice(targets, concurrency)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                ip = pending.pop(fut)
+                try:
+                    rtt = fut.result()
+                except Exception:
+                    rtt = None
+                if rtt is not None:
+                    pacer.on_reply(rtt)
+                    METRICS.inc("replies", engine="ping")
+                    METRICS.observe("probe_rtt", rtt, engine="ping")
+                else:
+                    METRICS.inc("timeouts", engine="ping")
+                nxt = next(targets, None)
+                if nxt is not None:
+                    pending[launch(pool, nxt)] = nxt
+                yield ip, rtt, None
+
+# =========================================================
+# ===================== ICMP Engine =======================
+# =========================================================
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+ICMP_WINDOW = 2048
+ICMP_PAYLOAD = b"netscan-arp-insp"
+
+def icmp_checksum(data):
+    """
+    FA: محاسبه checksum استاندارد اینترنت
+    EN: Internet checksum (RFC 1071)
+    """
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+ICMP_IDENTS = itertools.count()
+
+def build_echo_request(ident, seq):
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    csum = icmp_checksum(header + ICMP_PAYLOAD)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, csum, ident, seq) + ICMP_PAYLOAD
+
+def open_icmp_socket():
+    """
+    FA: باز کردن سوکت ICMP؛ ابتدا raw و در صورت نبود دسترسی، سوکت ping بدون امتیاز
+    EN: Open an ICMP socket: raw if we have CAP_NET_RAW, otherwise the
+        unprivileged SOCK_DGRAM ping socket. Returns (sock, is_raw).
+        Raises OSError when neither is allowed.
+    """
+    try:
+        return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP), True
+    except PermissionError:
+        pass
+    return socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP), False
+
+def icmp_sweep(targets, timeout=None, window=None, sock=None, pacer=None, retries=None):
+    """
+    FA: ارسال Echo به همه اهداف از یک سوکت و تطبیق پاسخ‌ها با شناسه/شماره ترتیب
+    EN: Send echo requests to every target from one socket and match
+        replies by identifier/sequence on a single select() loop.
+        Sends are paced and timed out by `pacer`; silent targets are
+        retried up to `retries` times. Yields (ip, rtt, None) as replies
+        arrive or targets give up.
+    """
+    pacer = pacer or RateController(timeout=timeout)
+    retries = NETSCAN_RETRIES if retries is None else retries
+    window = max(1, min(int(window or ICMP_WINDOW), 0x7FFF))
+    if sock is None:
+        sock, is_raw = open_icmp_socket()
+    else:
+        is_raw = sock.type == socket.SOCK_RAW
+    sock.setblocking(False)
+
+    # FA: شناسه جدا برای هر اسکن هم‌زمان / EN: a distinct identifier per concurrent sweep
+    ident = (os.getpid() + next(ICMP_IDENTS)) & 0xFFFF
+    targets = iter(targets)
+    exhausted = False
+    seq = 0
+    sent = {}            # seq -> (ip, sent_at, attempt)
+    pending = {}         # ip -> [attempt, [seqs]]
+    deadlines = deque()  # (deadline, seq) in send order
+    resend = deque()     # ips waiting for a retransmission
+
+    def finish(ip):
+        for s_seq in pending.pop(ip)[1]:
+            sent.pop(s_seq, None)
+
+    try:
+        while True:
+            # ---- send while the pacer allows it ----
+            while pacer.delay() == 0 and (resend or (not exhausted and len(pending) < window)):
+                if resend:
+                    ip = resend[0]
+                    attempt = pending[ip][0] + 1 if pending[ip][1] else 0
+                else:
+                    ip = next(targets, None)
+                    if ip is None:
+                        exhausted = True
+                        break
+                    attempt = 0
+                    pending[ip] = [0, []]
+                    resend.append(ip)
+                seq = (seq + 1) & 0xFFFF
+                while seq in sent:
+                    seq = (seq + 1) & 0xFFFF
+                try:
+                    sock.sendto(build_echo_request(ident, seq), (ip, 0))
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError:
+                    resend.popleft()
+                    finish(ip)
+                    yield ip, None, None
+                    continue
+                resend.popleft()
+                pacer.on_send()
+                METRICS.inc("probes_sent", engine="icmp")
+                if attempt:
+                    METRICS.inc("retries", engine="icmp")
+                now = time.monotonic()
+                sent[seq] = (ip, now, attempt)
+                pending[ip][0] = attempt
+                pending[ip][1].append(seq)
+                deadlines.append((now + pacer.timeout, seq))
+
+            if exhausted and not pending:
+                break
+
+            waits = []
+            if deadlines:
+                waits.append(deadlines[0][0] - time.monotonic())
+            if resend or (not exhausted and len(pending) < window):
+                waits.append(pacer.delay())
+            readable, _, _ = select.select([sock], [], [], max(0.0, min(waits, default=0.0)))
+
+            # ---- drain replies ----
+            while readable:
+                try:
+                    data, addr = sock.recvfrom(2048)
+                except (BlockingIOError, InterruptedError):
+                    break
+                if is_raw:
+                    data = data[(data[0] & 0x0F) * 4:]
+                if len(data) < 8:
+                    continue
+                icmp_type, _, _, r_ident, r_seq = struct.unpack_from("!BBHHH", data)
+                if icmp_type != ICMP_ECHO_REPLY:
+                    continue
+                # FA: سوکت DGRAM شناسه را خودش تعیین می‌کند
+                # EN: the kernel rewrites the identifier on ping sockets
+                if is_raw and r_ident != ident:
+                    continue
+                entry = sent.get(r_seq)
+                if entry is None or entry[0] != addr[0] or entry[0] not in pending:
+                    continue
+                ip, sent_at, attempt = entry
+                rtt = time.monotonic() - sent_at
+                latest = pending[ip][0]
+                if attempt < latest:
+                    pacer.on_late(rtt)
+                    METRICS.inc("late_replies", engine="icmp")
+                else:
+                    pacer.on_reply(rtt, retransmitted=attempt > 0)
+                METRICS.inc("replies", engine="icmp")
+                METRICS.observe("probe_rtt", rtt, engine="icmp")
+                if ip in resend:
+                    resend.remove(ip)
+                finish(ip)
+                yield ip, rtt, None
+
+            # ---- expire: retry or give up ----
+            now = time.monotonic()
+            while deadlines and deadlines[0][0] <= now:
+                _, s_seq = deadlines.popleft()
+                entry = sent.get(s_seq)
+                if entry is None:
+                    continue
+                ip, _, attempt = entry
+                if pending.get(ip, [None])[0] != attempt:
+                    continue
+                if attempt < retries:
+                    resend.append(ip)
+                else:
+                    finish(ip)
+                    METRICS.inc("timeouts", engine="icmp")
+                    yield ip, None, None
+    finally:
+        sock.close()
+
+# =========================================================
+# ===================== ARP Engine ========================
+# =========================================================
+ETH_P_ARP = 0x0806
+ETH_P_IP = 0x0800
+ARP_REQUEST = 1
+ARP_REPLY = 2
+ARP_RETRIES = 2
+ARP_LISTEN = RTO_MIN
+BROADCAST_MAC = b"\xff" * 6
+SIOCGIFADDR = 0x8915
+
+def get_iface_ipv4(iface):
+    """
+    FA: آدرس IPv4 اینترفیس بدون اجرای دستور خارجی
+    EN: IPv4 address of an interface via SIOCGIFADDR, or None
+    """
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            res = fcntl.ioctl(s.fileno(), SIOCGIFADDR,
+                              struct.pack("256s", iface[:15].encode()))
+        finally:
+            s.close()
+        return socket.inet_ntoa(res[20:24])
+    except Exception:
+        return None
+
+def mac_to_bytes(mac):
+    return bytes.fromhex(normalize_mac(mac) or "000000000000")
+
+def format_mac(raw):
+    return ":".join(f"{b:02x}" for b in raw)
+
+def build_arp_request(src_mac, src_ip, dst_ip):
+    """
+    FA: ساخت فریم ARP who-has
+    EN: Build a broadcast ARP who-has Ethernet frame
+    """
+    return (
+        BROADCAST_MAC + src_mac + struct.pack("!H", ETH_P_ARP)
+        + struct.pack("!HHBBH", 1, ETH_P_IP, 6, 4, ARP_REQUEST)
+        + src_mac + src_ip + b"\0" * 6 + dst_ip
+    )
+
+def arp_sweep(iface, targets, retries=ARP_RETRIES, listen=ARP_LISTEN, window=None, pacer=None):
+    """
+    FA: اسکن فعال ARP روی AF_PACKET؛ حضور لایه ۲ و MAC در یک مرحله
+    EN: Active ARP scan over an AF_PACKET socket bound to `iface`.
+        Each target gets up to 1 + `retries` who-has frames; the listen
+        window starts at `listen` seconds and then follows the pacer's
+        RTT-based timeout. is-at replies are collected directly from the
+        wire. Yields (ip, rtt, mac) - rtt and mac are None for silent
+        targets. A later reply from a different MAC for an answered
+        target is yielded once more, so IP conflicts are not lost.
+    """
+    window = max(1, int(window or ICMP_WINDOW))
+    pacer = pacer or RateController(timeout=listen)
+    src_mac = mac_to_bytes(get_my_mac(iface))
+    src_ip = socket.inet_aton(get_iface_ipv4(iface) or "0.0.0.0")
+
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+    try:
+        sock.bind((iface, ETH_P_ARP))
+        sock.setblocking(False)
+
+        targets = iter(targets)
+        queue = deque()      # (ip, tries) waiting to be (re)sent
+        inflight = {}        # packed ip -> [ip, first_sent, tries, deadline]
+        answered = {}        # packed ip -> [ip, first_sent, {mac, ...}]
+        deadlines = deque()  # (deadline, packed ip)
+        exhausted = False
+
+        while True:
+            # ---- send: retries first, then fresh targets ----
+            while pacer.delay() == 0 and (len(inflight) < window or queue):
+                if queue:
+                    ip, tries = queue[0]
+                    if tries and socket.inet_aton(ip) not in inflight:
+                        # FA: پاسخ پیش از ارسال مجدد رسید
+                        # EN: answered while the retry was queued - don't resend
+                        queue.popleft()
+                        continue
+                elif not exhausted:
+                    ip = next(targets, None)
+                    if ip is None:
+                        exhausted = True
+                        break
+                    tries = 0
+                    queue.append((ip, tries))
+                else:
+                    break
+                try:
+                    packed = socket.inet_aton(ip)
+                    sock.send(build_arp_request(src_mac, src_ip, packed))
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError:
+                    queue.popleft()
+                    yield ip, None, None
+                    continue
+                queue.popleft()
+                pacer.on_send()
+                METRICS.inc("probes_sent", engine="arp")
+                if tries:
+                    METRICS.inc("retries", engine="arp")
+                now = time.monotonic()
+                deadline = now + pacer.timeout
+                entry = inflight.get(packed)
+                if entry is None:
+                    inflight[packed] = [ip, now, tries + 1, deadline, now]
+                else:
+                    entry[2] = tries + 1
+                    entry[3] = deadline
+                    entry[4] = now
+                deadlines.append((deadline, packed))
+
+            if exhausted and not inflight and not queue:
+                break
+
+            waits = [deadlines[0][0] - time.monotonic()] if deadlines else []
+            if queue or (not exhausted and len(inflight) < window):
+                waits.append(max(pacer.delay(), 0.001 if queue else 0.0))
+            readable, _, _ = select.select([sock], [], [], max(0.0, min(waits, default=0.0)))
+
+            # ---- collect is-at replies ----
+            while readable:
+                try:
+                    frame = sock.recv(128)
+                except (BlockingIOError, InterruptedError):
+                    break
+                if len(frame) < 42 or frame[12:14] != b"\x08\x06":
+                    continue
+                if struct.unpack_from("!H", frame, 20)[0] != ARP_REPLY:
+                    continue
+                entry = inflight.pop(frame[28:32], None)
+                if entry is None:
+                    # FA: پاسخ دوم از MAC دیگر = تداخل IP
+                    # EN: a second MAC answering for the same IP is a conflict
+                    seen = answered.get(frame[28:32])
+                    if seen is not None and frame[22:28] not in seen[2]:
+                        seen[2].add(frame[22:28])
+                        yield seen[0], time.monotonic() - seen[1], format_mac(frame[22:28])
+                    continue
+                now = time.monotonic()
+                answered[frame[28:32]] = [entry[0], entry[1], {frame[22:28]}]
+                pacer.on_reply(now - entry[4], retransmitted=entry[2] > 1)
+                METRICS.inc("replies", engine="arp")
+                METRICS.observe("probe_rtt", now - entry[4], engine="arp")
+                yield entry[0], now - entry[1], format_mac(frame[22:28])
+
+            # ---- retry or give up ----
+            now = time.monotonic()
+            while deadlines and deadlines[0][0] <= now:
+                _, packed = deadlines.popleft()
+                entry = inflight.get(packed)
+                if entry is None or entry[3] > now:
+                    continue
+                if entry[2] <= retries:
+                    queue.append((entry[0], entry[2]))
+                else:
+                    del inflight[packed]
+                    METRICS.inc("timeouts", engine="arp")
+                    yield entry[0], None, None
+    finally:
+        sock.close()
+
+# =========================================================
+# ===================== TCP Engine ========================
+# =========================================================
+TCP_FD_RESERVE = 64
+# FA: هم SYN-ACK (اتصال) و هم RST (رد اتصال) یعنی میزبان روشن است
+# EN: both a SYN-ACK (connected) and a RST (refused) prove the host is up
+TCP_ALIVE_ERRNOS = (0, errno.ECONNREFUSED)
+
+def parse_ports(spec):
+    """
+    FA: خواندن فهرست پورت‌ها مثل "22,80,443"
+    EN: Parse a port list such as "22,80,443"; raises ValueError
+    """
+    ports = []
+    for token in str(spec).replace(" ", "").split(","):
+        if not token:
+            continue
+        port = int(token)
+        if not 0 < port < 65536:
+            raise ValueError(f"invalid port: {token}")
+        if port not in ports:
+            ports.append(port)
+    if not ports:
+        raise ValueError("empty port list")
+    return tuple(ports)
+
+def tcp_sweep(targets, ports=None, concurrency=None, pacer=None):
+    """
+    FA: پروب زنده بودن با اتصال TCP غیرمسدود به چند پورت
+    EN: Liveness probe with non-blocking TCP connects to a few `ports`
+        per target, all driven by one selector. A host is alive on the
+        first SYN-ACK or RST from any port; its other connects are then
+        dropped. At most `concurrency` targets are in flight (also bounded
+        by the open-file limit); connects are paced and timed out by
+        `pacer`. Yields (ip, rtt, None) as hosts answer or give up.
+    """
+    ports = tuple(ports or NETSCAN_TCP_PORTS)
+    pacer = pacer or RateController()
+    concurrency = max(1, int(concurrency or NETSCAN_CONCURRENCY))
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY:
+        concurrency = max(1, min(concurrency, (soft - TCP_FD_RESERVE) // len(ports)))
+
+    sel = selectors.DefaultSelector()
+    targets = iter(targets)
+    exhausted = False
+    hosts = {}           # ip -> [sockets, started]
+    deadlines = deque()  # (deadline, ip) in launch order
+
+    def finish(ip):
+        for s in hosts.pop(ip)[0]:
+            sel.unregister(s)
+            s.close()
+
+    def launch(ip):
+        # FA: True = زنده، False = پاسخی نیست، None = در انتظار
+        # EN: True = alive right away, False = no port reachable, None = pending
+        socks = []
+        for port in ports:
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.setblocking(False)
+            pacer.on_send()
+            METRICS.inc("probes_sent", engine="tcp")
+            try:
+                err = s.connect_ex((ip, port))
+            except OSError as e:
+                err = e.errno
+            if err == errno.EINPROGRESS:
+                sel.register(s, selectors.EVENT_WRITE, ip)
+                socks.append(s)
+                continue
+            s.close()
+            if err in TCP_ALIVE_ERRNOS:
+                for p in socks:
+                    sel.unregister(p)
+                    p.close()
+                return True
+        if not socks:
+            return False
+        started = time.monotonic()
+        hosts[ip] = [socks, started]
+        deadlines.append((started + pacer.timeout, ip))
+        return None
+
+    try:
+        while True:
+            # ---- launch while the pacer and the window allow it ----
+            while not exhausted and len(hosts) < concurrency and pacer.delay() == 0:
+                ip = next(targets, None)
+                if ip is None:
+                    exhausted = True
+                    break
+                state = launch(ip)
+                if state is True:
+                    METRICS.inc("replies", engine="tcp")
+                    yield ip, 0.0, None
+                elif state is False:
+                    yield ip, None, None
+
+            if exhausted and not hosts:
+                break
+
+            waits = [deadlines[0][0] - time.monotonic()] if deadlines else []
+            if not exhausted and len(hosts) < concurrency:
+                waits.append(pacer.delay())
+            events = sel.select(max(0.0, min(waits, default=0.0))) if hosts else []
+            if not hosts and waits:
+                time.sleep(max(0.0, min(waits)))
+
+            # ---- completed connects ----
+            for key, _ in events:
+                s, ip = key.fileobj, key.data
+                entry = hosts.get(ip)
+                if entry is None or s not in entry[0]:
+                    continue
+                err = s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if err in TCP_ALIVE_ERRNOS:
+                    rtt = time.monotonic() - entry[1]
+                    pacer.on_reply(rtt)
+                    METRICS.inc("replies", engine="tcp")
+                    METRICS.observe("probe_rtt", rtt, engine="tcp")
+                    finish(ip)
+                    yield ip, rtt, None
+                    continue
+                # FA: این پورت شکست خورد (مثلاً host unreachable)
+                # EN: this port failed (e.g. host unreachable), try the others
+                entry[0].remove(s)
+                sel.unregister(s)
+                s.close()
+                if not entry[0]:
+                    del hosts[ip]
+                    yield ip, None, None
+
+            # ---- give up on silent hosts ----
+            now = time.monotonic()
+            while deadlines and deadlines[0][0] <= now:
+                _, ip = deadlines.popleft()
+                if ip in hosts:
+                    finish(ip)
+                    METRICS.inc("timeouts", engine="tcp")
+                    yield ip, None, None
+    finally:
+        for ip in list(hosts):
+            finish(ip)
+        sel.close()
+
+# =========================================================
+# ===================== IPv6 Discovery ====================
+# =========================================================
+ICMP6_ECHO_REQUEST = 128
+ICMP6_ECHO_REPLY = 129
+ND_NEIGHBOR_SOLICIT = 135
+ND_NEIGHBOR_ADVERT = 136
+ND_OPT_SOURCE_LL = 1
+ND_OPT_TARGET_LL = 2
+ALL_NODES = "ff02::1"
+V6_LISTEN = 1.0
+V6_ECHO_ROUNDS = 2  # FA: تکرار برای پاسخ‌های گم‌شده / EN: repeat once for lost replies
+
+def iface_ipv6(iface):
+    """
+    FA: آدرس‌های IPv6 یک اینترفیس
+    EN: (address, prefixlen) pairs of `iface`, link-local first
+    """
+    addrs = []
+    try:
+        addrs = [(a["address"], a["prefixlen"]) for a in nl_addresses(socket.AF_INET6)
+                 if a["iface"] == iface and a["address"]]
+    except OSError:
+        try:
+            out = subprocess.check_output(["ip", "-6", "-o", "addr", "show", "dev", iface], text=True)
+            for line in out.splitlines():
+                parts = line.split()
+                if "inet6" in parts:
+                    addr, prefix = parts[parts.index("inet6") + 1].split("/")
+                    addrs.append((addr, int(prefix)))
+        except:
+            pass
+    return sorted(addrs, key=lambda a: not a[0].startswith("fe80"))
+
+def solicited_node(addr):
+    """
+    FA: آدرس چندپخشی solicited-node یک آدرس
+    EN: Solicited-node multicast group of `addr` (ff02::1:ffXX:XXXX)
+    """
+    raw = socket.inet_pton(socket.AF_INET6, addr)
+    return socket.inet_ntop(socket.AF_INET6, b"\xff\x02" + b"\0" * 9 + b"\x01\xff" + raw[13:])
+
+def build_neighbor_solicit(target, src_mac):
+    # FA: چک‌سام را کرنل برای سوکت خام ICMPv6 حساب می‌کند
+    # EN: the kernel fills in the checksum on raw ICMPv6 sockets
+    return (struct.pack("!BBHI", ND_NEIGHBOR_SOLICIT, 0, 0, 0)
+            + socket.inet_pton(socket.AF_INET6, target)
+            + bytes((ND_OPT_SOURCE_LL, 1)) + mac_to_bytes(src_mac))
+
+def _nd_lladdr(msg, offset, kind):
+    # FA: گزینه آدرس لایه پیوند در پیام ND / EN: link-layer address option of an ND message
+    while offset + 8 <= len(msg):
+        o_type, o_len = msg[offset], msg[offset + 1] * 8
+        if not o_len:
+            break
+        if o_type == kind and o_len >= 8:
+            return format_mac(msg[offset + 2:offset + 8])
+        offset += o_len
+    return None
+
+def _ipv6_candidates(lladdr, prefixes):
+    """
+    FA: آدرس‌های سراسری احتمالی با همان شناسه اینترفیس لینک‌محلی
+    EN: Global addresses that reuse the interface identifier of a
+        link-local address (EUI-64 and other stable IIDs), one per
+        on-link /64 prefix
+    """
+    iid = socket.inet_pton(socket.AF_INET6, lladdr)[8:]
+    return [socket.inet_ntop(socket.AF_INET6, prefix + iid) for prefix in prefixes]
+
+def _ipv6_ping_fallback(iface, listen):
+    # FA: بدون سوکت خام: ping سیستم به ff02::1 جدول NDP را پر می‌کند
+    # EN: without a raw socket, /bin/ping to ff02::1 still fills the NDP table
+    found = {}
+    try:
+        out = subprocess.run(
+            ["ping", "-6", "-n", "-c", str(V6_ECHO_ROUNDS), "-i", "0.2",
+             "-w", str(max(1, math.ceil(listen))), f"{ALL_NODES}%{iface}"],
+            capture_output=True, text=True).stdout
+    except OSError:
+        return found
+    for line in out.splitlines():
+        m = re.search(r"from ([0-9a-fA-F:]+)(?:%\S+)?: .*" + _PING_TIME_RE.pattern, line)
+        if m and m.group(1) not in found:
+            found[m.group(1)] = {"mac": None, "rtt": float(m.group(2)) / 1000}
+    return found
+
+def ipv6_discover(iface, listen=V6_LISTEN):
+    """
+    FA: کشف میزبان‌های IPv6 یک لینک با یک رفت‌وبرگشت چندپخشی
+    EN: Find the IPv6 hosts on `iface` in one multicast round trip
+        instead of a sweep (a /64 cannot be swept):
+
+          - one ICMPv6 echo to ff02::1 from each of our addresses; every
+            node answers from its address of the matching scope, so the
+            link-local and the global addresses both show up;
+          - for every link-local that answers, a neighbor solicitation to
+            the solicited-node group of the same interface identifier
+            under each on-link /64, which finds EUI-64 / stable global
+            addresses that did not answer the echo themselves;
+          - neighbor solicitations and advertisements seen meanwhile, and
+            finally the kernel NDP table, give the MACs.
+
+        Returns {address: {"mac", "rtt", "neigh"}}, our own addresses
+        left out. Needs CAP_NET_RAW for the raw ICMPv6 socket; without
+        it, /bin/ping to ff02::1 and the NDP table are used instead.
+    """
+    with METRICS.phase("ipv6"):
+        mine = iface_ipv6(iface)
+        if not mine or not mine[0][0].startswith("fe80"):
+            return {}  # FA: IPv6 روی این اینترفیس خاموش است / EN: IPv6 is off on this link
+        own = {addr for addr, _ in mine}
+        prefixes = [socket.inet_pton(socket.AF_INET6, a)[:8] for a, plen in mine
+                    if plen == 64 and not a.startswith("fe80")]
+        ifindex = socket.if_nametoindex(iface)
+        my_mac = get_my_mac(iface)
+
+        try:
+            sock = socket.socket(socket.AF_INET6, socket.SOCK_RAW, socket.IPPROTO_ICMPV6)
+        except PermissionError:
+            found = _ipv6_ping_fallback(iface, listen)
+            sock = None
+        if sock is not None:
+            found = {}
+            try:
+                found = _ipv6_listen(sock, iface, ifindex, mine, prefixes, my_mac, listen)
+            finally:
+                sock.close()
+
+        for n in read_neighbors(socket.AF_INET6):
+            ip = n["ip"].split("%")[0]
+            if n["iface"] != iface or not n["mac"] or ip.startswith("ff") or ip in own:
+                continue
+            host = found.setdefault(ip, {"mac": None, "rtt": None})
+            host["mac"] = host["mac"] or n["mac"]
+            host["neigh"] = n["neigh"]
+        for ip in own:
+            found.pop(ip, None)
+        return found
+
+def _ipv6_listen(sock, iface, ifindex, mine, prefixes, my_mac, listen):
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, iface.encode())
+    sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_IF, ifindex)
+    sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_LOOP, 0)
+    # FA: ND فقط با hop limit برابر 255 پذیرفته می‌شود
+    # EN: ND messages are only accepted with a hop limit of 255
+    sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_HOPS, 255)
+    sock.setblocking(False)
+    ident = os.getpid() & 0xFFFF
+    own = {addr for addr, _ in mine}
+    found = {}
+    solicited = set()
+    sent_at = {}
+
+    def send(payload, src, dst):
+        info = socket.inet_pton(socket.AF_INET6, src) + struct.pack("@I", ifindex)
+        try:
+            sock.sendmsg([payload], [(socket.IPPROTO_IPV6, socket.IPV6_PKTINFO, info)],
+                       0, (dst, 0, 0, ifindex))
+            METRICS.inc("probes_sent", engine="icmp6")
+        except OSError:
+            pass  # FA: مثلاً آدرس هنوز tentative است / EN: e.g. a still tentative address
+
+    def echo_round(seq):
+        for n, (src, _) in enumerate(mine):
+            sent_at[seq * len(mine) + n] = time.monotonic()
+            send(struct.pack("!BBHHH", ICMP6_ECHO_REQUEST, 0, 0, ident, seq * len(mine) + n)
+                 + ICMP_PAYLOAD, src, ALL_NODES)
+
+    def saw(ip, mac=None, rtt=None):
+        if ip in own or ip == "::":
+            return
+        host = found.get(ip)
+        if host is None:
+            host = found[ip] = {"mac": None, "rtt": None}
+            # FA: پرسش solicited-node برای MAC این آدرس و آدرس‌های سراسری هم‌شناسه
+            # EN: solicit this address (for its MAC) and, for a link-local,
+            #     the global addresses sharing its interface identifier
+            targets = [] if mac else [ip]
+            if ip.startswith("fe80") and prefixes:
+                targets += _ipv6_candidates(ip, prefixes)
+            for target in targets:
+                if my_mac and target not in solicited and target not in own:
+                    solicited.add(target)
+                    src = mine[0][0] if target.startswith("fe80") else mine[-1][0]
+                    send(build_neighbor_solicit(target, my_mac), src, solicited_node(target))
+        host["mac"] = mac or host["mac"]
+        if rtt is not None and host["rtt"] is None:
+            host["rtt"] = rtt
+            METRICS.inc("replies", engine="icmp6")
+            METRICS.observe("probe_rtt", rtt, engine="icmp6")
+
+    rounds = 1
+    echo_round(0)
+    deadline = time.monotonic() + listen
+    while True:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        if rounds < V6_ECHO_ROUNDS and now >= deadline - listen / 2:
+            echo_round(rounds)
+            rounds += 1
+        ready, _, _ = select.select([sock], [], [], min(deadline - now, listen / 2))
+        if not ready:
+            continue
+        while True:
+            try:
+                msg, addr = sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                break
+            if len(msg) < 8:
+                continue
+            src = addr[0].split("%")[0]
+            kind = msg[0]
+            if kind == ICMP6_ECHO_REPLY:
+                r_ident, r_seq = struct.unpack_from("!HH", msg, 4)
+                if r_ident == ident and r_seq in sent_at:
+                    saw(src, rtt=time.monotonic() - sent_at[r_seq])
+            elif kind == ND_NEIGHBOR_ADVERT and len(msg) >= 24:
+                target = socket.inet_ntop(socket.AF_INET6, msg[8:24])
+                saw(target, _nd_lladdr(msg, 24, ND_OPT_TARGET_LL))
+            elif kind == ND_NEIGHBOR_SOLICIT and len(msg) >= 24:
+                saw(src, _nd_lladdr(msg, 24, ND_OPT_SOURCE_LL))
+    return found
+
+def attach_ipv6(records, iface):
+    """
+    FA: افزودن آدرس‌های IPv6 به رکوردهای IPv4 بر اساس MAC
+    EN: Pass IPv4 records through, adding an "ipv6" list to every host
+        whose MAC also answered on IPv6; then yield one record for each
+        IPv6-only device (method "icmp6"). Discovery runs in a thread
+        alongside the IPv4 sweep; records that arrive before it is done
+        are held back (the sweep keeps running meanwhile) and released
+        together once the IPv6 addresses are known.
+    """
+    found = {}
+
+    def discover():
+        try:
+            found.update(ipv6_discover(iface))
+        except OSError as e:
+            print(FG_YELLOW + f"[WARN] IPv6 {iface}: {e}" + RESET, file=sys.stderr)
+
+    worker = threading.Thread(target=discover, daemon=True)
+    worker.start()
+    held = []
+    by_mac = None
+    emitted = set()
+
+    def annotate(rec):
+        if rec["mac"] in by_mac:
+            rec["ipv6"] = by_mac[rec["mac"]]
+            emitted.add(rec["mac"])
+        return rec
+
+    for rec in records:
+        if by_mac is None:
+            if worker.is_alive():
+                held.append(rec)
+                continue
+            by_mac = _group_ipv6(found)
+            for early in held:
+                yield annotate(early)
+            held = None
+        yield annotate(rec)
+
+    if by_mac is None:
+        worker.join()
+        by_mac = _group_ipv6(found)
+        for early in held:
+            yield annotate(early)
+    for mac, addrs in by_mac.items():
+        if mac in emitted:
+            continue
+        rtts = [found[a]["rtt"] for a in addrs if found[a]["rtt"] is not None]
+        rec = make_record(addrs[0], mac, "active", min(rtts) if rtts else None,
+                          found[addrs[0]].get("neigh"), "icmp6")
+        rec["ipv6"] = addrs
+        yield rec
+
+def _group_ipv6(found):
+    # FA: گروه‌بندی آدرس‌ها بر اساس MAC، سراسری‌ها اول
+    # EN: addresses grouped by MAC, global ones first
+    by_mac = {}
+    for ip, host in found.items():
+        if host["mac"]:
+            by_mac.setdefault(host["mac"], []).append(ip)
+    for addrs in by_mac.values():
+        addrs.sort(key=lambda a: (a.startswith("fe80"), a))
+    return by_mac
+
+# ===================== Probe Selection =====================
+PROBE_METHODS = ("auto", "icmp", "ping", "arp", "tcp")
+
+def resolve_probe(method=None, iface=None):
+    """
+    FA: تعیین موتوری که واقعاً اجرا می‌شود
+    EN: The engine that will actually run for `method`: "auto" prefers
+        the in-process ICMP engine and falls back to /bin/ping when
+        sockets are not permitted; "arp" needs the local interface and
+        CAP_NET_RAW, without them it behaves like "auto". Raises OSError
+        when "icmp" was asked for explicitly and is not available.
+    """
+    method = method or NETSCAN_PROBE
+    if method in ("ping", "tcp"):
+        return method
+    if method == "arp" and iface and iface != "unknown":
+        try:
+            socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0).close()
+            return "arp"
+        except OSError:
+            pass
+    try:
+        open_icmp_socket()[0].close()
+        return "icmp"
+    except OSError:
+        if method == "icmp":
+            raise
+    return "ping"
+
+def run_sweep(targets, method=None, iface=None, pacer=None):
+    """
+    FA: اجرای موتور پروب انتخاب‌شده (نگاه کنید به resolve_probe)
+    EN: Dispatch to the probe engine chosen by resolve_probe(). `pacer`
+        (a RateController) is shared so the caller can report the rate
+        and timeout that were used.
+    """
+    engine = resolve_probe(method, iface)
+    if engine == "arp":
+        # FA: پنجره شنود ARP از مقدار کوتاه‌تر شروع می‌شود
+        # EN: ARP starts from its own, shorter listen window
+        if pacer is not None and pacer.srtt is None:
+            pacer.initial_timeout = min(pacer.initial_timeout, ARP_LISTEN)
+        return arp_sweep(iface, targets, pacer=pacer)
+    if engine == "icmp":
+        return icmp_sweep(targets, pacer=pacer)
+    if engine == "tcp":
+        return tcp_sweep(targets, pacer=pacer)
+    return ping_sweep(targets, pacer=pacer)
+
+# =========================================================
+# ===================== Journal ===========================
+# =========================================================
+JOURNAL_VERSION = 1
+JOURNAL_MIN = 1024        # FA: بازه‌های کوچک ژورنال ندارند / EN: small plans are not journaled
+JOURNAL_BLOCK = 512       # FA: بایت‌های بیت‌مپ در هر خط / EN: bitmap bytes per line (4096 targets)
+JOURNAL_COMPACT = 4       # FA: بازنویسی پس از چند برابر بیت‌مپ / EN: rewrite after this many bitmaps
+
+class ScanJournal:
+    """
+    FA: ژورنال پیشرفت اسکن برای ادامه پس از قطع شدن
+    EN: Append-only progress journal of one sweep, so an interrupted
+        scan can be resumed. It holds a bitmap of completed targets,
+        indexed by linear position in the plan so the order does not
+        matter, plus the answers received so far. Every `interval`
+        seconds the new answers and the bitmap blocks that changed are
+        appended as text lines:
+
+          {"journal": 1, "plan": ..., "iface": ..., "engine": ...}
+          A <ip> <rtt> <mac|->
+          B <byte offset> <base64 bitmap block>
+
+        Answers are written before the bitmap, so a torn write can only
+        cause a target to be probed again, never lose an answer. Once
+        the appended blocks outweigh JOURNAL_COMPACT full bitmaps (a
+        shuffled order touches every block), the journal is rewritten
+        as one snapshot.
+    """
+
+    def __init__(self, path, plan, iface, engine, interval=None):
+        self.path = path
+        self.plan = plan
+        self.header = {"journal": JOURNAL_VERSION, "plan": str(plan), "iface": iface, "engine": engine}
+        self.interval = NETSCAN_CHECKPOINT if interval is None else interval
+        self.bitmap = bytearray((len(plan) + 7) // 8)
+        self.dirty = set()   # bitmap blocks changed since the last checkpoint
+        self.answers = []    # journal lines not written yet
+        self.kept = []       # answer lines already written, for compaction
+        self.replay = []     # (ip, rtt, mac) from the interrupted run
+        self.done = 0
+        self.appended = 0    # bitmap bytes appended since the last snapshot
+        self._file = None
+        self._next = time.monotonic() + self.interval
+
+    def open(self, resume=False):
+        """
+        FA: شروع ژورنال تازه یا ادامه ژورنال قبلی با همان برنامه
+        EN: Continue the journal at `path` when `resume` is set and it
+            belongs to the same plan/interface/engine, else start a new
+            one. Returns True when a previous run was loaded.
+        """
+        loaded = resume and self._load()
+        self._file = open(self.path, "a" if loaded else "w", encoding="utf-8")
+        if not loaded:
+            self._file.write(json.dumps(self.header) + "\n")
+            self._file.flush()
+        return loaded
+
+    def _load(self):
+        import base64
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                if json.loads(f.readline() or "null") != self.header:
+                    return False
+                for line in f:
+                    if not line.endswith("\n"):
+                        break  # FA: خط نیمه‌کاره / EN: torn last line
+                    parts = line.split()
+                    if parts[0] == "A" and len(parts) == 4:
+                        mac = None if parts[3] == "-" else parts[3]
+                        self.replay.append((parts[1], float(parts[2]), mac))
+                        self.kept.append(line)
+                    elif parts[0] == "B" and len(parts) == 3:
+                        offset = int(parts[1])
+                        block = base64.b64decode(parts[2])
+                        for k, b in enumerate(block, offset):
+                            self.bitmap[k] |= b
+        except (OSError, ValueError, IndexError):
+            self.replay, self.kept = [], []
+            self.bitmap = bytearray(len(self.bitmap))
+            return False
+        self.done = sum(bin(b).count("1") for b in self.bitmap)
+        return True
+
+    def pending(self):
+        """
+        FA: اهداف باقی‌مانده به ترتیب برنامه
+        EN: Targets not completed yet, in plan order
+        """
+        bitmap, plan = self.bitmap, self.plan
+        return (int_to_ip(plan.ip_at(i)) for i in plan.iter_indices()
+                if not bitmap[i >> 3] & (1 << (i & 7)))
+
+    def mark(self, ip, rtt, mac):
+        i = self.plan.index(ip)
+        if i is not None:
+            self.bitmap[i >> 3] |= 1 << (i & 7)
+            self.dirty.add(i // (JOURNAL_BLOCK * 8))
+        if rtt is not None:
+            self.answers.append(f"A {ip} {rtt:.6f} {mac or '-'}\n")
+        if time.monotonic() >= self._next:
+            try:
+                self.checkpoint()
+            except OSError as e:
+                # FA: خطای دیسک اسکن را متوقف نمی‌کند / EN: a full disk must not stop the scan
+                print(FG_YELLOW + f"[WARN] checkpoints disabled: {e}" + RESET, file=sys.stderr)
+                self._next = math.inf
+
+    def record(self, sweep):
+        """
+        FA: پخش پاسخ‌های قبلی و ثبت پاسخ‌های جدید
+        EN: Yield the answers of the interrupted run, then pass `sweep`
+            through, journaling every finished target
+        """
+        yield from self.replay
+        for ip, rtt, mac in sweep:
+            self.mark(ip, rtt, mac)
+            yield ip, rtt, mac
+
+    def _blocks(self, blocks):
+        import base64
+        for b in blocks:
+            start = b * JOURNAL_BLOCK
+            block = bytes(self.bitmap[start:start + JOURNAL_BLOCK])
+            yield f"B {start} {base64.b64encode(block).decode()}\n"
+
+    def checkpoint(self):
+        with METRICS.phase("checkpoint"):
+            self.kept.extend(self.answers)
+            self.appended += len(self.dirty) * JOURNAL_BLOCK
+            if self.appended > JOURNAL_COMPACT * len(self.bitmap) + JOURNAL_BLOCK:
+                self._compact()
+            else:
+                self._file.write("".join(self.answers) + "".join(self._blocks(sorted(self.dirty))))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self.answers = []
+            self.dirty.clear()
+            self._next = time.monotonic() + self.interval
+        METRICS.inc("checkpoints")
+
+    def _compact(self):
+        """
+        FA: بازنویسی ژورنال به‌صورت یک تصویر کامل
+        EN: Replace the journal by header + answers + non-empty blocks
+        """
+        blocks = [b for b in range((len(self.bitmap) + JOURNAL_BLOCK - 1) // JOURNAL_BLOCK)
+                  if any(self.bitmap[b * JOURNAL_BLOCK:(b + 1) * JOURNAL_BLOCK])]
+        data = json.dumps(self.header) + "\n" + "".join(self.kept) + "".join(self._blocks(blocks))
+        self._file.close()
+        try:
+            write_atomic(self.path, data.encode("utf-8"))
+            self.appended = 0
+        finally:
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self, complete):
+        """
+        FA: حذف ژورنال پس از اتمام، یا ذخیره آخرین وضعیت
+        EN: Remove the journal of a finished scan; otherwise write the
+            last checkpoint so --resume can pick it up
+        """
+        if self._file is None:
+            return
+        try:
+            if complete:
+                self._file.close()
+                os.unlink(self.path)
+            else:
+                self.checkpoint()
+                self._file.close()
+        except OSError:
+            pass
+        self._file = None
+
+def open_journal(plan, iface, engine):
+    """
+    FA: ژورنال برای اسکن‌های بزرگ (NETSCAN_CHECKPOINT)
+    EN: Journal for a sweep of `plan`, or None when checkpointing is
+        off, the plan is small or BASE_DIR is not writable. Continues
+        the previous run of the same scan with --resume.
+    """
+    if not NETSCAN_CHECKPOINT or not isinstance(plan, TargetPlan) or len(plan) < JOURNAL_MIN:
+        return None
+    if not os.path.isdir(BASE_DIR):
+        return None
+    import zlib
+    key = zlib.crc32(f"{plan} {engine}".encode())
+    journal = ScanJournal(f"{BASE_DIR}/scan-{iface}-{key:08x}.journal", plan, iface, engine)
+    try:
+        if journal.open(NETSCAN_RESUME):
+            print(f"[INFO] {Tget('resume_from')} : {journal.done}/{len(plan)}", file=sys.stderr)
+    except OSError as e:
+        print(FG_YELLOW + f"[WARN] checkpoints disabled: {e}" + RESET, file=sys.stderr)
+        return None
+    return journal
+
+# =========================================================
+# ===================== Scan Engine =======================
+# =========================================================
+HOST_STATES = ("active", "arp_only", "incomplete")
+NEIGH_REFRESH = 0.25
+
+def make_record(ip, mac, state, rtt=None, neigh=None, method=None):
+    """
+    FA: ساخت رکورد استاندارد یک میزبان
+    EN: Build the host record every consumer sees; `method` is the probe
+        engine that found the host, or "neigh" for neighbor-table entries
+    """
+    if mac == "<incomplete>":
+        mac = None
+    METRICS.inc("hosts", state=state)
+    with METRICS.phase("vendor"):
+        vendor = get_vendor(mac) if mac else "Unknown"
+    return {
+        "ip": ip,
+        "mac": mac,
+        "vendor": vendor,
+        "state": state,
+        "rtt": rtt,
+        "neigh": neigh,
+        "method": method,
+    }
+
+class NeighborLookup:
+    """
+    FA: کش جدول همسایه که حداکثر هر NEIGH_REFRESH ثانیه تازه می‌شود
+    EN: Neighbor table snapshot, re-read at most every NEIGH_REFRESH
+        seconds, used to attach MACs to hosts while the sweep is running
+    """
+
+    def __init__(self, min_interval=NEIGH_REFRESH):
+        self.min_interval = min_interval
+        self.table = {}
+        self.read_at = 0.0
+
+    def get(self, ip):
+        if ip not in self.table and time.monotonic() - self.read_at >= self.min_interval:
+            self.table = {n["ip"]: n for n in timed_read_neighbors()}
+            self.read_at = time.monotonic()
+        return self.table.get(ip)
+
+def scan_hosts(plan, iface, method=None, skip=(), progress=None, pacer=None, only_iface=False,
+               stop=None):
+    """
+    FA: اجرای اسکن و برگرداندن هر میزبان به محض دسته‌بندی
+    EN: Sweep `plan` and yield a host record as soon as each host is
+        classified: hosts that answer with a known MAC right away, the
+        rest of the neighbor table once the sweep is over.
+        `progress(done, total, ip)` is called after every probe; pass a
+        RateController as `pacer` to read the adapted rate afterwards.
+        With `only_iface`, neighbor entries of other interfaces are left out.
+        Setting the threading.Event `stop` ends the sweep after the
+        current probe: no more packets are sent and no records follow.
+        Time spent here is charged to the METRICS phases.
+    """
+    return METRICS.timed(_scan_hosts(plan, iface, method, skip, progress, pacer, only_iface,
+                                     stop), "classify")
+
+def _scan_hosts(plan, iface, method, skip, progress, pacer, only_iface, stop):
+    neighbors = NeighborLookup()
+    emitted = set(skip)
+    claimed = {}  # ip -> MAC of the emitted record
+    pending = {}  # answered, MAC not known yet -> rtt
+    saw_l2 = False
+    total = len(plan)
+    n = 0
+
+    engine = resolve_probe(method, iface)
+    journal = open_journal(plan, iface, engine)
+    complete = False
+    sweep = None
+    try:
+        if journal is None:
+            sweep = run_sweep(plan, engine, iface, pacer)
+        else:
+            # FA: فقط اهداف باقی‌مانده؛ پاسخ‌های قبلی دوباره پخش می‌شوند
+            # EN: only the targets left; earlier answers are replayed first
+            n = journal.done - len(journal.replay)
+            sweep = journal.record(run_sweep(journal.pending(), engine, iface, pacer))
+        sweep = METRICS.timed(sweep, "sweep")
+        for ip, rtt, mac in sweep:
+            if stop is not None and stop.is_set():
+                return
+            if ip in claimed and mac and mac != claimed[ip]:
+                # FA: میزبان دوم برای همان IP؛ گزارش جدا برای بازرس ARP
+                # EN: a second host claims this IP - its own record for the inspector
+                yield make_record(ip, mac, "active", rtt, method=engine)
+                continue
+            n += 1
+            if progress:
+                with METRICS.phase("render"):
+                    progress(n, total, ip)
+            if rtt is None or ip in emitted:
+                continue
+            neigh = None
+            if mac:
+                saw_l2 = True
+            else:
+                entry = neighbors.get(ip)
+                if entry:
+                    mac, neigh = entry["mac"], entry["neigh"]
+            if mac:
+                emitted.add(ip)
+                claimed[ip] = mac
+                yield make_record(ip, mac, "active", rtt, neigh, engine)
+            else:
+                pending[ip] = rtt
+
+        # FA: پاسخ‌های موتور ARP وارد جدول کرنل نمی‌شوند؛ نیازی به انتظار نیست
+        # EN: the ARP engine already saw every MAC on the wire, no need to wait
+        if not saw_l2:
+            with METRICS.phase("arp_wait"):
+                time.sleep(ARP_DELAY)
+
+        for d in timed_read_neighbors():
+            ip = d["ip"]
+            if ip in emitted or (only_iface and d.get("iface") not in (None, iface)):
+                continue
+            emitted.add(ip)
+            rtt = pending.pop(ip, None)
+            if not d["mac"]:
+                state = "incomplete"
+            elif rtt is not None:
+                state = "active"
+            else:
+                state = "arp_only"
+            yield make_record(ip, d["mac"], state, rtt, d["neigh"],
+                              engine if rtt is not None else "neigh")
+
+        # FA: پاسخ داده ولی در جدول همسایه نیست (مثلاً پشت گیت‌وی)
+        # EN: answered but never showed up in the neighbor table (off-link)
+        for ip, rtt in pending.items():
+            yield make_record(ip, None, "active", rtt, method=engine)
+        complete = True
+    finally:
+        # FA: بستن موتور (و سوکت‌هایش) قبل از ژورنال
+        # EN: shut the engine and its sockets before flushing the journal
+        if sweep is not None:
+            sweep.close()
+        if journal is not None:
+            journal.close(complete)
+
+def format_pacing(pacer):
+    """
+    FA: خلاصه نرخ و زمان انتظار انتخاب‌شده
+    EN: One-line summary of the rate and timeout the controller settled on
+    """
+    p = pacer.summary()
+    loss = (p["losses"] / p["replies"] * 100) if p["replies"] else 0.0
+    srtt = f"{p['srtt_ms']:.2f} ms" if p["srtt_ms"] is not None else "-"
+    return (f"{Tget('info_rate')} : {p['rate']} pps · {Tget('info_timeout')} : "
+            f"{p['timeout_ms']:.0f} ms · SRTT : {srtt} · {Tget('info_loss')} : {loss:.1f}%")
+
+def resolve_plan(iface):
+    """
+    FA: تعیین اهداف اسکن بدون پرسش از کاربر
+    EN: Targets for a non-interactive scan: --range, saved range or detected
+    """
+    with METRICS.phase("range"):
+        spec = NETSCAN_RANGE or load_network_range() or detect_network_range(iface)
+        return TargetPlan(str(spec), exclude=NETSCAN_EXCLUDE, order=NETSCAN_ORDER)
+
+# =========================================================
+# ===================== Inspector =========================
+# =========================================================
+INSPECT_WINDOW = 60.0  # FA: دو MAC در این بازه یعنی تداخل / EN: two MACs within this => duplicate IP
+INSPECT_MAC_IPS = 16
+GATEWAY_FILE = f"{BASE_DIR}/gateways.json"
+ALERT_KINDS = ("duplicate_ip", "mac_flip", "gateway_spoof", "mac_many_ips")
+
+class ArpInspector:
+    """
+    FA: بازرس ARP افزایشی: تداخل IP، جعل گیت‌وی و تغییر ناگهانی MAC
+    EN: Incremental ARP inspection over two indexes, IP -> {MAC: last
+        seen} and MAC -> {IP: last seen}, updated in O(1) per
+        observation; entries older than `window` are pruned as they
+        are touched, so memory follows the live network:
+
+          duplicate_ip   two MACs answered for one IP within `window`
+          mac_flip       an IP moved to a new MAC and the old one went quiet
+          gateway_spoof  a gateway IP answered from a MAC other than the
+                         trusted one (remembered between scans)
+          mac_many_ips   one MAC answered for more than `mac_ips` IPs
+                         within `window`
+
+        `gateways` maps gateway IPs to their trusted MAC, or None to
+        trust the first MAC seen. Each finding is reported once.
+        Pass `now` to replay captures on their own clock.
+    """
+
+    def __init__(self, gateways=None, window=INSPECT_WINDOW, mac_ips=INSPECT_MAC_IPS):
+        self.ip_macs = {}   # ip -> {mac: last seen}
+        self.mac_ips = {}   # mac -> {ip: last seen}
+        self.current = {}   # ip -> MAC of the latest sighting
+        self.gateways = dict(gateways or {})
+        self.window = window
+        self.mac_ips_limit = mac_ips
+        self.alerts = []
+        self._raised = set()
+
+    def _alert(self, out, kind, ip, mac, **extra):
+        # FA: تداخل یک بار برای هر جفت MAC؛ «IPهای متعدد» یک بار برای هر MAC
+        # EN: a conflict once per MAC pair, mac_many_ips once per MAC
+        if kind == "duplicate_ip":
+            key = (kind, ip, frozenset((mac, extra["old_mac"])))
+        else:
+            key = (kind, None if kind == "mac_many_ips" else ip, mac)
+        if key in self._raised:
+            return
+        self._raised.add(key)
+        alert = {"alert": kind, "ip": ip, "mac": mac}
+        alert.update(extra)
+        self.alerts.append(alert)
+        METRICS.inc("alerts", kind=kind)
+        out.append(alert)
+
+    def observe(self, ip, mac, now=None):
+        """
+        FA: ثبت یک مشاهده IP/MAC و برگرداندن هشدارهای جدید
+        EN: Record that `mac` answered for `ip`; returns the new alerts
+        """
+        if not ip or not mac:
+            return ()
+        now = time.monotonic() if now is None else now
+        out = []
+        macs = self.ip_macs.get(ip)
+        if macs is None:
+            macs = self.ip_macs[ip] = {}
+        prev = self.current.get(ip)
+
+        if ip in self.gateways:
+            trusted = self.gateways[ip]
+            if trusted is None:
+                self.gateways[ip] = mac
+            elif mac != trusted:
+                also = sorted(self.mac_ips.get(mac, ()))
+                self._alert(out, "gateway_spoof", ip, mac, old_mac=trusted, also_claims=also)
+        elif prev is not None and prev != mac:
+            kind = "duplicate_ip" if now - macs.get(prev, now) < self.window else "mac_flip"
+            self._alert(out, kind, ip, mac, old_mac=prev)
+
+        macs[mac] = now
+        self.current[ip] = mac
+        if len(macs) > 1:
+            # FA: MACهای قدیمی این IP از هر دو فهرست حذف می‌شوند
+            # EN: drop MACs this IP has not had for a window, in both indexes
+            for old in [m for m, seen in macs.items() if m != mac and now - seen >= self.window]:
+                del macs[old]
+                ips = self.mac_ips.get(old)
+                if ips is not None:
+                    ips.pop(ip, None)
+                    if not ips:
+                        del self.mac_ips[old]
+
+        ips = self.mac_ips.get(mac)
+        if ips is None:
+            ips = self.mac_ips[mac] = {}
+        fresh = ip not in ips
+        ips[ip] = now
+        if fresh and len(ips) > self.mac_ips_limit:
+            for old in [i for i, seen in ips.items() if now - seen >= self.window]:
+                del ips[old]
+            if len(ips) > self.mac_ips_limit:
+                self._alert(out, "mac_many_ips", ip, mac, count=len(ips), ips=sorted(ips))
+        return out
+
+def iface_gateways(iface):
+    """
+    FA: گیت‌وی‌های قابل دسترس از یک اینترفیس
+    EN: Next hops of the IPv4 routes through `iface`
+    """
+    try:
+        return {r["gateway"] for r in nl_routes() if r["iface"] == iface and r["gateway"]}
+    except OSError:
+        gateway = get_env(iface).gateway
+        return {gateway} if gateway else set()
+
+def load_gateways(path=None):
+    try:
+        with open(path or GATEWAY_FILE) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {ip: mac for ip, mac in data.items() if isinstance(mac, str)} if isinstance(data, dict) else {}
+
+def save_gateways(inspector, path=None):
+    """
+    FA: ذخیره MAC گیت‌وی‌ها برای مقایسه در اسکن بعدی (نه MAC مشکوک)
+    EN: Remember the gateway MACs for the next scan. A gateway that
+        raised gateway_spoof keeps its old MAC - the suspect one is
+        never learned.
+    """
+    path = path or GATEWAY_FILE
+    if not os.path.isdir(os.path.dirname(path)):
+        return
+    data = load_gateways(path)
+    learned = {ip: mac for ip, mac in inspector.gateways.items() if mac and data.get(ip) != mac}
+    if learned:
+        data.update(learned)
+        try:
+            write_atomic(path, json.dumps(data, indent=1, sort_keys=True).encode("utf-8"))
+        except OSError as e:
+            print(FG_YELLOW + f"[WARN] {path}: {e}" + RESET, file=sys.stderr)
+
+def open_inspector(ifaces=()):
+    """
+    FA: ساخت بازرس با MAC معتبر گیت‌وی‌ها از اسکن‌های قبلی
+    EN: Inspector for a scan of `ifaces`, seeded with the gateway MACs
+        trusted in earlier scans (re-learned with --trust-gateway)
+    """
+    known = {} if NETSCAN_TRUST_GATEWAY else load_gateways()
+    gateways = {}
+    for iface in ifaces:
+        for gateway in iface_gateways(iface):
+            gateways[gateway] = known.get(gateway)
+    return ArpInspector(gateways)
+
+def inspect_records(records, inspector, on_alert=None):
+    """
+    FA: عبور رکوردها از بازرس؛ هشدارها به رکورد اضافه می‌شوند
+    EN: Feed every resolved record to `inspector` on the way through;
+        the kinds it raises are added to the record as "alerts"
+    """
+    for rec in records:
+        if rec["mac"] and rec["state"] != "incomplete":
+            alerts = inspector.observe(rec["ip"], rec["mac"])
+            if alerts:
+                rec["alerts"] = [a["alert"] for a in alerts]
+                if on_alert:
+                    for alert in alerts:
+                        on_alert(alert)
+        yield rec
+
+def format_alert(alert):
+    """
+    FA: متن خوانای یک هشدار
+    EN: One-line description of an alert
+    """
+    kind, ip, mac = alert["alert"], alert["ip"], alert["mac"]
+    text = f"{Tget('alert_' + kind)}: "
+    if kind == "duplicate_ip":
+        text += f"{ip}  {alert['old_mac']} / {mac} [{get_vendor(mac)}]"
+    elif kind == "mac_many_ips":
+        text += f"{mac} [{get_vendor(mac)}] → {alert['count']} IPs"
+    else:
+        text += f"{ip}  {alert['old_mac']} → {mac} [{get_vendor(mac)}]"
+        if alert.get("also_claims"):
+            text += f"  ({', '.join(alert['also_claims'])})"
+    return text
+
+def print_alert(alert, stream=None):
+    print(FG_RED + f"[ALERT] {format_alert(alert)}" + RESET, file=stream or sys.stderr, flush=True)
+
+def render_alerts(inspector):
+    """
+    FA: بخش بازرسی ARP در خروجی تعاملی
+    EN: The ARP inspection section of the interactive output
+    """
+    print(f"\n========== {Tget('inspect_title')} ==========")
+    if not inspector.alerts:
+        print(FG_GREEN + f"✔ {Tget('inspect_clean')}" + RESET)
+    for alert in inspector.alerts:
+        print(FG_RED + f"⛔ {format_alert(alert)}" + RESET)
+
+# =========================================================
+# ===================== Multi-Interface ===================
+# =========================================================
+def _iface_is_up(iface):
+    try:
+        with open(f"/sys/class/net/{iface}/flags") as f:
+            return bool(int(f.read().strip(), 16) & 0x1)
+    except (OSError, ValueError):
+        return True
+
+def list_scan_interfaces():
+    """
+    FA: فهرست اینترفیس‌های فعال دارای IPv4 (به‌جز loopback)
+    EN: Every up, non-loopback interface with an IPv4 address, as
+        (iface, local ip, network) tuples
+    """
+    addrs = []
+    try:
+        addrs = [(a["iface"], a["address"], a["prefixlen"]) for a in nl_addresses()
+                 if a["address"] and a["scope"] != 254]
+    except OSError:
+        try:
+            out = subprocess.check_output(["ip", "-4", "-o", "addr", "show"], text=True)
+            for line in out.splitlines():
+                parts = line.split()
+                if "inet" in parts and "host" not in parts:
+                    addr, prefix = parts[parts.index("inet") + 1].split("/")
+                    addrs.append((parts[1], addr, int(prefix)))
+        except:
+            pass
+
+    found = []
+    seen = set()
+    for iface, addr, prefix in addrs:
+        if iface == "lo" or not _iface_is_up(iface):
+            continue
+        net = ipaddress.ip_network(f"{addr}/{prefix}", strict=False)
+        if (iface, net) in seen:
+            continue
+        seen.add((iface, net))
+        found.append((iface, addr, net))
+    return found
+
+def interface_jobs():
+    """
+    FA: ساخت کار اسکن برای هر اینترفیس
+    EN: One scan job per interface/subnet: (iface, plan, skip, pacer)
+    """
+    locals_ = list_scan_interfaces()
+    mine = {addr for _, addr, _ in locals_}
+    jobs = []
+    for iface, addr, net in locals_:
+        plan = TargetPlan(str(net), exclude=NETSCAN_EXCLUDE, order=NETSCAN_ORDER)
+        if NETSCAN_RANGE:
+            # FA: --range روی هر اینترفیس به زیرشبکه خودش محدود می‌شود
+            # EN: with --range, each interface gets the part inside its subnet
+            plan = TargetPlan(NETSCAN_RANGE, exclude=NETSCAN_EXCLUDE,
+                              order=NETSCAN_ORDER).within(net)
+        if len(plan):
+            jobs.append((iface, plan, mine, RateController()))
+    return jobs
+
+def scan_interfaces(jobs, method=None, progress=None, ipv6=None, stop=None):
+    """
+    FA: اسکن هم‌زمان چند اینترفیس (یک worker برای هر اینترفیس) و ادغام نتایج
+    EN: Scan several interfaces at once - one worker thread per
+        interface - and merge their records into one stream, each
+        tagged with "iface". Wall-clock time is set by the largest
+        subnet, not the sum. `progress(done, total, ip)` sees combined
+        counts. `ipv6` overrides NETSCAN_IPV6. Setting the event `stop`
+        ends every sweep after its current probe.
+    """
+    ipv6 = NETSCAN_IPV6 if ipv6 is None else ipv6
+    total = sum(len(plan) for _, plan, _, _ in jobs)
+    if len(jobs) == 1:
+        iface, plan, skip, pacer = jobs[0]
+        records = scan_hosts(plan, iface, method, skip, progress, pacer, stop=stop)
+        if ipv6:
+            records = attach_ipv6(records, iface)
+        for rec in records:
+            rec["iface"] = iface
+            yield rec
+        return
+
+    results = queue.Queue(maxsize=4096)
+    cancel, stop = stop, threading.Event()
+    lock = threading.Lock()
+    done = [0]
+    finished = object()
+
+    def tick(_done, _total, ip):
+        with lock:
+            done[0] += 1
+            if progress:
+                progress(done[0], total, ip)
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker(iface, plan, skip, pacer):
+        try:
+            records = scan_hosts(plan, iface, method, skip, tick, pacer, only_iface=True,
+                                 stop=stop)
+            if ipv6:
+                records = attach_ipv6(records, iface)
+            for rec in records:
+                rec["iface"] = iface
+                if not put(rec):
+                    return
+        except Exception as e:
+            print(FG_YELLOW + f"[WARN] {iface}: {e}" + RESET, file=sys.stderr)
+        finally:
+            put(finished)
+
+    threads = [threading.Thread(target=worker, args=job, daemon=True) for job in jobs]
+    for t in threads:
+        t.start()
+    running = len(threads)
+    try:
+        while running:
+            try:
+                item = results.get(timeout=0.2)
+            except queue.Empty:
+                if cancel is not None and cancel.is_set():
+                    return
+                continue
+            if item is finished:
+                running -= 1
+                continue
+            yield item
+    finally:
+        stop.set()
+        # FA: انتظار برای بسته شدن سوکت‌های هر worker
+        # EN: wait for every worker to close its sockets
+        for t in threads:
+            t.join()
+
+# =========================================================
+# ===================== Session ===========================
+# =========================================================
+SESSION_BUFFER = 256  # FA: رکوردهای در صف برای مصرف‌کننده async / EN: records queued for an async consumer
+SESSION_POLL = 0.2
+
+class ScanSession:
+    """
+    FA: رابط کتابخانه‌ای اسکن؛ بدون منو، بدون input() و بدون چاپ
+    EN: Library entry point for one scan: no menu, no prompts, no
+        printing. Records stream out as hosts are classified, either
+
+            for host in ScanSession("10.0.0.0/24", "eth0"):
+                ...
+
+        in the calling thread, or from asyncio
+
+            async with ScanSession("10.0.0.0/24", "eth0", method="arp") as scan:
+                async for host in scan:
+                    ...
+
+        where the blocking scan runs in a worker thread. At most
+        `buffer` records wait in the queue; when the consumer falls
+        behind, the worker blocks and probing pauses. Leaving the
+        `async with` block (also when the task is cancelled) or calling
+        cancel() stops the sweep after the current probe, whether or
+        not more records arrive; __aexit__ waits until sockets and the
+        journal are closed.
+
+        `targets` is a TargetPlan or a range spec (default: --range,
+        the saved range or the interface's subnet). `jobs` - a list of
+        (iface, plan, skip, pacer), see interface_jobs() - replaces
+        targets/iface for multi-interface scans. Records pass through
+        an ArpInspector unless `inspect` is False; `on_alert(alert)` is
+        called for every alert it raises.
+    """
+
+    def __init__(self, targets=None, iface=None, method=None, skip=None, rate=None,
+                 ipv6=None, inspect=True, progress=None, on_alert=None, jobs=None,
+                 buffer=SESSION_BUFFER):
+        if jobs is None:
+            env = get_env(iface)
+            if targets is None:
+                plan = resolve_plan(env.iface)
+            elif isinstance(targets, TargetPlan):
+                plan = targets
+            else:
+                plan = TargetPlan(str(targets), exclude=NETSCAN_EXCLUDE, order=NETSCAN_ORDER)
+            jobs = [(env.iface, plan, {env.local_ip} if skip is None else set(skip),
+                     RateController(max_rate=rate))]
+        self.jobs = jobs
+        self.method = method
+        self.ipv6 = ipv6
+        self.progress = progress
+        self.on_alert = on_alert
+        self.buffer = buffer
+        self.inspector = open_inspector(j[0] for j in jobs) if inspect else None
+        self.total = sum(len(plan) for _, plan, _, _ in jobs)
+        self.done = 0
+        self.count = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _tick(self, done, total, ip):
+        self.done = done
+        if self.progress:
+            self.progress(done, total, ip)
+
+    def cancel(self):
+        """
+        FA: توقف اسکن در میزبان بعدی
+        EN: Stop the scan at the next host (safe from any thread)
+        """
+        self._stop.set()
+
+    @property
+    def cancelled(self):
+        return self._stop.is_set()
+
+    def __iter__(self):
+        records = scan_interfaces(self.jobs, self.method, self._tick, self.ipv6, self._stop)
+        if self.inspector is not None:
+            records = inspect_records(records, self.inspector, self.on_alert)
+        try:
+            for rec in records:
+                if self._stop.is_set():
+                    break
+                self.count += 1
+                yield rec
+        finally:
+            records.close()
+            if self.inspector is not None:
+                save_gateways(self.inspector)
+
+    def __aiter__(self):
+        return self._stream()
+
+    async def _stream(self):
+        import asyncio
+        import concurrent.futures
+        loop = asyncio.get_running_loop()
+        results = asyncio.Queue(self.buffer)
+        end = object()
+
+        def put(item):
+            try:
+                fut = asyncio.run_coroutine_threadsafe(results.put(item), loop)
+            except RuntimeError:
+                return False  # FA: حلقه بسته شد / EN: the event loop is gone
+            while True:
+                try:
+                    fut.result(SESSION_POLL)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    # FA: صف پر است؛ اسکن منتظر مصرف‌کننده می‌ماند
+                    # EN: queue full - the scan waits for the consumer
+                    if self._stop.is_set():
+                        fut.cancel()
+                        return False
+                except concurrent.futures.CancelledError:
+                    return False
+
+        def worker():
+            try:
+                for rec in self:
+                    if not put(rec):
+                        break
+            except Exception as e:
+                put(e)
+            put(end)
+
+        self._thread = threading.Thread(target=worker, name="netscan-session", daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                item = await results.get()
+                if item is end:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self._stop.set()
+
+    async def wait(self):
+        """
+        FA: انتظار برای پایان کامل worker (بستن سوکت‌ها و ذخیره ژورنال)
+        EN: Wait until the worker thread has finished and released its
+            sockets and journal, without blocking the event loop
+        """
+        if self._thread is not None:
+            import asyncio
+            await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.cancel()
+        await self.wait()
+
+# =========================================================
+# ===================== Headless ==========================
+# =========================================================
+OUTPUT_FORMATS = ("ndjson", "csv", "json")
+RECORD_FIELDS = ("ip", "mac", "vendor", "state", "rtt", "neigh", "iface", "method", "ipv6", "alerts")
+
+def export_record(rec):
+    """
+    FA: تبدیل رکورد برای خروجی (RTT به میلی‌ثانیه)
+    EN: Record as written by the headless outputs (rtt in milliseconds)
+    """
+    out = {k: rec.get(k) for k in RECORD_FIELDS}
+    if out["rtt"] is not None:
+        out["rtt"] = round(out["rtt"] * 1000, 3)
+    for k, v in rec.items():
+        if k not in out:
+            out[k] = v
+    return out
+
+class RecordWriter:
+    """
+    FA: نوشتن جریانی رکوردها به‌صورت NDJSON / CSV / JSON
+    EN: Streams records as NDJSON, CSV or a JSON array, flushing after
+        every record so consumers see hosts while the scan runs
+    """
+
+    def __init__(self, fmt, stream):
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"unknown output format: {fmt}")
+        self.fmt = fmt
+        self.stream = stream
+        self.count = 0
+        self._csv = None
+        if fmt == "csv":
+            import csv
+            self._csv = csv.DictWriter(stream, fieldnames=RECORD_FIELDS, extrasaction="ignore")
+            self._csv.writeheader()
+        elif fmt == "json":
+            stream.write("[")
+
+    def write(self, rec):
+        out = export_record(rec)
+        if self.fmt == "ndjson":
+            self.stream.write(json.dumps(out, ensure_ascii=False) + "\n")
+        elif self.fmt == "csv":
+            self._csv.writerow({k: ("" if v is None else " ".join(v) if isinstance(v, list) else v)
+                                for k, v in out.items()})
+        else:
+            self.stream.write(("," if self.count else "") + "\n  " + json.dumps(out, ensure_ascii=False))
+        self.count += 1
+        self.stream.flush()
+
+    def close(self):
+        if self.fmt == "json":
+            self.stream.write("\n]\n" if self.count else "]\n")
+        self.stream.flush()
+
+def run_headless(fmt="ndjson", output=None):
+    """
+    FA: اسکن غیرتعاملی برای اتوماسیون؛ بدون منو و بدون input()
+    EN: Non-interactive scan for automation: no menu, no prompts,
+        records on stdout (or `output`), diagnostics on stderr.
+        Returns the process exit code.
+    """
+    METRICS.reset()
+    try:
+        with METRICS.phase("interface"):
+            if NETSCAN_ALL_IFACES:
+                jobs = interface_jobs()
+            else:
+                env = get_env(NETSCAN_IFACE)
+                jobs = [(env.iface, resolve_plan(env.iface), {env.local_ip}, RateController())]
+    except ValueError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 2
+    if not jobs:
+        print("[ERROR] no interface with an IPv4 address to scan", file=sys.stderr)
+        return 2
+
+    stream = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+    history = open_history(", ".join(str(j[1]) for j in jobs), ",".join(j[0] for j in jobs))
+    session = ScanSession(jobs=jobs, on_alert=print_alert)
+    try:
+        writer = RecordWriter(fmt, stream)
+        try:
+            for rec in session:
+                writer.write(rec)
+                if history:
+                    history.add(rec)
+        finally:
+            writer.close()
+            close_history(history)
+            for iface, _, _, pacer in jobs:
+                print(f"[INFO] {iface}: {format_pacing(pacer)}", file=sys.stderr)
+            report_metrics(sys.stderr)
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # FA: مصرف‌کننده (مثلاً head) زودتر بسته شد
+        # EN: the consumer (e.g. `head`) went away early
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    finally:
+        if output:
+            stream.close()
+    return 0
+
+# =========================================================
+# ===================== Monitor ===========================
+# =========================================================
+RTNLGRP_NEIGH = 3
+MONITOR_TICK = 2.0
+MONITOR_STALE_RECHECK = 30.0
+NUD_PRESENT = ("REACHABLE", "STALE", "DELAY", "PROBE", "PERMANENT")
+
+def nl_subscribe(*groups):
+    """
+    FA: عضویت در گروه‌های multicast نت‌لینک
+    EN: Open an rtnetlink socket subscribed to the given multicast groups
+    """
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    except OSError:
+        pass
+    mask = 0
+    for g in groups:
+        mask |= 1 << (g - 1)
+    sock.bind((0, mask))
+    return sock
+
+class PresenceMonitor:
+    """
+    FA: پایش حضور دستگاه‌ها بر اساس رویدادهای همسایه‌ی کرنل
+    EN: Presence tracker driven by RTNLGRP_NEIGH notifications.
+        The host table is updated from kernel events; only hosts whose
+        entry went STALE or that have not been confirmed for `ttl`
+        seconds are actively re-probed, so steady-state cost follows
+        churn, not subnet size. A host only departs when it fails ARP
+        (or its neighbor entry goes FAILED), not for a missing echo
+        reply. With an `inspector` every sighting is
+        also checked for ARP conflicts, reported as "alert" events.
+    """
+
+    def __init__(self, iface, plan=None, ttl=None, method=None, emit=None, inspector=None):
+        self.iface = iface
+        self.plan = plan
+        self.ttl = ttl or NETSCAN_MONITOR_TTL
+        self.method = method
+        self.emit = emit or (lambda event: None)
+        self.inspector = inspector
+        self.hosts = {}  # ip -> {"mac", "neigh", "seen", "probed"}
+
+    def _wanted(self, n):
+        if not n["ip"] or ":" in n["ip"]:
+            return False
+        if n.get("iface") and n["iface"] != self.iface:
+            return False
+        return self.plan is None or n["ip"] in self.plan
+
+    def _event(self, kind, ip, host, **extra):
+        rec = make_record(ip, host["mac"], "active" if kind != "depart" else "gone",
+                          neigh=host["neigh"])
+        rec["event"] = kind
+        rec.update(extra)
+        self.emit(rec)
+
+    def _inspect(self, ip, mac):
+        for alert in self.inspector.observe(ip, mac):
+            rec = make_record(ip, mac, "active")
+            rec["event"] = "alert"
+            rec.update(alert)
+            self.emit(rec)
+
+    def observe(self, ip, mac, neigh, confirmed=True):
+        """
+        FA: ثبت مشاهده یک میزبان و تولید رویداد ورود/تغییر
+        EN: Record a sighting; emits "arrive" or "change" as needed
+        """
+        if self.inspector is not None and mac:
+            self._inspect(ip, mac)
+        now = time.monotonic()
+        host = self.hosts.get(ip)
+        if host is None:
+            host = self.hosts[ip] = {"mac": mac, "neigh": neigh, "seen": now, "probed": now}
+            self._event("arrive", ip, host)
+            return
+        old_mac = host["mac"]
+        host["neigh"] = neigh
+        if confirmed:
+            host["seen"] = now
+        if mac and old_mac and mac != old_mac:
+            host["mac"] = mac
+            self._event("change", ip, host, old_mac=old_mac)
+        elif mac:
+            host["mac"] = mac
+
+    def depart(self, ip):
+        host = self.hosts.pop(ip, None)
+        if host is not None:
+            self._event("depart", ip, host)
+
+    def handle(self, msg_type, n):
+        """
+        FA: پردازش یک پیام RTM_NEWNEIGH / RTM_DELNEIGH
+        EN: Apply one neighbor notification to the host table
+        """
+        if not self._wanted(n):
+            return
+        ip, state = n["ip"], n["state"]
+        if msg_type == RTM_DELNEIGH:
+            # FA: حذف از کش کرنل به معنی خروج نیست؛ فقط بررسی مجدد
+            # EN: garbage collection is not a departure - just re-check soon
+            if ip in self.hosts:
+                self.hosts[ip]["seen"] = 0.0
+            return
+        if state == "FAILED":
+            if ip in self.hosts:
+                self.depart(ip)
+            return
+        if n["mac"] and state in NUD_PRESENT:
+            self.observe(ip, n["mac"], state, confirmed=state in ("REACHABLE", "PERMANENT"))
+
+    def due(self):
+        """
+        FA: میزبان‌هایی که باید دوباره پروب شوند
+        EN: Hosts that need an active re-probe right now
+        """
+        now = time.monotonic()
+        out = []
+        for ip, h in self.hosts.items():
+            if h["neigh"] == "PERMANENT":
+                continue
+            if now - h["seen"] >= self.ttl:
+                out.append(ip)
+            elif h["neigh"] == "STALE" and now - h["probed"] >= MONITOR_STALE_RECHECK:
+                out.append(ip)
+        return out
+
+    def reprobe(self, ips):
+        """
+        FA: پروب دوباره؛ نبود پاسخ ICMP به‌تنهایی یعنی خروج نیست
+        EN: Re-probe `ips` with the monitor's engine. A missing echo
+            reply alone is not a departure - hosts that drop ICMP but
+            answer ARP would flap every TTL - so silent hosts are
+            checked over ARP and only depart when that fails too
+        """
+        now = time.monotonic()
+        for ip in ips:
+            self.hosts[ip]["probed"] = now
+        engine = resolve_probe(self.method, self.iface)
+        silent = []
+        for ip, rtt, mac in run_sweep(ips, engine, self.iface):
+            if ip not in self.hosts:
+                continue
+            if rtt is None:
+                silent.append(ip)
+            else:
+                self.observe(ip, mac or self.hosts[ip]["mac"], self.hosts[ip]["neigh"])
+        if silent and engine != "arp":
+            silent = self._arp_check(silent)
+        for ip in silent:
+            self.depart(ip)
+
+    def _arp_check(self, ips):
+        """
+        FA: بررسی میزبان‌های بی‌پاسخ با ARP؛ برمی‌گرداند آن‌هایی که واقعاً رفته‌اند
+        EN: ARP-probe hosts that ignored the echo request; returns the
+            ones that stayed silent
+        """
+        silent = []
+        try:
+            for ip, rtt, mac in arp_sweep(self.iface, ips):
+                if ip not in self.hosts:
+                    continue
+                if rtt is None:
+                    silent.append(ip)
+                else:
+                    self.observe(ip, mac, self.hosts[ip]["neigh"])
+        except OSError:
+            # FA: بدون CAP_NET_RAW: کرنل برای همان پروب ARP فرستاده؛ اگر
+            # پاسخی نیاید وضعیت FAILED می‌شود و handle() خروج را ثبت می‌کند
+            # EN: no raw socket - the probe above already made the kernel
+            # solicit the entry; if that goes unanswered it turns FAILED
+            # and handle() reports the departure
+            return []
+        return silent
+
+    def resync(self):
+        """
+        FA: همگام‌سازی کامل با جدول کرنل (شروع کار یا سرریز بافر)
+        EN: Full resync with the kernel table (startup, or after ENOBUFS)
+        """
+        for n in read_neighbors():
+            if self._wanted(n) and n["mac"] and n["neigh"] in NUD_PRESENT:
+                self.observe(n["ip"], n["mac"], n["neigh"],
+                             confirmed=n["neigh"] in ("REACHABLE", "PERMANENT"))
+
+    def run(self, initial_sweep=True):
+        """
+        FA: حلقه اصلی پایش؛ تا Ctrl+C ادامه دارد
+        EN: Main loop; runs until interrupted
+        """
+        sock = nl_subscribe(RTNLGRP_NEIGH)
+        try:
+            if initial_sweep and self.plan is not None:
+                my_ip = get_iface_ipv4(self.iface)
+                for rec in scan_hosts(self.plan, self.iface, self.method, skip={my_ip}):
+                    if rec["mac"] and rec["state"] != "incomplete" and rec["ip"] in self.plan:
+                        self.observe(rec["ip"], rec["mac"], rec["neigh"] or "REACHABLE",
+                                     confirmed=rec["state"] == "active")
+            self.resync()
+
+            next_tick = time.monotonic() + MONITOR_TICK
+            while True:
+                readable, _, _ = select.select([sock], [], [],
+                                               max(0.0, next_tick - time.monotonic()))
+                if readable:
+                    try:
+                        buf = sock.recv(65536)
+                    except OSError as e:
+                        if e.errno == errno.ENOBUFS:
+                            self.resync()
+                            continue
+                        raise
+                    for msg_type, msg in nl_messages(buf):
+                        if msg_type in (RTM_NEWNEIGH, RTM_DELNEIGH):
+                            self.handle(msg_type, parse_neigh_msg(msg))
+                if time.monotonic() >= next_tick:
+                    due = self.due()
+                    if due:
+                        self.reprobe(due)
+                    next_tick = time.monotonic() + MONITOR_TICK
+        finally:
+            sock.close()
+
+def print_event(rec):
+    """
+    FA: چاپ خوانای رویداد پایش
+    EN: Human-readable monitor line
+    """
+    stamp = datetime.now().strftime("%H:%M:%S")
+    kind = rec["event"]
+    color, key = {
+        "arrive": (FG_GREEN, "mon_arrive"),
+        "depart": (FG_RED, "mon_depart"),
+        "change": (FG_YELLOW, "mon_change"),
+        "alert": (FG_RED + BOLD, "mon_alert"),
+    }[kind]
+    line = f"[{stamp}] {Tget(key):<8} {rec['ip']:<15}  {rec['mac'] or '<incomplete>'}  [{rec['vendor']}]"
+    if kind == "alert":
+        line = f"[{stamp}] {Tget(key):<8} {format_alert(rec)}"
+    elif kind == "change":
+        line += f"  ({rec['old_mac']} → {rec['mac']})"
+    print(color + line + RESET, flush=True)
+
+def run_monitor(fmt=None, output=None):
+    """
+    FA: اجرای حالت پایش دائمی
+    EN: Long-running --monitor mode; events as text, or as records
+        when a headless output format is requested
+    """
+    iface = NETSCAN_IFACE or get_interface()
+    try:
+        plan = resolve_plan(iface)
+    except ValueError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 2
+
+    stream = None
+    if fmt:
+        stream = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+        writer = RecordWriter(fmt, stream)
+        emit = writer.write
+    else:
+        print(f"[INFO] {Tget('mon_start')} : {iface} ({plan}), TTL {NETSCAN_MONITOR_TTL}s", flush=True)
+        emit = print_event
+
+    inspector = open_inspector([iface])
+    monitor = PresenceMonitor(iface, plan, ttl=NETSCAN_MONITOR_TTL, emit=emit, inspector=inspector)
+    try:
+        monitor.run()
+    except KeyboardInterrupt:
+        return 0
+    except BrokenPipeError:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    finally:
+        save_gateways(inspector)
+        if fmt:
+            writer.close()
+        if output and stream:
+            stream.close()
+    return 0
+
+# =========================================================
+# ===================== Frames ============================
+# =========================================================
+ETH_P_ALL = 0x0003
+ETH_P_IPV6 = 0x86DD
+ETH_P_8021Q = 0x8100
+DHCP_PORTS = (67, 68)
+MDNS_PORT = 5353
+DHCP_MAGIC = b"\x63\x82\x53\x63"
+DHCP_ACK = 5
+NDP_TYPES = range(133, 137)  # RS, RA, NS, NA
+LINKTYPE_ETHERNET = 1
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+_NO_SIGHTINGS = ()
+
+def _dhcp_sightings(buf, p, end, src_ip, src_mac):
+    """
+    FA: استخراج جفت IP/MAC از پیام DHCP
+    EN: IP/MAC pairs in a BOOTP/DHCP message starting at `p`: the client
+        of an ACK (yiaddr/chaddr), a client that already owns its address
+        (ciaddr), and the server itself
+    """
+    if end - p < 240 or buf[p + 236:p + 240] != DHCP_MAGIC:
+        return _NO_SIGHTINGS
+    op = buf[p]
+    chaddr = format_mac(buf[p + 28:p + 34])
+    msg_type = None
+    i = p + 240
+    while i < end and buf[i] != 255:
+        if buf[i] == 0:
+            i += 1
+            continue
+        if i + 1 >= end:
+            break
+        if buf[i] == 53 and buf[i + 1] >= 1 and i + 2 < end:
+            msg_type = buf[i + 2]
+            break
+        i += 2 + buf[i + 1]
+
+    found = []
+    ciaddr = buf[p + 12:p + 16]
+    yiaddr = buf[p + 16:p + 20]
+    if op == 1 and ciaddr != b"\0\0\0\0":
+        found.append((socket.inet_ntoa(ciaddr), chaddr, "dhcp"))
+    if op == 2:
+        if msg_type == DHCP_ACK and yiaddr != b"\0\0\0\0":
+            found.append((socket.inet_ntoa(yiaddr), chaddr, "dhcp"))
+        if src_ip != b"\0\0\0\0":
+            found.append((socket.inet_ntoa(src_ip), src_mac, "dhcp"))
+    return found
+
+def parse_frame(buf, start=0, end=None, linktype=LINKTYPE_ETHERNET):
+    """
+    FA: استخراج جفت‌های IP/MAC از یک فریم (ARP / DHCP / mDNS / NDP)
+    EN: IP/MAC sightings in one frame as (ip, mac, source) tuples,
+        source being "arp", "dhcp", "mdns" or "ndp". Ethernet and Linux
+        cooked captures (SLL / SLL2) are understood. Works in place on
+        `buf[start:end]` (bytes, bytearray or mmap) without slicing the
+        frame, and returns the same empty tuple for the uninteresting
+        majority, so walking a capture allocates nothing per packet.
+    """
+    end = len(buf) if end is None else end
+    if linktype == LINKTYPE_ETHERNET:
+        if end - start < 14:
+            return _NO_SIGHTINGS
+        etype = buf[start + 12] << 8 | buf[start + 13]
+        mac_at = start + 6
+        p = start + 14
+        if etype == ETH_P_8021Q and end - start >= 18:
+            etype = buf[start + 16] << 8 | buf[start + 17]
+            p += 4
+    elif linktype == LINKTYPE_LINUX_SLL:
+        if end - start < 16 or buf[start + 5] != 6:
+            return _NO_SIGHTINGS
+        etype = buf[start + 14] << 8 | buf[start + 15]
+        mac_at = start + 6
+        p = start + 16
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        if end - start < 20 or buf[start + 11] != 6:
+            return _NO_SIGHTINGS
+        etype = buf[start] << 8 | buf[start + 1]
+        mac_at = start + 12
+        p = start + 20
+    else:
+        return _NO_SIGHTINGS
+
+    if etype == ETH_P_ARP:
+        # FA: فرستنده هر ARP (درخواست، پاسخ یا gratuitous)
+        # EN: the sender of every ARP - request, reply or gratuitous
+        if end - p < 28 or buf[p + 4] != 6 or buf[p + 5] != 4:
+            return _NO_SIGHTINGS
+        spa = buf[p + 14:p + 18]
+        if spa == b"\0\0\0\0":
+            return _NO_SIGHTINGS  # ARP probe (RFC 5227)
+        return ((socket.inet_ntoa(spa), format_mac(buf[p + 8:p + 14]), "arp"),)
+
+    if etype == ETH_P_IP:
+        if end - p < 20 or buf[p + 9] != socket.IPPROTO_UDP:
+            return _NO_SIGHTINGS
+        if (buf[p + 6] & 0x1F) or buf[p + 7]:
+            return _NO_SIGHTINGS  # fragment
+        u = p + (buf[p] & 0x0F) * 4
+        if end - u < 8:
+            return _NO_SIGHTINGS
+        sport = buf[u] << 8 | buf[u + 1]
+        dport = buf[u + 2] << 8 | buf[u + 3]
+        src_ip = buf[p + 12:p + 16]
+        if sport in DHCP_PORTS and dport in DHCP_PORTS:
+            return _dhcp_sightings(buf, u + 8, end, src_ip, format_mac(buf[mac_at:mac_at + 6]))
+        if MDNS_PORT in (sport, dport) and src_ip != b"\0\0\0\0":
+            return ((socket.inet_ntoa(src_ip), format_mac(buf[mac_at:mac_at + 6]), "mdns"),)
+        return _NO_SIGHTINGS
+
+    if etype == ETH_P_IPV6:
+        if end - p < 48:
+            return _NO_SIGHTINGS
+        src = buf[p + 8:p + 24]
+        if src == b"\0" * 16:
+            return _NO_SIGHTINGS  # duplicate address detection
+        nh = buf[p + 6]
+        if nh == 58 and buf[p + 40] in NDP_TYPES:
+            source = "ndp"
+        elif nh == socket.IPPROTO_UDP and MDNS_PORT in (buf[p + 40] << 8 | buf[p + 41],
+                                                        buf[p + 42] << 8 | buf[p + 43]):
+            source = "mdns"
+        else:
+            return _NO_SIGHTINGS
+        return ((socket.inet_ntop(socket.AF_INET6, bytes(src)),
+                 format_mac(buf[mac_at:mac_at + 6]), source),)
+
+    return _NO_SIGHTINGS
+
+# =========================================================
+# ===================== Passive ===========================
+# =========================================================
+SO_ATTACH_FILTER = 26
+PACKET_OUTGOING = 4
+PASSIVE_SNAPLEN = 2048
+PASSIVE_DURATION = 60
+
+# FA: برنامه BPF کلاسیک: فقط ARP، DHCP، mDNS و NDP از کرنل عبور می‌کنند
+# EN: classic BPF: the kernel only passes ARP, DHCP, mDNS and NDP up to us.
+#     (code, jump-if-true label, jump-if-false label, k); labels resolve
+#     to relative offsets in bpf_assemble().
+PASSIVE_FILTER = [
+    ("ldh_abs", None, None, 12),
+    ("jeq", "arp", None, ETH_P_ARP),
+    ("jeq", "ipv4", None, ETH_P_IP),
+    ("jeq", "ipv6", "drop", ETH_P_IPV6),
+    "ipv4",
+    ("ldb_abs", None, None, 23),
+    ("jeq", None, "drop", socket.IPPROTO_UDP),
+    ("ldh_abs", None, None, 20),
+    ("jset", "drop", None, 0x1FFF),
+    ("ldxb_msh", None, None, 14),
+    ("ldh_ind", None, None, 14),
+    ("jeq", "accept", None, 67),
+    ("jeq", "accept", None, 68),
+    ("jeq", "accept", None, MDNS_PORT),
+    ("ldh_ind", None, None, 16),
+    ("jeq", "accept", None, 67),
+    ("jeq", "accept", None, 68),
+    ("jeq", "accept", "drop", MDNS_PORT),
+    "ipv6",
+    ("ldb_abs", None, None, 20),
+    ("jeq", "icmp6", None, 58),
+    ("jeq", None, "drop", socket.IPPROTO_UDP),
+    ("ldh_abs", None, None, 54),
+    ("jeq", "accept", None, MDNS_PORT),
+    ("ldh_abs", None, None, 56),
+    ("jeq", "accept", "drop", MDNS_PORT),
+    "icmp6",
+    ("ldb_abs", None, None, 54),
+    ("jge", None, "drop", 133),
+    ("jgt", "drop", "accept", 136),
+    "arp",
+    ("ret", None, None, 64),
+    "accept",
+    ("ret", None, None, PASSIVE_SNAPLEN),
+    "drop",
+    ("ret", None, None, 0),
+]
+
+BPF_OPCODES = {
+    "ldh_abs": 0x28, "ldb_abs": 0x30, "ldh_ind": 0x48, "ldxb_msh": 0xB1,
+    "jeq": 0x15, "jgt": 0x25, "jge": 0x35, "jset": 0x45, "ret": 0x06,
+}
+
+def bpf_assemble(program):
+    """
+    FA: تبدیل برنامه برچسب‌دار به struct sock_filter[]
+    EN: Resolve labels and pack the program as struct sock_filter[]
+    """
+    labels, insns = {}, []
+    for item in program:
+        if isinstance(item, str):
+            labels[item] = len(insns)
+        else:
+            insns.append(item)
+    out = bytearray()
+    for i, (op, jt, jf, k) in enumerate(insns):
+        jt = labels[jt] - i - 1 if jt else 0
+        jf = labels[jf] - i - 1 if jf else 0
+        out += struct.pack("HBBI", BPF_OPCODES[op], jt, jf, k)
+    return bytes(out), len(insns)
+
+def attach_bpf(sock, program):
+    """
+    FA: اتصال فیلتر BPF به سوکت (SO_ATTACH_FILTER)
+    EN: Attach a classic BPF program to `sock` with SO_ATTACH_FILTER
+    """
+    import ctypes
+    code, count = bpf_assemble(program)
+    buf = ctypes.create_string_buffer(code, len(code))
+    fprog = struct.pack("HL", count, ctypes.addressof(buf))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+def passive_sniff(iface, duration=None):
+    """
+    FA: شنود غیرفعال؛ هیچ بسته‌ای ارسال نمی‌شود
+    EN: Listen on `iface` without sending anything. The kernel-side BPF
+        filter drops all traffic except ARP, DHCP, mDNS and NDP, frames
+        are read into one reused buffer, and each IP is reported when it
+        is first seen or its MAC changes, as (ip, mac, source). Runs for
+        `duration` seconds, or until interrupted when it is falsy.
+    """
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    try:
+        attach_bpf(sock, PASSIVE_FILTER)
+        sock.bind((iface, ETH_P_ALL))
+        sock.setblocking(False)
+        buf = bytearray(PASSIVE_SNAPLEN)
+        seen = {}
+        deadline = time.monotonic() + duration if duration else None
+
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+            readable, _, _ = select.select([sock], [], [], timeout)
+            while readable:
+                try:
+                    n, addr = sock.recvfrom_into(buf)
+                except (BlockingIOError, InterruptedError):
+                    break
+                if addr[2] == PACKET_OUTGOING:
+                    continue
+                METRICS.inc("frames", engine="passive")
+                for ip, mac, source in parse_frame(buf, 0, n):
+                    if seen.get(ip) != mac:
+                        seen[ip] = mac
+                        yield ip, mac, source
+    finally:
+        sock.close()
+
+def passive_records(iface, duration=None, plan=None):
+    """
+    FA: رکوردهای میزبان از شنود غیرفعال
+    EN: Host records from passive_sniff(), limited to `plan` (IPv4 only)
+        when one is given
+    """
+    for ip, mac, source in passive_sniff(iface, duration):
+        if plan is not None and (":" in ip or ip not in plan):
+            continue
+        rec = make_record(ip, mac, "active", method="passive")
+        rec["source"] = source
+        rec["iface"] = iface
+        yield rec
+
+def passive_plan():
+    return TargetPlan(NETSCAN_RANGE, exclude=NETSCAN_EXCLUDE) if NETSCAN_RANGE else None
+
+def run_passive(fmt="ndjson", output=None):
+    """
+    FA: حالت غیرفعال بدون منو؛ رکوردها به محض مشاهده نوشته می‌شوند
+    EN: Headless --passive: records are written as hosts are seen
+    """
+    iface = get_env(NETSCAN_IFACE).iface
+    try:
+        plan = passive_plan()
+    except ValueError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 2
+
+    METRICS.reset()
+    stream = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+    inspector = open_inspector([iface])
+    try:
+        writer = RecordWriter(fmt, stream)
+        try:
+            records = passive_records(iface, NETSCAN_PASSIVE or None, plan)
+            for rec in inspect_records(records, inspector, print_alert):
+                writer.write(rec)
+        finally:
+            writer.close()
+            save_gateways(inspector)
+            report_metrics(sys.stderr)
+    except PermissionError:
+        print("[ERROR] passive mode needs root / CAP_NET_RAW", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 0
+    except BrokenPipeError:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    finally:
+        if output:
+            stream.close()
+    return 0
+
+def perform_passive_scan():
+    """
+    FA: نمایش تعاملی نتایج شنود غیرفعال
+    EN: Interactive --passive: listen, then show the usual sections
+    """
+    iface = get_env(NETSCAN_IFACE).iface
+    try:
+        plan = passive_plan()
+    except ValueError as e:
+        print(FG_RED + f"[ERROR] {e}" + RESET)
+        input(T["press_enter"])
+        return
+
+    METRICS.reset()
+    duration = NETSCAN_PASSIVE or None
+    print(f"\n[INFO] {Tget('passive_start')} : {iface}"
+          + (f" ({duration}s)" if duration else " (Ctrl+C)"))
+    hosts = {}
+    inspector = open_inspector([iface])
+    live = LiveView(title=Tget("passive_hosts"))
+    try:
+        for rec in inspect_records(passive_records(iface, duration, plan), inspector, live.alert):
+            if rec["ip"] not in hosts:
+                live.add(rec)
+            hosts[rec["ip"]] = rec
+    except PermissionError:
+        live.close()
+        print(FG_RED + "[ERROR] passive mode needs root / CAP_NET_RAW" + RESET)
+        input(T["press_enter"])
+        return
+    except KeyboardInterrupt:
+        pass
+    finally:
+        live.close()
+
+    save_gateways(inspector)
+
+    active = sorted(hosts.values(), key=lambda d: (":" in d["ip"], ip_to_int(d["ip"]), d["ip"]))
+    render_sections({"active": active, "arp_only": [], "incomplete": []})
+    render_alerts(inspector)
+    print(f"\n{T['total']}: {len(active)}")
+    report_metrics()
+    print(f"[✓] {T['done']}")
+    input(T["press_enter"])
+
+# =========================================================
+# ===================== Pcap ==============================
+# =========================================================
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e6),  # microseconds, little endian
+    b"\xa1\xb2\xc3\xd4": (">", 1e6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e9),  # nanoseconds
+    b"\xa1\xb2\x3c\x4d": (">", 1e9),
+}
+PCAPNG_SHB = b"\x0a\x0d\x0d\x0a"
+PCAPNG_IDB = 1
+PCAPNG_SPB = 3
+PCAPNG_EPB = 6
+PCAPNG_OPB = 2
+PCAPNG_TSRESOL = 9
+PCAP_RELEASE = 64 << 20  # FA: آزادسازی صفحات خوانده‌شده / EN: drop pages behind us every 64 MiB
+
+def _pcap_release(m, done, released):
+    """
+    FA: برگرداندن صفحات پردازش‌شده به کرنل تا حافظه ثابت بماند
+    EN: Tell the kernel we are done with the mapped pages behind `done`,
+        so resident memory stays flat on multi-GB captures
+    """
+    import mmap
+    upto = done - done % mmap.PAGESIZE
+    if hasattr(m, "madvise"):
+        try:
+            m.madvise(mmap.MADV_DONTNEED, released, upto - released)
+        except (OSError, ValueError):
+            pass
+    return upto
+
+def _walk_pcap(m, size, emit):
+    endian, scale = PCAP_MAGIC[m[:4]]
+    linktype = struct.unpack_from(endian + "I", m, 20)[0] & 0x0FFFFFFF
+    rec = struct.Struct(endian + "IIII")
+    off = 24
+    released = 0
+    while off + 16 <= size:
+        ts_sec, ts_frac, caplen, _ = rec.unpack_from(m, off)
+        start = off + 16
+        off = start + caplen
+        if off > size:
+            break  # FA: فایل ناقص / EN: truncated capture
+        found = parse_frame(m, start, off, linktype)
+        if found:
+            emit(found, ts_sec + ts_frac / scale)
+        if off - released >= PCAP_RELEASE:
+            released = _pcap_release(m, off, released)
+
+def _walk_pcapng(m, size, emit):
+    off = 0
+    endian = "<"
+    interfaces = []  # (linktype, ticks per second)
+    released = 0
+    while off + 12 <= size:
+        if m[off:off + 4] == PCAPNG_SHB:
+            bom = m[off + 8:off + 12]
+            endian = "<" if bom == b"\x4d\x3c\x2b\x1a" else ">"
+            interfaces = []
+        btype, blen = struct.unpack_from(endian + "II", m, off)
+        if blen < 12 or off + blen > size:
+            break
+        if btype == PCAPNG_EPB and blen >= 32:
+            iface, ts_hi, ts_lo, caplen = struct.unpack_from(endian + "IIII", m, off + 8)
+            start = off + 28
+            if iface < len(interfaces):
+                linktype, resol = interfaces[iface]
+                found = parse_frame(m, start, min(start + caplen, off + blen - 4), linktype)
+                if found:
+                    emit(found, ((ts_hi << 32) | ts_lo) / resol)
+        elif btype == PCAPNG_SPB and blen >= 16:
+            if interfaces:
+                orig = struct.unpack_from(endian + "I", m, off + 8)[0]
+                start = off + 12
+                found = parse_frame(m, start, min(start + orig, off + blen - 4), interfaces[0][0])
+                if found:
+                    emit(found, None)
+        elif btype == PCAPNG_OPB and blen >= 32:
+            iface, _, ts_hi, ts_lo, caplen = struct.unpack_from(endian + "HHIII", m, off + 8)
+            start = off + 28
+            if iface < len(interfaces):
+                linktype, resol = interfaces[iface]
+                found = parse_frame(m, start, min(start + caplen, off + blen - 4), linktype)
+                if found:
+                    emit(found, ((ts_hi << 32) | ts_lo) / resol)
+        elif btype == PCAPNG_IDB and blen >= 20:
+            linktype = struct.unpack_from(endian + "H", m, off + 8)[0]
+            resol = 1e6
+            # FA: گزینه if_tsresol دقت زمان را تعیین می‌کند
+            # EN: the if_tsresol option sets the timestamp unit
+            opt = off + 16
+            while opt + 4 <= off + blen - 4:
+                code, olen = struct.unpack_from(endian + "HH", m, opt)
+                if code == 0:
+                    break
+                if code == PCAPNG_TSRESOL and olen >= 1:
+                    v = m[opt + 4]
+                    resol = float(2 ** (v & 0x7F)) if v & 0x80 else float(10 ** v)
+                opt += 4 + ((olen + 3) & ~3)
+            interfaces.append((linktype, resol))
+        off += blen
+        if off - released >= PCAP_RELEASE:
+            released = _pcap_release(m, off, released)
+
+def walk_capture(path, emit):
+    """
+    FA: پیمایش یک‌باره فایل pcap / pcapng
+    EN: Walk a pcap or pcapng capture in one pass over a read-only
+        memory map, calling emit(sightings, timestamp) for every frame
+        parse_frame() finds ARP / DHCP / mDNS / NDP sightings in.
+        Frames are parsed in place and pages already walked are released
+        as we go, so memory use does not grow with the file. Raises
+        ValueError for files that are neither format.
+    """
+    import mmap
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < 24:
+            raise ValueError(f"{path}: not a pcap/pcapng file")
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if hasattr(m, "madvise"):
+            m.madvise(mmap.MADV_SEQUENTIAL)
+        if m[:4] in PCAP_MAGIC:
+            _walk_pcap(m, size, emit)
+        elif m[:4] == PCAPNG_SHB:
+            _walk_pcapng(m, size, emit)
+        else:
+            raise ValueError(f"{path}: not a pcap/pcapng file")
+    finally:
+        m.close()
+
+def _iso(ts):
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec="seconds")
+
+def pcap_records(path, plan=None, inspector=None):
+    """
+    FA: فهرست میزبان‌ها از یک فایل ضبط‌شده
+    EN: Host records from a capture, one per IP in numeric order, with
+        the last MAC seen for it, how it was seen, first/last timestamps
+        and the number of sightings. Only IPv4 addresses inside `plan`
+        are kept when one is given. Every sighting is replayed through
+        `inspector` on the capture's clock.
+    """
+    hosts = {}  # ip -> [mac, source, first, last, count]
+    alerts = {}  # ip -> [kind, ...]
+
+    def emit(sightings, ts):
+        for ip, mac, source in sightings:
+            h = hosts.get(ip)
+            if h is None:
+                if plan is not None and (":" in ip or ip not in plan):
+                    continue
+                hosts[ip] = [mac, source, ts, ts, 1]
+            else:
+                h[0], h[1], h[3] = mac, source, ts
+                h[4] += 1
+            if inspector is not None:
+                for alert in inspector.observe(ip, mac, ts):
+                    alerts.setdefault(alert["ip"], []).append(alert["alert"])
+
+    walk_capture(path, emit)
+    for ip in sorted(hosts, key=lambda ip: (":" in ip, ip_to_int(ip), ip)):
+        mac, source, first, last, count = hosts[ip]
+        rec = make_record(ip, mac, "active", method="pcap")
+        rec.update(source=source, first_seen=_iso(first), last_seen=_iso(last), sightings=count)
+        if ip in alerts:
+            rec["alerts"] = alerts[ip]
+        yield rec
+
+def run_from_pcap(path, fmt=None, output=None):
+    """
+    FA: نمایش یا خروجی گرفتن از فهرست میزبان‌های یک فایل pcap
+    EN: --from-pcap: the inventory of a capture, as the usual sections
+        or, with a headless format, as records
+    """
+    METRICS.reset()
+    try:
+        plan = TargetPlan(NETSCAN_RANGE, exclude=NETSCAN_EXCLUDE) if NETSCAN_RANGE else None
+        inspector = ArpInspector()
+        with METRICS.phase("pcap"):
+            records = list(pcap_records(path, plan, inspector))
+    except (OSError, ValueError) as e:
+        print(FG_RED + f"[ERROR] {e}" + RESET, file=sys.stderr)
+        return 1
+
+    if fmt:
+        stream = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+        try:
+            writer = RecordWriter(fmt, stream)
+            for rec in records:
+                writer.write(rec)
+            writer.close()
+        except BrokenPipeError:
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        finally:
+            if output:
+                stream.close()
+        for alert in inspector.alerts:
+            print_alert(alert)
+        report_metrics(sys.stderr)
+        return 0
+
+    print(f"[INFO] {Tget('pcap_source')} : {path}")
+    render_sections({"active": records, "arp_only": [], "incomplete": []})
+    render_alerts(inspector)
+    print(f"\n{T['total']}: {len(records)}")
+    report_metrics()
+    return 0
+
+# =========================================================
+# ===================== Agents ============================
+# =========================================================
+AGENT_PORT = 4747
+AGENT_PROTOCOL = 1
+AGENT_CHUNK = 256             # FA: هر تکه یک /24 / EN: one /24 per work unit
+AGENT_CONNECT_TIMEOUT = 3.0
+AGENT_TIMEOUT = 30.0          # FA: سکوت بیش از این یعنی ایجنت از دست رفته / EN: silence => agent lost
+AGENT_PROGRESS = 0.5
+AGENT_RETRY = 1.0
+AGENT_MAX_FAILURES = 3
+AGENT_LINE_MAX = 1 << 20
+CHUNK_MAX_TRIES = 3
+STRAGGLER_FACTOR = 3.0
+STRAGGLER_MIN = 5.0
+CHUNK_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+class AgentError(Exception):
+    """
+    FA: خطای گزارش‌شده توسط ایجنت برای یک تکه
+    EN: A chunk the agent refused or failed; the connection is still good
+    """
+
+def parse_endpoint(spec, host=None):
+    """
+    FA: تبدیل "host:port" یا "port" به (host, port)
+    EN: "host:port", "[v6]:port", "host" or "port" -> (host, port);
+        a missing host falls back to `host`, a missing port to AGENT_PORT
+    """
+    spec = spec.strip()
+    if spec.startswith("["):
+        name, _, port = spec[1:].partition("]")
+        port = port.lstrip(":")
+    elif spec.count(":") == 1:
+        name, port = spec.split(":")
+    elif spec.isdigit():
+        name, port = "", spec
+    else:
+        name, port = spec, ""
+    name = name or host
+    port = int(port) if port else AGENT_PORT
+    if not name or not 0 < port < 65536:
+        raise ValueError(f"bad agent address: {spec}")
+    return name, port
+
+def plan_chunks(plan, size=AGENT_CHUNK):
+    """
+    FA: تقسیم برنامه به تکه‌های هم‌تراز (به‌طور پیش‌فرض هر /24 یک تکه)
+    EN: Split a plan into work units of at most `size` addresses, aligned
+        on `size` so a chunk never straddles two /24s (one L2 segment per
+        chunk by default). Yields (spec, count, first address as int).
+    """
+    block, tokens, count, head = None, [], 0, 0
+    for first, last in plan.ranges:
+        while first <= last:
+            end = min(last, first - first % size + size - 1)
+            if first // size != block:
+                if tokens:
+                    yield " ".join(tokens), count, head
+                block, tokens, count, head = first // size, [], 0, first
+            tokens.append(int_to_ip(first) if first == end else f"{int_to_ip(first)}-{int_to_ip(end)}")
+            count += end - first + 1
+            first = end + 1
+    if tokens:
+        yield " ".join(tokens), count, head
+
+# ===================== Agent side =====================
+def _agent_iface(plan):
+    """
+    FA: اینترفیسی که تکه روی آن قرار دارد
+    EN: (iface, local ip) to scan `plan` from: -i if given, else the
+        interface whose subnet holds the chunk, else the default route
+    """
+    if not NETSCAN_IFACE and plan.ranges:
+        head = ipaddress.IPv4Address(plan.ranges[0][0])
+        for iface, addr, net in list_scan_interfaces():
+            if head in net:
+                return iface, addr
+    env = get_env(NETSCAN_IFACE)
+    return env.iface, env.local_ip
+
+def agent_scan(msg, send):
+    """
+    FA: اسکن یک تکه برای هماهنگ‌کننده
+    EN: Run one "scan" request and stream its records back. Only hosts
+        inside the chunk are returned, so neighbor entries of the rest
+        of the subnet do not show up in every chunk.
+    """
+    cid = msg.get("id")
+    try:
+        plan = TargetPlan(msg["targets"], order=msg.get("order") or NETSCAN_ORDER)
+        method = msg.get("probe") or NETSCAN_PROBE
+        if method not in PROBE_METHODS:
+            raise ValueError(f"unknown probe engine: {method}")
+        iface, my_ip = _agent_iface(plan)
+    except (KeyError, TypeError, ValueError, OSError) as e:
+        send({"op": "error", "id": cid, "error": str(e)})
+        return
+
+    started = time.monotonic()
+    last = [started]
+
+    def progress(done, total, ip):
+        now = time.monotonic()
+        if now - last[0] >= AGENT_PROGRESS:
+            last[0] = now
+            send({"op": "progress", "id": cid, "done": done, "total": total})
+
+    count = 0
+    try:
+        for rec in scan_hosts(plan, iface, method, {my_ip}, progress, RateController(), only_iface=True):
+            if rec["ip"] not in plan:
+                continue
+            rec["iface"] = iface
+            send({"op": "record", "id": cid, "record": rec})
+            count += 1
+    except (OSError, ValueError) as e:
+        if isinstance(e, (BrokenPipeError, ConnectionError)):
+            raise
+        send({"op": "error", "id": cid, "error": str(e)})
+        return
+    elapsed = time.monotonic() - started
+    send({"op": "done", "id": cid, "hosts": count, "seconds": round(elapsed, 3)})
+    print(f"[INFO] chunk {cid}: {plan} -> {count} hosts in {elapsed:.2f}s", file=sys.stderr)
+    report_metrics(sys.stderr)
+
+def agent_session(rfile, wfile, peer):
+    """
+    FA: گفتگوی یک هماهنگ‌کننده با این ایجنت
+    EN: Serve one coordinator connection: hello, then any number of
+        "scan" requests, one at a time, until the peer hangs up
+    """
+    import hmac
+
+    def send(msg):
+        wfile.write(json.dumps(msg, ensure_ascii=False).encode("utf-8") + b"\n")
+        wfile.flush()
+
+    def recv():
+        line = rfile.readline(AGENT_LINE_MAX)
+        return json.loads(line) if line.endswith(b"\n") else None
+
+    try:
+        hello = recv()
+        if not hello or hello.get("op") != "hello" or hello.get("version") != AGENT_PROTOCOL:
+            send({"op": "error", "error": f"expected hello, protocol {AGENT_PROTOCOL}"})
+            return
+        if NETSCAN_AGENT_TOKEN and not hmac.compare_digest(
+                str(hello.get("token") or "").encode(), NETSCAN_AGENT_TOKEN.encode()):
+            send({"op": "error", "error": "bad token"})
+            print(FG_YELLOW + f"[WARN] {peer[0]}: bad token" + RESET, file=sys.stderr)
+            return
+        send({
+            "op": "hello",
+            "version": AGENT_PROTOCOL,
+            "name": socket.gethostname(),
+            "probe": NETSCAN_PROBE,
+            "networks": [str(net) for _, _, net in list_scan_interfaces()],
+        })
+        print(f"[INFO] coordinator {peer[0]}:{peer[1]} connected", file=sys.stderr)
+        while True:
+            msg = recv()
+            if msg is None or msg.get("op") == "bye":
+                break
+            if msg.get("op") == "scan":
+                agent_scan(msg, send)
+            else:
+                send({"op": "error", "id": msg.get("id"), "error": f"unknown op: {msg.get('op')}"})
+    except (OSError, ValueError, AttributeError):
+        pass  # FA: هماهنگ‌کننده رفت / EN: coordinator went away or spoke garbage
+    print(f"[INFO] coordinator {peer[0]}:{peer[1]} disconnected", file=sys.stderr)
+
+def run_agent(spec):
+    """
+    FA: اجرای حالت ایجنت تا Ctrl+C
+    EN: --agent: serve scan requests from coordinators until Ctrl+C.
+        Without NETSCAN_AGENT_TOKEN the agent only listens on loopback;
+        an agent usually runs as root and sweeps whatever targets a
+        peer sends, so an open one would be a scanning relay.
+    """
+    import socketserver
+
+    try:
+        host, port = parse_endpoint(spec, "0.0.0.0" if NETSCAN_AGENT_TOKEN else "127.0.0.1")
+    except ValueError as e:
+        print(FG_RED + f"[ERROR] {e}" + RESET, file=sys.stderr)
+        return 2
+    try:
+        loopback = host == "localhost" or ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        loopback = False
+    if not NETSCAN_AGENT_TOKEN and not loopback:
+        print(FG_RED + f"[ERROR] refusing to listen on {host} without NETSCAN_AGENT_TOKEN; "
+              "set a token in the config or bind to 127.0.0.1" + RESET, file=sys.stderr)
+        return 2
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            agent_session(self.rfile, self.wfile, self.client_address)
+
+    class Server(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+        address_family = socket.AF_INET6 if ":" in host else socket.AF_INET
+
+    try:
+        server = Server((host, port), Handler)
+    except OSError as e:
+        print(FG_RED + f"[ERROR] {host}:{port}: {e}" + RESET, file=sys.stderr)
+        return 1
+    nets = ", ".join(str(net) for _, _, net in list_scan_interfaces()) or "-"
+    print(f"[INFO] agent listening on {host}:{port} · {T['info_network']} : {nets}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+# ===================== Coordinator side =====================
+class AgentLink:
+    """
+    FA: اتصال هماهنگ‌کننده به یک ایجنت
+    EN: The coordinator's connection to one agent (JSON lines over TCP)
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.name = f"{endpoint[0]}:{endpoint[1]}"
+        self.networks = []
+        self.sock = None
+        self.file = None
+
+    def connect(self):
+        self.close()
+        sock = socket.create_connection(self.endpoint, timeout=AGENT_CONNECT_TIMEOUT)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(AGENT_TIMEOUT)
+        self.sock, self.file = sock, sock.makefile("rwb")
+        self.send({"op": "hello", "version": AGENT_PROTOCOL, "token": NETSCAN_AGENT_TOKEN})
+        reply = self.recv()
+        if reply.get("op") != "hello":
+            raise ConnectionError(reply.get("error") or "unexpected reply to hello")
+        self.networks = [parse_target(n, hosts_only=False) for n in reply.get("networks") or ()]
+        return reply
+
+    def send(self, msg):
+        self.file.write(json.dumps(msg).encode("utf-8") + b"\n")
+        self.file.flush()
+
+    def recv(self):
+        line = self.file.readline(AGENT_LINE_MAX)
+        if not line.endswith(b"\n"):
+            raise ConnectionError("connection closed by agent")
+        return json.loads(line)
+
+    def is_local(self, ip):
+        return any(first <= ip <= last for first, last in self.networks)
+
+    def interrupt(self):
+        # FA: بیدار کردن recv مسدودشده در نخ دیگر
+        # EN: wake a recv() blocked in the worker thread
+        sock = self.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def close(self):
+        for obj in (self.file, self.sock):
+            if obj is not None:
+                try:
+                    obj.close()
+                except OSError:
+                    pass
+        self.sock = self.file = None
+
+class Coordinator:
+    """
+    FA: تقسیم اهداف بین ایجنت‌ها، جابه‌جایی کار از ایجنت‌های کند یا
+        ازکارافتاده و ادغام نتایج
+    EN: Splits a plan into chunks (plan_chunks) and lets every agent pull
+        the next one as soon as it is free, so fast agents do more of the
+        work. Chunks inside an agent's own subnets are kept for the agents
+        that sit on them (ARP only works on-link); the rest go to anyone.
+
+        Rebalancing:
+          - an agent that errors or falls silent for AGENT_TIMEOUT gets
+            its chunk put back at the front of the queue, and is dropped
+            after AGENT_MAX_FAILURES consecutive failures;
+          - once the queue is empty, idle agents re-run chunks that have
+            been running for STRAGGLER_FACTOR x the median chunk time,
+            and whichever copy finishes first wins.
+
+        run() yields records, each tagged with "agent", deduplicated by IP.
+    """
+
+    def __init__(self, endpoints, method=None):
+        self.links = [AgentLink(e) for e in endpoints]
+        self.method = method
+        self.cond = threading.Condition()
+        self.results = queue.Queue(maxsize=4096)
+        self.stopped = False
+        self.closed = False
+        self.dead = set()
+        self.lost = []  # FA: تکه‌های اسکن‌نشده / EN: (spec, count) given up on
+
+    def connect(self):
+        """
+        FA: اتصال هم‌زمان به همه ایجنت‌ها
+        EN: Say hello to every agent at once; returns the ones that answered
+        """
+        def hello(link):
+            try:
+                link.connect()
+            except (OSError, ValueError) as e:
+                link.close()
+                print(FG_YELLOW + f"[WARN] agent {link.name}: {e}" + RESET, file=sys.stderr)
+
+        threads = [threading.Thread(target=hello, args=(link,), daemon=True) for link in self.links]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(AGENT_CONNECT_TIMEOUT + AGENT_TIMEOUT)
+        return [link for link in self.links if link.sock is not None]
+
+    def networks(self):
+        return [f"{int_to_ip(a)}-{int_to_ip(b)}" for link in self.links for a, b in link.networks]
+
+    # ---- scheduling (all under self.cond) ----
+    def _plan(self, plan, size):
+        self.chunks = list(plan_chunks(plan, size))
+        self.order = plan.order
+        self.queues = {}  # frozenset(local agent names) -> deque of chunk ids
+        self.home = []
+        for cid, (_, _, head) in enumerate(self.chunks):
+            key = frozenset(link.name for link in self.links
+                            if link.sock is not None and link.is_local(head))
+            self.home.append(key)
+            self.queues.setdefault(key, deque()).append(cid)
+        self.running = {}  # cid -> {agent name: started}
+        self.partial = {}  # cid -> targets probed so far
+        self.tries = {}
+        self.done = set()
+        self.durations = []
+        self.remaining = len(self.chunks)
+        self.finished = 0
+        self.total = len(plan)
+
+    def _eligible(self, name, cid):
+        live = self.home[cid] - self.dead
+        return not live or name in live
+
+    def _straggler(self, name):
+        if not self.durations:
+            return None
+        durations = sorted(self.durations)
+        limit = max(STRAGGLER_MIN, STRAGGLER_FACTOR * durations[len(durations) // 2])
+        now = time.monotonic()
+        best = None
+        for cid, runs in self.running.items():
+            if len(runs) != 1 or name in runs or not self._eligible(name, cid):
+                continue
+            started = next(iter(runs.values()))
+            if now - started > limit and (best is None or started < best[1]):
+                best = (cid, started)
+        return best and best[0]
+
+    def _take(self, name):
+        with self.cond:
+            while not self.stopped and self.remaining:
+                # FA: اول تکه‌های زیرشبکه خود ایجنت / EN: own subnets first
+                for key in sorted(self.queues, key=len, reverse=True):
+                    q = self.queues[key]
+                    if q and self._eligible(name, q[0]):
+                        cid = q.popleft()
+                        self.running.setdefault(cid, {})[name] = time.monotonic()
+                        return cid
+                cid = self._straggler(name)
+                if cid is not None:
+                    self.running[cid][name] = time.monotonic()
+                    METRICS.inc("agent_chunks", agent=name, result="speculative")
+                    return cid
+                self.cond.wait(0.5)
+            return None
+
+    def _finish(self, cid, name, elapsed=None):
+        """
+        FA: پایان یک تکه (elapsed=None یعنی شکست)
+        EN: Chunk `cid` ended on agent `name`; elapsed None means it failed
+        """
+        with self.cond:
+            runs = self.running.get(cid, {})
+            runs.pop(name, None)
+            if not runs:
+                self.running.pop(cid, None)
+            if cid in self.done:
+                pass
+            elif elapsed is not None:
+                self.done.add(cid)
+                self.durations.append(elapsed)
+                self.finished += self.chunks[cid][1]
+                self.partial.pop(cid, None)
+                self.remaining -= 1
+                METRICS.inc("agent_chunks", agent=name, result="done")
+                METRICS.observe("agent_chunk", elapsed, CHUNK_BUCKETS, agent=name)
+            else:
+                METRICS.inc("agent_chunks", agent=name, result="failed")
+                if not runs:
+                    self.tries[cid] = self.tries.get(cid, 0) + 1
+                    if self.tries[cid] >= CHUNK_MAX_TRIES:
+                        self.done.add(cid)
+                        self.lost.append(self.chunks[cid][:2])
+                        self.partial.pop(cid, None)
+                        self.remaining -= 1
+                    else:
+                        self.queues[self.home[cid]].appendleft(cid)
+            if not self.remaining:
+                # FA: نسخه‌های تکراری باقی‌مانده دیگر لازم نیستند
+                # EN: duplicate copies still running are no longer needed
+                self.stopped = True
+                for link in self.links:
+                    link.interrupt()
+            self.cond.notify_all()
+
+    def _retire(self, link):
+        with self.cond:
+            self.dead.add(link.name)
+            self.cond.notify_all()
+
+    def _progress(self, cid, done):
+        with self.cond:
+            if cid not in self.done and done > self.partial.get(cid, 0):
+                self.partial[cid] = done
+            return self.finished + sum(self.partial.values())
+
+    # ---- workers ----
+    def _put(self, item, until=None):
+        until = until or (lambda: self.stopped)
+        while not until():
+            try:
+                self.results.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run_chunk(self, link, cid, on_progress):
+        spec = self.chunks[cid][0]
+        link.send({"op": "scan", "id": cid, "targets": spec,
+                   "probe": self.method, "order": self.order})
+        while True:
+            msg = link.recv()
+            if msg.get("id") != cid:
+                continue  # FA: پاسخ دیرهنگام / EN: leftover of an abandoned chunk
+            op = msg.get("op")
+            if op == "record":
+                rec = msg["record"]
+                rec["agent"] = link.name
+                if not self._put(rec):
+                    return
+            elif op == "progress":
+                done = self._progress(cid, int(msg.get("done") or 0))
+                if on_progress:
+                    on_progress(done, self.total, link.name)
+            elif op == "done":
+                return
+            elif op == "error":
+                raise AgentError(msg.get("error") or "agent error")
+
+    def _work(self, link, on_progress):
+        failures = 0
+        while not self.stopped:
+            cid = None
+            try:
+                if link.sock is None:
+                    link.connect()
+                cid = self._take(link.name)
+                if cid is None:
+                    break
+                started = time.monotonic()
+                self._run_chunk(link, cid, on_progress)
+                self._finish(cid, link.name, time.monotonic() - started)
+                failures = 0
+                if on_progress:
+                    on_progress(self._progress(cid, 0), self.total, link.name)
+            except AgentError as e:
+                self._finish(cid, link.name)
+                print(FG_YELLOW + f"[WARN] agent {link.name}: {self.chunks[cid][0]}: {e}" + RESET,
+                      file=sys.stderr)
+            except (OSError, ValueError, KeyError, AttributeError) as e:
+                link.close()
+                if cid is not None:
+                    self._finish(cid, link.name)
+                if self.stopped:
+                    break
+                failures += 1
+                print(FG_YELLOW + f"[WARN] agent {link.name}: {e or type(e).__name__}" + RESET,
+                      file=sys.stderr)
+                if failures >= AGENT_MAX_FAILURES:
+                    print(FG_YELLOW + f"[WARN] agent {link.name}: giving up, its work "
+                          "goes to the other agents" + RESET, file=sys.stderr)
+                    break
+                with self.cond:
+                    self.cond.wait_for(lambda: self.stopped, AGENT_RETRY * 2 ** (failures - 1))
+        self._retire(link)
+        try:
+            if link.sock is not None and not self.stopped:
+                link.send({"op": "bye"})
+        except OSError:
+            pass
+        link.close()
+
+    def run(self, plan, size=AGENT_CHUNK, progress=None):
+        """
+        FA: اجرای اسکن توزیع‌شده و برگرداندن رکوردها به محض رسیدن
+        EN: Scan `plan` across the agents and yield records as they
+            arrive. `progress(done, total, agent)` sees combined counts.
+        """
+        self._plan(plan, size)
+        finished = object()
+
+        def worker(link):
+            try:
+                self._work(link, progress)
+            finally:
+                self._put(finished, lambda: self.closed)
+
+        threads = [threading.Thread(target=worker, args=(link,), daemon=True) for link in self.links]
+        for t in threads:
+            t.start()
+        running = len(threads)
+        seen = set()
+        try:
+            while running:
+                item = self.results.get()
+                if item is finished:
+                    running -= 1
+                    continue
+                if item["ip"] in seen:
+                    continue
+                seen.add(item["ip"])
+                yield item
+        finally:
+            with self.cond:
+                self.stopped = self.closed = True
+                self.cond.notify_all()
+            for link in self.links:
+                link.interrupt()
+            # FA: تکه‌هایی که هیچ ایجنتی انجام نداد / EN: chunks no agent got to
+            for cid, chunk in enumerate(self.chunks):
+                if cid not in self.done:
+                    self.lost.append(chunk[:2])
+                    self.done.add(cid)
+
+def run_coordinator(agents, fmt=None, output=None):
+    """
+    FA: حالت هماهنگ‌کننده: پخش اسکن بین ایجنت‌ها و ادغام نتایج
+    EN: --coordinator: scan through the given agents and show the merged
+        inventory, or stream it as records with a headless format.
+        Without --range, the subnets the agents report are scanned.
+    """
+    METRICS.reset()
+    try:
+        endpoints = [parse_endpoint(a) for a in agents.replace(",", " ").split()]
+    except ValueError as e:
+        print(FG_RED + f"[ERROR] {e}" + RESET, file=sys.stderr)
+        return 2
+    if not endpoints:
+        print(FG_RED + "[ERROR] no agents given" + RESET, file=sys.stderr)
+        return 2
+
+    coord = Coordinator(endpoints, NETSCAN_PROBE)
+    with METRICS.phase("interface"):
+        up = coord.connect()
+    if not up:
+        print(FG_RED + "[ERROR] no agent reachable" + RESET, file=sys.stderr)
+        return 1
+    try:
+        with METRICS.phase("range"):
+            spec = NETSCAN_RANGE or " ".join(coord.networks())
+            plan = TargetPlan(spec, exclude=NETSCAN_EXCLUDE, order=NETSCAN_ORDER)
+    except ValueError as e:
+        print(FG_RED + f"[ERROR] {e}" + RESET, file=sys.stderr)
+        return 2
+
+    info = sys.stderr if fmt else sys.stdout
+    print(f"[INFO] {Tget('info_agents')} : {len(up)}/{len(endpoints)} · "
+          f"{T['info_network']} : {plan}", file=info)
+
+    live = None if fmt else LiveView(len(plan), title=Tget("info_agents"),
+                                     show_iface=True, show_agent=True)
+    records = coord.run(plan, progress=live and live.progress)
+    if fmt:
+        stream = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+        history = open_history(plan, "agents")
+        try:
+            writer = RecordWriter(fmt, stream)
+            try:
+                for rec in records:
+                    writer.write(rec)
+                    if history:
+                        history.add(rec)
+            finally:
+                writer.close()
+                close_history(history)
+        except KeyboardInterrupt:
+            return 130
+        except BrokenPipeError:
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 0
+        finally:
+            records.close()
+            if output:
+                stream.close()
+    else:
+        table = HostTable()
+        history = open_history(plan, "agents")
+        try:
+            for d in records:
+                if history:
+                    history.add(d)
+                table.add(d)
+                live.add(d)
+        except KeyboardInterrupt:
+            records.close()
+        finally:
+            live.close()
+        close_history(history)
+        print(f"[+] {T['ping_done']}")
+        render_sections(table.buckets(), show_iface=True, show_agent=True)
+        print(f"\n{T['total']}: {len(table)}")
+
+    missed = sum(count for _, count in coord.lost)
+    for spec, _ in coord.lost:
+        print(FG_YELLOW + f"[WARN] not scanned: {spec}" + RESET, file=info)
+    report_metrics(info)
+    return 1 if missed else 0
+
+# =========================================================
+# ===================== History ===========================
+# =========================================================
+HISTORY_FILE = f"{BASE_DIR}/history.db"
+HISTORY_BATCH = 1000
+
+class HistoryStore:
+    """
+    FA: تاریخچه اسکن‌ها در SQLite (حالت WAL) با ایندکس روی MAC، IP و زمان
+    EN: Persistent scan inventory in SQLite (WAL mode). Host rows are
+        buffered and written with executemany in batches; diffs between
+        two scans are answered by indexed queries, never by loading
+        whole result sets. Hosts are keyed by their IPv4 address;
+        IPv6-only records (--ipv6) are not stored.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS scans (
+            id       INTEGER PRIMARY KEY,
+            started  TEXT NOT NULL,
+            finished TEXT,
+            network  TEXT,
+            iface    TEXT,
+            hosts    INTEGER DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS hosts (
+            scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
+            ip      INTEGER NOT NULL,
+            mac     TEXT,
+            vendor  TEXT,
+            state   TEXT,
+            rtt     REAL,
+            PRIMARY KEY (scan_id, ip)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_hosts_mac ON hosts(mac, scan_id);
+        CREATE INDEX IF NOT EXISTS idx_hosts_ip ON hosts(ip, scan_id);
+        CREATE INDEX IF NOT EXISTS idx_scans_started ON scans(started);
+    """
+
+    def __init__(self, path=None):
+        import sqlite3
+        self.path = path or HISTORY_FILE
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+        self.scan_id = None
+        self._rows = []
+        self._count = 0
+
+    def begin_scan(self, network=None, iface=None):
+        cur = self.db.execute(
+            "INSERT INTO scans (started, network, iface) VALUES (?, ?, ?)",
+            (datetime.now().isoformat(timespec="seconds"), str(network) if network else None, iface)
+        )
+        self.db.commit()
+        self.scan_id = cur.lastrowid
+        self._count = 0
+        return self.scan_id
+
+    def add(self, rec):
+        if ":" in rec["ip"]:
+            return  # FA: کلید جدول IPv4 است / EN: the ip column is an IPv4 integer
+        self._rows.append((self.scan_id, ip_to_int(rec["ip"]), rec.get("mac"),
+                           rec.get("vendor"), rec.get("state"), rec.get("rtt")))
+        if len(self._rows) >= HISTORY_BATCH:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        self.db.executemany(
+            "INSERT OR REPLACE INTO hosts (scan_id, ip, mac, vendor, state, rtt) "
+            "VALUES (?, ?, ?, ?, ?, ?)", self._rows
+        )
+        self.db.commit()
+        self._count += len(self._rows)
+        self._rows = []
+
+    def finish_scan(self):
+        self.flush()
+        self.db.execute(
+            "UPDATE scans SET finished = ?, hosts = ? WHERE id = ?",
+            (datetime.now().isoformat(timespec="seconds"), self._count, self.scan_id)
+        )
+        self.db.commit()
+
+    def scans(self, limit=20):
+        return self.db.execute(
+            "SELECT id, started, finished, network, iface, hosts FROM scans "
+            "ORDER BY id DESC LIMIT ?", (limit,)
+        ).fetchall()
+
+    def latest_scan(self, before=None):
+        if before is None:
+            row = self.db.execute("SELECT MAX(id) FROM scans WHERE finished IS NOT NULL").fetchone()
+        else:
+            row = self.db.execute(
+                "SELECT MAX(id) FROM scans WHERE finished IS NOT NULL AND id < ?", (before,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def diff(self, since, scan=None):
+        """
+        FA: مقایسه دو اسکن: جدید، ناپدید، تغییر IP، تغییر MAC
+        EN: Compare scan `scan` (default: latest) against scan `since`.
+            Returns {"new", "gone", "ip_changed", "mac_changed"}, each a
+            list of dicts.
+        """
+        scan = scan or self.latest_scan()
+        q = self.db.execute
+        new = q("""
+            SELECT b.ip, b.mac, b.vendor FROM hosts b
+            WHERE b.scan_id = ? AND b.mac IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM hosts a WHERE a.mac = b.mac AND a.scan_id = ?)
+            ORDER BY b.ip""", (scan, since)).fetchall()
+        gone = q("""
+            SELECT a.ip, a.mac, a.vendor FROM hosts a
+            WHERE a.scan_id = ? AND a.mac IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM hosts b WHERE b.mac = a.mac AND b.scan_id = ?)
+            ORDER BY a.ip""", (since, scan)).fetchall()
+        ip_changed = q("""
+            SELECT b.ip, b.mac, b.vendor, a.ip FROM hosts b
+            JOIN hosts a ON a.mac = b.mac AND a.scan_id = ?
+            WHERE b.scan_id = ? AND b.mac IS NOT NULL AND a.ip != b.ip
+              AND NOT EXISTS (SELECT 1 FROM hosts c WHERE c.scan_id = ? AND c.ip = b.ip AND c.mac = b.mac)
+            ORDER BY b.ip""", (since, scan, since)).fetchall()
+        mac_changed = q("""
+            SELECT b.ip, b.mac, b.vendor, a.mac FROM hosts b
+            JOIN hosts a ON a.scan_id = ? AND a.ip = b.ip
+            WHERE b.scan_id = ? AND b.mac IS NOT NULL AND a.mac IS NOT NULL AND a.mac != b.mac
+            ORDER BY b.ip""", (since, scan)).fetchall()
+
+        def rows(data, old_key=None):
+            out = []
+            for r in data:
+                d = {"ip": int_to_ip(r[0]), "mac": r[1], "vendor": r[2]}
+                if old_key:
+                    d[old_key] = int_to_ip(r[3]) if old_key == "old_ip" else r[3]
+                out.append(d)
+            return out
+
+        return {
+            "scan": scan,
+            "since": since,
+            "new": rows(new),
+            "gone": rows(gone),
+            "ip_changed": rows(ip_changed, "old_ip"),
+            "mac_changed": rows(mac_changed, "old_mac"),
+        }
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+def open_history(network=None, iface=None):
+    """
+    FA: باز کردن تاریخچه در صورت فعال بودن (NETSCAN_HISTORY)
+    EN: Start a history record for this scan when NETSCAN_HISTORY is on
+    """
+    if not NETSCAN_HISTORY:
+        return None
+    import sqlite3
+    try:
+        store = HistoryStore()
+        store.begin_scan(network, iface)
+        return store
+    except (sqlite3.Error, OSError) as e:
+        print(FG_YELLOW + f"[WARN] history disabled: {e}" + RESET, file=sys.stderr)
+        return None
+
+def close_history(store):
+    if store is None:
+        return
+    import sqlite3
+    try:
+        store.finish_scan()
+        store.close()
+    except sqlite3.Error:
+        pass
+
+def run_diff(since=None, fmt=None):
+    """
+    FA: نمایش تغییرات آخرین اسکن نسبت به اسکن N (پیش‌فرض: اسکن قبلی)
+    EN: Show what changed in the latest scan since scan N (default: the
+        one before it)
+    """
+    import sqlite3
+    try:
+        store = HistoryStore()
+    except (sqlite3.Error, OSError) as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+    try:
+        latest = store.latest_scan()
+        since = since or (latest and store.latest_scan(before=latest))
+        if not latest or not since:
+            print(f"[ERROR] {Tget('diff_none')}", file=sys.stderr)
+            return 1
+        result = store.diff(since, latest)
+    finally:
+        store.close()
+
+    if fmt:
+        print(json.dumps(result, ensure_ascii=False))
+        return 0
+
+    print(f"[INFO] {Tget('diff_title')} #{since} → #{latest}")
+    for key, icon, extra in [
+        ("new", "➕", None),
+        ("gone", "➖", None),
+        ("ip_changed", "↔", "old_ip"),
+        ("mac_changed", "⚠️", "old_mac"),
+    ]:
+        print(f"\n========== {Tget('diff_' + key)} ({len(result[key])}) ==========")
+        for d in result[key]:
+            was = f"  ← {d[extra]}" if extra else ""
+            print(f"{icon} {d['ip']}  {d['mac']}  [{d['vendor']}]{was}")
+    return 0
+
+# =========================================================
+# ===================== Host Table ========================
+# =========================================================
+HOST_COLUMNS = ("vendor", "neigh", "method", "iface", "agent")  # FA: رشته‌های تکراری / EN: interned strings
+MAC_NONE = 1 << 48
+
+class HostTable:
+    """
+    FA: جدول فشرده نتایج اسکن برای بازه‌های بزرگ
+    EN: Column store for scan results. IPv4 addresses are kept as
+        32-bit ints, MACs as 48-bit ints, states as bytes and RTTs as
+        float32, while vendor / NUD state / engine / interface are
+        indexes into interned string pools - a few dozen bytes per host
+        instead of a dict of strings. Anything else a record carries
+        (ipv6, alerts, ...) is kept only for the rows that have it.
+        Rows come back as ordinary records, sorted by numeric IP.
+    """
+
+    __slots__ = ("ips", "macs", "states", "rtts", "codes", "pools", "_index", "extra")
+
+    def __init__(self):
+        from array import array
+        self.ips = array("I")
+        self.macs = array("Q")
+        self.states = array("B")
+        self.rtts = array("f")
+        self.codes = {c: array("H") for c in HOST_COLUMNS}
+        self.pools = {c: [None] for c in HOST_COLUMNS}  # code 0 = None
+        self._index = {c: {None: 0} for c in HOST_COLUMNS}
+        self.extra = {}  # row -> {field: value}
+
+    def __len__(self):
+        return len(self.ips)
+
+    def _intern(self, column, value):
+        index = self._index[column]
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(self.pools[column])
+            self.pools[column].append(value)
+        return code
+
+    def add(self, rec):
+        """
+        FA: افزودن یک رکورد به جدول
+        EN: Append one record; returns its row number
+        """
+        row = len(self.ips)
+        rest = {k: v for k, v in rec.items()
+                if v is not None and k not in HOST_COLUMNS and k not in ("ip", "mac", "state", "rtt")}
+        ip = rec["ip"]
+        if ":" in ip:
+            # FA: میزبان فقط IPv6 / EN: IPv6-only host, sorted after IPv4
+            rest["ip"] = ip
+            self.ips.append(0)
+        else:
+            self.ips.append(ip_to_int(ip))
+        mac = rec["mac"]
+        self.macs.append(int.from_bytes(mac_to_bytes(mac), "big") if mac else MAC_NONE)
+        self.states.append(HOST_STATES.index(rec["state"]))
+        self.rtts.append(math.nan if rec["rtt"] is None else rec["rtt"])
+        for column in HOST_COLUMNS:
+            self.codes[column].append(self._intern(column, rec.get(column)))
+        if rest:
+            self.extra[row] = rest
+        return row
+
+    def record(self, row):
+        """
+        FA: بازسازی رکورد یک سطر
+        EN: The record stored in `row`, as make_record() built it
+        """
+        extra = self.extra.get(row, {})
+        mac = self.macs[row]
+        rtt = self.rtts[row]
+        pools, codes = self.pools, self.codes
+        rec = {
+            "ip": extra.get("ip") or int_to_ip(self.ips[row]),
+            "mac": format_mac(mac.to_bytes(6, "big")) if mac != MAC_NONE else None,
+            "vendor": pools["vendor"][codes["vendor"][row]],
+            "state": HOST_STATES[self.states[row]],
+            "rtt": None if rtt != rtt else rtt,
+            "neigh": pools["neigh"][codes["neigh"][row]],
+            "method": pools["method"][codes["method"][row]],
+        }
+        for tag in ("iface", "agent"):
+            value = pools[tag][codes[tag][row]]
+            if value is not None:
+                rec[tag] = value
+        rec.update(extra)
+        return rec
+
+    def rows(self, state=None):
+        """
+        FA: شماره سطرها به ترتیب عددی IP
+        EN: Row numbers (of one state) in numeric IP order, IPv6-only
+            hosts last
+        """
+        code = None if state is None else HOST_STATES.index(state)
+        states, ips, extra = self.states, self.ips, self.extra
+        v4 = [r for r in range(len(ips)) if (code is None or states[r] == code)
+              and not (r in extra and "ip" in extra[r])]
+        v4.sort(key=ips.__getitem__)
+        v6 = [r for r in extra if "ip" in extra[r] and (code is None or states[r] == code)]
+        v6.sort(key=lambda r: extra[r]["ip"])
+        return v4 + v6
+
+    def sorted(self, state=None):
+        for row in self.rows(state):
+            yield self.record(row)
+
+    def buckets(self):
+        """
+        FA: سه بخش خروجی تعاملی
+        EN: The sections render_sections() prints, generated lazily
+        """
+        return {state: self.sorted(state) for state in HOST_STATES}
+
+# =========================================================
+# ===================== Live View =========================
+# =========================================================
+LIVE_FPS = 10
+LIVE_PLAIN_INTERVAL = 5.0  # FA: فاصله خطوط وضعیت بدون TTY / EN: status line interval without a TTY
+LIVE_ROWS = 4              # FA: جدیدترین میزبان‌های هر بخش / EN: newest hosts shown per section
+LIVE_RATE_WINDOW = 3.0     # FA: پنجره محاسبه سرعت / EN: seconds of history behind the throughput
+SECTION_ICONS = {"active": "✅", "arp_only": "⚠️", "incomplete": "❌"}
+
+def host_where(d, show_iface=False, show_agent=False):
+    """
+    FA: ستون اینترفیس / عامل جلوی هر میزبان
+    EN: The interface / agent columns in front of a host line
+    """
+    where = f"{d.get('iface', ''):<10} " if show_iface else ""
+    if show_agent:
+        where = f"{d.get('agent', ''):<21} " + where
+    return where
+
+def host_line(d, show_iface=False, show_agent=False):
+    """
+    FA: متن یک میزبان در خروجی تعاملی
+    EN: One host as shown in the interactive sections (without the
+        section icon and alert marks)
+    """
+    rtt = f"  {d['rtt'] * 1000:.1f} ms" if d["rtt"] is not None else ""
+    where = host_where(d, show_iface, show_agent)
+    return f"{where}{d['ip']}  {d['mac'] or '<incomplete>'}  [{d['vendor']}]{rtt}"
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+class LiveView:
+    """
+    FA: نمایش زنده نتایج با نرخ فریم ثابت
+    EN: Live scan display redrawn at a fixed frame rate, however fast
+        or slow probes complete. progress() and add() only update
+        counters and are cheap enough to call for every target; a
+        daemon thread draws a frame `fps` times a second.
+
+        On a terminal the frame is a block at the bottom - progress
+        bar, throughput, ETA and the newest hosts of each section -
+        rewritten in place with one write per frame. When the stream is
+        not a TTY (a pipe, a log file) a plain status line is printed
+        every LIVE_PLAIN_INTERVAL seconds instead. `total=0` means the
+        end is unknown (passive listening): no bar and no ETA.
+        Safe to call from several threads.
+    """
+
+    def __init__(self, total=0, title=None, stream=None, fps=LIVE_FPS, show_iface=False,
+                 show_agent=False):
+        self.stream = stream or sys.stdout
+        try:
+            self.tty = self.stream.isatty() and os.environ.get("TERM") != "dumb"
+        except (AttributeError, ValueError):
+            self.tty = False
+        self.total = total
+        self.title = Tget("live_scanning") if title is None else title
+        self.done = 0
+        self.label = ""
+        self.found = 0
+        self.counts = dict.fromkeys(SECTION_ICONS, 0)
+        self.recent = {state: deque(maxlen=LIVE_ROWS) for state in SECTION_ICONS}
+        self.show_iface = show_iface
+        self.show_agent = show_agent
+        self.interval = 1.0 / fps if self.tty else LIVE_PLAIN_INTERVAL
+        self.started = time.monotonic()
+        self._samples = deque([(self.started, 0)])
+        self._height = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        if self.tty:
+            self._draw()
+        self._thread = threading.Thread(target=self._run, name="live-view", daemon=True)
+        self._thread.start()
+
+    def progress(self, done, total, label=""):
+        self.done, self.total, self.label = done, total, label
+
+    def add(self, rec):
+        with self._lock:
+            self.found += 1
+            if rec["state"] in self.counts:
+                self.counts[rec["state"]] += 1
+                self.recent[rec["state"]].append(host_line(rec, self.show_iface, self.show_agent))
+
+    def note(self, text):
+        """
+        FA: چاپ یک پیام بالای بخش زنده
+        EN: Print a message line above the live block
+        """
+        with self._lock:
+            if self.tty and not self._closed:
+                self.stream.write(self._clear() + text + "\n" + self._render(time.monotonic()))
+            else:
+                self.stream.write(text + "\n")
+            self.stream.flush()
+
+    def alert(self, alert):
+        self.note(FG_RED + f"[ALERT] {format_alert(alert)}" + RESET)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._draw()
+
+    def _draw(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._closed:
+                return
+            self._samples.append((now, self.done))
+            while len(self._samples) > 2 and now - self._samples[0][0] > LIVE_RATE_WINDOW:
+                self._samples.popleft()
+            if self.tty:
+                self.stream.write(self._clear() + self._render(now))
+            else:
+                self.stream.write(self._status(now) + "\n")
+            self.stream.flush()
+
+    def _status(self, now):
+        head = f"{self.title} {self.label}".strip()
+        if not self.total:
+            body = f"{format_duration(now - self.started)} · {self.found}"
+        else:
+            t0, d0 = self._samples[0]
+            rate = (self.done - d0) / (now - t0) if now > t0 else 0.0
+            eta = format_duration((self.total - self.done) / rate) if rate > 0 else "--:--"
+            percent = int(self.done / max(1, self.total) * 100)
+            body = f"{percent:3d}%  {self.done}/{self.total} · {rate:.0f}/s · ETA {eta}"
+        if self.tty:
+            return f"{head}  {body}"
+        counts = " ".join(f"{SECTION_ICONS[s]} {n}" for s, n in self.counts.items())
+        return f"[INFO] {head}  {body.lstrip()} · {counts}"
+
+    def _render(self, now):
+        import shutil
+        width = max(20, shutil.get_terminal_size().columns - 2)
+        lines = [BOLD + self._status(now)[:width] + RESET]
+        if self.total:
+            filled = int(self.done / max(1, self.total) * (width - 2))
+            lines.append("[" + "█" * filled + "░" * (width - 2 - filled) + "]")
+        for state, icon in SECTION_ICONS.items():
+            lines.append(f"{icon} {T[state]}: {self.counts[state]}")
+            lines.extend("   " + text[:width - 3] for text in self.recent[state])
+        self._height = len(lines)
+        return "\033[?25l" + "\n".join(lines) + "\n"
+
+    def _clear(self):
+        # FA: برگشت به ابتدای بخش زنده و پاک کردن آن / EN: back to the top of the block, erase it
+        return f"\033[{self._height}F\033[J" if self._height else ""
+
+    def close(self):
+        """
+        FA: پاک کردن بخش زنده تا خروجی نهایی جای آن را بگیرد
+        EN: Erase the live block (the final sections take its place)
+            and restore the cursor
+        """
+        self._stop.set()
+        self._thread.join()
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self.tty:
+                self.stream.write(self._clear() + "\033[?25h")
+                self.stream.flush()
+            self._height = 0
+
+# =========================================================
+# ===================== Scan ==============================
+# =========================================================
+def render_sections(buckets, show_iface=False, show_agent=False):
+    """
+    FA: چاپ سه بخش فعال / فقط ARP / ناقص
+    EN: Print the active / ARP-only / incomplete sections, optionally
+        with the interface and the agent that found each host
+    """
+    for key, icon in SECTION_ICONS.items():
+        print(f"\n========== {T[key]} ==========")
+        for d in buckets[key]:
+            text = host_line(d, show_iface, show_agent)
+            mark = (FG_RED + "  ⛔ " + ", ".join(Tget("alert_" + k) for k in d["alerts"]) + RESET
+                    if d.get("alerts") else "")
+            print(f"{icon} {text}{mark}")
+            others = [a for a in d.get("ipv6") or () if a != d["ip"]]
+            if others:
+                indent = " " * len(host_where(d, show_iface, show_agent))
+                print(f"   {indent}IPv6: {', '.join(others)}")
+
+def perform_multi_scan():
+    """
+    FA: اسکن هم‌زمان همه اینترفیس‌های فعال
+    EN: Interactive scan of every up interface at once
+    """
+    METRICS.reset()
+    with METRICS.phase("interface"):
+        jobs = interface_jobs()
+    if not jobs:
+        print(FG_RED + "[ERROR] no interface with an IPv4 address to scan" + RESET)
+        input(T["press_enter"])
+        return
+
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for iface, plan, _, _ in jobs:
+        print(f"[INFO] {T['info_interface']} : {iface:<10} {T['info_network']} : {plan}")
+        with METRICS.phase("interface"):
+            warnings = detect_interface_mode(iface)
+        for w in warnings:
+            print(FG_YELLOW + "[WARN] " + w + RESET)
+    print(f"[INFO] {T['info_probe']} : {NETSCAN_PROBE}")
+    print(f"[INFO] {T['info_started']} : {now}\n")
+    print(f"[+] {T['scan_start']}")
+
+    table = HostTable()
+    history = open_history(", ".join(str(j[1]) for j in jobs), ",".join(j[0] for j in jobs))
+    live = LiveView(sum(len(j[1]) for j in jobs), show_iface=True)
+    session = ScanSession(jobs=jobs, progress=live.progress, on_alert=live.alert)
+    try:
+        for d in session:
+            if history:
+                history.add(d)
+            table.add(d)
+            live.add(d)
+    finally:
+        live.close()
+    close_history(history)
+
+    print(f"[+] {T['ping_done']}")
+    for iface, _, _, pacer in jobs:
+        print(f"[INFO] {iface}: {format_pacing(pacer)}")
+    render_sections(table.buckets(), show_iface=True)
+    render_alerts(session.inspector)
+
+    total = len(table)
+    print(f"\n{T['total']}: {total}")
+    print(f"{T['total_self']}: {total + len(jobs)}")
+    report_metrics()
+    print(f"[✓] {T['done']}")
+    input(T["press_enter"])
+
+def perform_scan():
+    if NETSCAN_PASSIVE is not None:
+        return perform_passive_scan()
+    if NETSCAN_ALL_IFACES:
+        return perform_multi_scan()
+
+    METRICS.reset()
+    with METRICS.phase("interface"):
+        iface = get_env(NETSCAN_IFACE).iface
+    net = network_range_flow()
+    if net is None:
+        return
+    
+    
+
+
+
+    if net is None:
+        return
+    print(f"\n[INFO] {T['range_detected']} : {net}")
+    with METRICS.phase("prompt"):
+        ans = input(f"[?] {T['range_change']} ").strip().lower()
+    if ans == "y":
+        print(FG_YELLOW + T["range_back"] + RESET)
+        time.sleep(1)
+        return
+
+    try:
+        plan = TargetPlan(str(net), exclude=NETSCAN_EXCLUDE, order=NETSCAN_ORDER)
+    except ValueError as e:
+        print(FG_RED + f"[ERROR] {e}" + RESET)
+        input(T["press_enter"])
+        return
+
+    with METRICS.phase("interface"):
+        env = get_env(iface)
+        warnings = env.warnings()
+        my_ip = env.local_ip
+        my_mac_raw = env.mac
+        with METRICS.phase("vendor"):
+            my_vendor = get_vendor(my_mac_raw)
+    for w in warnings:
+        print(FG_YELLOW + "[WARN] " + w + RESET)
+
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    print(f"\n[INFO] {T['info_interface']} : {iface}")
+    print(f"[INFO] {T['info_network']} : {net}")
+    print(f"[INFO] {T['info_started']} : {now}\n")
+
+    print(FG_CYAN + BOLD + "[Local Device]" + RESET)
+    print(f"IP     : {my_ip}")
+    print(f"MAC    : {my_mac_raw}")
+    print(f"Vendor : {my_vendor}\n")
+
+    print(f"[INFO] {T['info_probe']} : {NETSCAN_PROBE}")
+    print(f"[INFO] {T['info_concurrency']} : {NETSCAN_CONCURRENCY}\n")
+    print(f"[+] {T['scan_start']}")
+
+    table = HostTable()
+    arp_announced = False
+    history = open_history(plan, iface)
+    live = LiveView(len(plan))
+    session = ScanSession(plan, iface, skip={my_ip}, progress=live.progress, on_alert=live.alert)
+    pacer = session.jobs[0][3]
+    try:
+        for d in session:
+            if history:
+                history.add(d)
+            if d["state"] != "active" and not arp_announced:
+                live.note(f"[+] {T['ping_done']}")
+                live.note(f"[INFO] {format_pacing(pacer)}")
+                live.note(f"[+] {T['arp_read']}")
+                arp_announced = True
+            table.add(d)
+            live.add(d)
+    finally:
+        live.close()
+    if not arp_announced:
+        print(f"[+] {T['ping_done']}")
+        print(f"[INFO] {format_pacing(pacer)}")
+    close_history(history)
+
+    render_sections(table.buckets())
+    render_alerts(session.inspector)
+
+    total = len(table)
+    print(f"\n{T['total']}: {total}")
+    print(f"{T['total_self']}: {total + 1}")
+    report_metrics()
+    print(f"[✓] {T['done']}")
+    input(T["press_enter"])
+
+# =========================================================
+# ===================== Menu ==============================
+# =========================================================
+def main_menu():
+    while True:
+        # FA: پاک کردن صفحه بدون اجرای دستور clear
+        # EN: clear the screen without spawning `clear`
+        sys.stdout.write("\033[H\033[2J\033[3J")
+
+        W = box_width()  # FA: پیدا کردن عرض مناسب ترمینال / EN: detect proper terminal width
+        title = T["menu_title"]
+
+        print(FG_CYAN + BOLD + "╔" + "═"*W + "╗" + RESET)
+        print(FG_CYAN + BOLD + "║" + RESET + f"{title:^{W}}" + FG_CYAN + BOLD + "║" + RESET)
+        print(FG_CYAN + BOLD + "╠" + "═"*W + "╣" + RESET)
+
+        # FA: منوی اصلی با padding درست / EN: main menu with correct padding
+        print(FG_GREEN  + "║  [1] ▶  " + RESET + pad(T["menu_option_scan"][3:], W-8) + FG_GREEN  + "║" + RESET)
+        print(FG_BLUE   + "║  [2] ⟳  " + RESET + pad(T["menu_option_update"][3:], W-8) + FG_BLUE   + "║" + RESET)
+        print(FG_YELLOW + "║  [3] ✖  " + RESET + pad(T["menu_option_uninstall"][3:], W-8) + FG_YELLOW + "║" + RESET)
+        print(FG_RED    + "║  [4] ⏻  " + RESET + pad(T["menu_option_exit"][3:], W-8) + FG_RED    + "║" + RESET)
+
+        print(FG_CYAN + BOLD + "╚" + "═"*W + "╝" + RESET)
+
+        try:
+            choice = input("\n" + T["prompt_choice"] + " > ").strip()
+        except KeyboardInterrupt:
             print("\n" + FG_YELLOW + "[!] Use menu option to exit safely" + RESET)
             time.sleep(1)
             continue
@@ -635,5 +5866,235 @@ def main_menu():
         else:
             print(FG_RED + T["invalid_choice"] + RESET)
             time.sleep(1)
-if __name__ == "__main__":
+def parse_args(argv=None):
+    """
+    FA: خواندن آرگومان‌های خط فرمان
+    EN: Parse command line options
+    """
+    parser = argparse.ArgumentParser(
+        prog="netscan",
+        description="Network Scanner & ARP Inspector"
+    )
+    parser.add_argument(
+        "-j", "--concurrency", type=int, metavar="N",
+        help=f"number of probes in flight (default: {NETSCAN_CONCURRENCY}, "
+             "config: NETSCAN_CONCURRENCY)"
+    )
+    parser.add_argument(
+        "--probe", choices=PROBE_METHODS,
+        help=f"probe engine (default: {NETSCAN_PROBE}, config: NETSCAN_PROBE)"
+    )
+    parser.add_argument(
+        "--tcp-ports", metavar="PORTS",
+        help="ports for --probe tcp, comma separated (default: "
+             f"{','.join(map(str, NETSCAN_TCP_PORTS))}, config: NETSCAN_TCP_PORTS)"
+    )
+    parser.add_argument(
+        "--rate", type=int, metavar="PPS",
+        help=f"upper bound for the adaptive send rate (default: {NETSCAN_RATE}, "
+             "config: NETSCAN_RATE)"
+    )
+    parser.add_argument(
+        "--retries", type=int, metavar="N",
+        help=f"retransmissions per silent target (default: {NETSCAN_RETRIES}, "
+             "config: NETSCAN_RETRIES)"
+    )
+    parser.add_argument(
+        "--checkpoint", type=float, metavar="SEC",
+        help=f"journal the progress of large scans every SEC seconds, 0 to "
+             f"disable (default: {NETSCAN_CHECKPOINT:g}, config: NETSCAN_CHECKPOINT)"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="continue the interrupted scan of the same range and interface "
+             "from its journal, skipping the targets already probed"
+    )
+    parser.add_argument(
+        "--range", dest="targets", metavar="SPEC",
+        help="targets to scan instead of the detected network: CIDRs, "
+             "ranges (10.0.0.1-50) and single IPs, comma separated; "
+             "prefix a token with ! to exclude it"
+    )
+    parser.add_argument(
+        "--exclude", metavar="SPEC",
+        help="addresses to skip (config: NETSCAN_EXCLUDE)"
+    )
+    parser.add_argument(
+        "--order", choices=TARGET_ORDERS,
+        help=f"probe order (default: {NETSCAN_ORDER}, config: NETSCAN_ORDER)"
+    )
+    parser.add_argument(
+        "--build-oui", nargs="+", metavar="FILE",
+        help="compile local IEEE registry files (oui.txt, MA-L/MA-M/MA-S "
+             "CSV) into the vendor index and exit"
+    )
+    parser.add_argument(
+        "-i", "--interface", metavar="IFACE",
+        help="interface to scan from (default: the default-route interface)"
+    )
+    parser.add_argument(
+        "--all-interfaces", action="store_true",
+        help="scan the subnet of every up interface in parallel"
+    )
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="scan once without the menu and stream results to stdout"
+    )
+    parser.add_argument(
+        "--format", choices=OUTPUT_FORMATS, default="ndjson",
+        help="headless output format (default: ndjson)"
+    )
+    parser.add_argument(
+        "--monitor", action="store_true",
+        help="keep running and report arrivals/departures from kernel "
+             "neighbor events (with --headless: as records)"
+    )
+    parser.add_argument(
+        "--ttl", type=int, metavar="SECONDS",
+        help=f"monitor: re-probe hosts not confirmed for this long "
+             f"(default: {NETSCAN_MONITOR_TTL}, config: NETSCAN_MONITOR_TTL)"
+    )
+    parser.add_argument(
+        "--passive", nargs="?", type=int, const=PASSIVE_DURATION, metavar="SECONDS",
+        help="send nothing: discover hosts from ARP, DHCP, mDNS and NDP "
+             f"traffic for SECONDS (default: {PASSIVE_DURATION}, 0 = until "
+             "Ctrl+C); needs root"
+    )
+    parser.add_argument(
+        "--from-pcap", metavar="FILE",
+        help="build the host inventory from a pcap/pcapng capture instead "
+             "of the network (with --headless: as records) and exit"
+    )
+    parser.add_argument(
+        "--agent", nargs="?", const=str(AGENT_PORT), metavar="[ADDR:]PORT",
+        help=f"serve scans to coordinators on this address (default port: "
+             f"{AGENT_PORT}); other than loopback, NETSCAN_AGENT_TOKEN must be set in "
+             f"the config"
+    )
+    parser.add_argument(
+        "--coordinator", nargs="?", const="", metavar="AGENTS",
+        help="split the scan across agents (HOST[:PORT], comma separated; "
+             "config: NETSCAN_AGENTS) and merge their results; without "
+             "--range the agents' subnets are scanned"
+    )
+    parser.add_argument(
+        "--ipv6", action="store_true",
+        help="also find IPv6 hosts with one multicast round trip (ff02::1 echo, "
+             "solicited-node probes, NDP) and attach their addresses to the "
+             "IPv4 results by MAC (config: NETSCAN_IPV6=1)"
+    )
+    parser.add_argument(
+        "--trust-gateway", action="store_true",
+        help="forget the remembered gateway MACs and trust the ones seen in "
+             "this run (after a legitimate router replacement)"
+    )
+    parser.add_argument(
+        "--history", action="store_true",
+        help="record this scan in the SQLite history (config: NETSCAN_HISTORY=1)"
+    )
+    parser.add_argument(
+        "--diff", nargs="?", type=int, const=0, metavar="SCAN",
+        help="show new / disappeared / changed hosts of the latest recorded "
+             "scan since scan SCAN (default: the previous one) and exit"
+    )
+    parser.add_argument(
+        "--metrics-file", metavar="FILE",
+        help="after each scan, write timings and probe counters to FILE in "
+             "Prometheus textfile format (config: NETSCAN_METRICS_FILE)"
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="print a per-phase time breakdown after each scan"
+    )
+    parser.add_argument(
+        "-o", "--output", metavar="FILE",
+        help="write headless results to FILE instead of stdout"
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    global NETSCAN_CONCURRENCY, NETSCAN_PROBE
+    global NETSCAN_RANGE, NETSCAN_EXCLUDE, NETSCAN_ORDER, NETSCAN_IFACE, NETSCAN_ALL_IFACES
+    global NETSCAN_MONITOR_TTL, NETSCAN_HISTORY, NETSCAN_RATE, NETSCAN_RETRIES
+    global NETSCAN_METRICS_FILE, NETSCAN_PROFILE, NETSCAN_TCP_PORTS, NETSCAN_PASSIVE, NETSCAN_IPV6
+    global NETSCAN_TRUST_GATEWAY, NETSCAN_CHECKPOINT, NETSCAN_RESUME
+
+    load_config()
+    args = parse_args(argv)
+    if args.concurrency:
+        NETSCAN_CONCURRENCY = max(1, args.concurrency)
+    if args.probe:
+        NETSCAN_PROBE = args.probe
+    if args.targets:
+        NETSCAN_RANGE = args.targets
+    if args.exclude:
+        NETSCAN_EXCLUDE = args.exclude
+    if args.order:
+        NETSCAN_ORDER = args.order
+    if args.interface:
+        NETSCAN_IFACE = args.interface
+    if args.all_interfaces:
+        NETSCAN_ALL_IFACES = True
+    if args.ttl:
+        NETSCAN_MONITOR_TTL = max(1, args.ttl)
+    if args.history:
+        NETSCAN_HISTORY = True
+    if args.ipv6:
+        NETSCAN_IPV6 = True
+    if args.trust_gateway:
+        NETSCAN_TRUST_GATEWAY = True
+    if args.rate:
+        NETSCAN_RATE = max(1, args.rate)
+    if args.retries is not None:
+        NETSCAN_RETRIES = max(0, args.retries)
+    if args.checkpoint is not None:
+        NETSCAN_CHECKPOINT = max(0.0, args.checkpoint)
+    if args.resume:
+        NETSCAN_RESUME = True
+    if args.metrics_file:
+        NETSCAN_METRICS_FILE = args.metrics_file
+    if args.profile:
+        NETSCAN_PROFILE = True
+    if args.passive is not None:
+        NETSCAN_PASSIVE = max(0, args.passive)
+    if args.tcp_ports:
+        try:
+            NETSCAN_TCP_PORTS = parse_ports(args.tcp_ports)
+        except ValueError as e:
+            print(FG_RED + f"[✗] --tcp-ports: {e}" + RESET, file=sys.stderr)
+            return 2
+
+    if args.build_oui:
+        try:
+            count, written = compile_oui(args.build_oui)
+        except OSError as e:
+            print(FG_RED + f"[✗] {e}" + RESET, file=sys.stderr)
+            return 1
+        if written:
+            for path in written:
+                print(FG_GREEN + f"[✓] {path} updated ({count} prefixes)" + RESET)
+        else:
+            print(FG_GRAY + f"[*] OUI index unchanged ({count} prefixes)" + RESET)
+        return 0
+
+    if args.diff is not None:
+        return run_diff(args.diff or None, args.format if args.headless else None)
+    if args.from_pcap:
+        return run_from_pcap(args.from_pcap, args.format if args.headless else None, args.output)
+    if args.agent:
+        return run_agent(args.agent)
+    if args.coordinator is not None:
+        return run_coordinator(args.coordinator or NETSCAN_AGENTS,
+                               args.format if args.headless else None, args.output)
+    if args.passive is not None and args.headless:
+        return run_passive(args.format, args.output)
+    if args.monitor:
+        return run_monitor(args.format if args.headless else None, args.output)
+    if args.headless:
+        return run_headless(args.format, args.output)
+
     main_menu()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
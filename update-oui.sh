@@ -0,0 +1,50 @@
+#!/usr/bin/env bash
+set -e
+
+# =========================================================
+# Refresh the vendor (OUI) index
+#
+# Downloads the IEEE registries into a local cache (only when they
+# changed upstream) and compiles them with `netscan --build-oui`,
+# which rewrites the index only when its content actually changed.
+# Safe to run from cron, e.g.:
+#   0 4 * * 1  /opt/network-scanner/update-oui.sh >/dev/null
+# =========================================================
+INSTALL_DIR="/opt/network-scanner"
+CACHE_DIR="$INSTALL_DIR/registry"
+
+REGISTRIES=(
+  "oui.txt https://standards-oui.ieee.org/oui/oui.txt"
+  "mam.csv https://standards-oui.ieee.org/oui28/mam.csv"
+  "oui36.csv https://standards-oui.ieee.org/oui36/oui36.csv"
+)
+
+mkdir -p "$CACHE_DIR"
+
+SOURCES=()
+for entry in "${REGISTRIES[@]}"; do
+  name="${entry%% *}"
+  url="${entry#* }"
+  file="$CACHE_DIR/$name"
+
+  # FA: دانلود فقط در صورت تغییر فایل روی سرور
+  # EN: conditional GET - skip the download when upstream is unchanged
+  if [[ -s "$file" ]]; then
+    curl -fsSL -z "$file" -o "$file.part" "$url" || true
+  else
+    curl -# -fsSL -o "$file.part" "$url" || true
+  fi
+  if [[ -s "$file.part" ]]; then
+    mv -f "$file.part" "$file"
+  fi
+  rm -f "$file.part"
+
+  [[ -s "$file" ]] && SOURCES+=("$file")
+done
+
+if [[ ${#SOURCES[@]} -eq 0 ]]; then
+  echo "[!] Failed to download OUI database"
+  exit 1
+fi
+
+python3 "$INSTALL_DIR/network_scan.py" --build-oui "${SOURCES[@]}"